@@ -0,0 +1,47 @@
+import argparse
+import os
+import random
+import sys
+import time
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "main"))
+from shamir_scheme import (
+    PRIME,
+    WeightCache,
+    encode_share_batch,
+    generate_shares_batch,
+    load_share_batch,
+    reconstruct_from_evaluations,
+    reconstruct_secrets_batch
+)
+
+def main():
+    """
+    Times the reconstruction of a vault of secrets shared with one set of holders, one secret at a
+    time against reconstruct_secrets_batch, and the parsing of the batch share file.
+    """
+    parser = argparse.ArgumentParser(description="Per secret against batch reconstruction")
+    parser.add_argument('--secrets', type=int, nargs='+', default=[1000, 10000])
+    parser.add_argument('-t', type=int, default=5, help='Threshold of every secret')
+    args = parser.parse_args()
+    print(f"{'secrets':>8}{'per secret (s)':>16}{'batch (s)':>12}{'speedup':>10}{'load file (s)':>16}")
+    for m in args.secrets:
+        x_values = random.sample(range(1, 10**10), args.t)
+        secret_values = [random.randrange(PRIME) for _ in range(m)]
+        shares = generate_shares_batch(secret_values, x_values, args.t)
+        start = time.perf_counter()
+        for j in range(m):
+            evaluations = [(x, row[j]) for x, row in zip(x_values, shares)]
+            assert reconstruct_from_evaluations(evaluations, cache=WeightCache(0)) == secret_values[j]
+        single = time.perf_counter() - start
+        start = time.perf_counter()
+        assert reconstruct_secrets_batch(x_values, shares, cache=WeightCache(0)) == secret_values
+        batch = time.perf_counter() - start
+        data = b"".join(encode_share_batch(x_values, shares, args.t))
+        start = time.perf_counter()
+        _, loaded_x, loaded_shares = load_share_batch([data[i:i + (1 << 20)] for i in range(0, len(data), 1 << 20)])
+        load = time.perf_counter() - start
+        assert reconstruct_secrets_batch(loaded_x, loaded_shares) == secret_values
+        print(f"{m:>8}{single:>16.3f}{batch:>12.3f}{single / batch:>10.1f}{load:>16.3f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import tracemalloc
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "main"))
+
+VARIANTS = ["text_encrypt", "bytes_encrypt", "text_decrypt", "bytes_decrypt"]
+
+PASSWORD = "benchmark password"
+
+def run_variant(variant : str, input_path : str, output_path : str):
+    """
+    Runs one encrypt or decrypt variant and measures it from inside the process.
+
+    The text variants are the original str based functions, the bytes variants are the
+    memory-mapped, memoryview based ones.
+
+    Args:
+        variant (str): One of VARIANTS.
+        input_path (str): The plaintext file for encryption or the .aes file for decryption.
+        output_path (str): The file where the result is written.
+
+    Returns:
+        dict: The peak traced Python allocation and the peak RSS of the process.
+    """
+    from cipher import decrypt, decrypt_bytes, encrypt, encrypt_bytes, get_key
+    from io_manager import map_file, read_bytes_file, read_text_file, write_bytes_file, write_text_file
+    key = get_key(PASSWORD)
+    tracemalloc.start()
+    if variant == "text_encrypt":
+        write_bytes_file(output_path, encrypt(read_text_file(input_path), PASSWORD))
+    elif variant == "bytes_encrypt":
+        with map_file(input_path) as data:
+            write_bytes_file(output_path, encrypt_bytes(data, key))
+    elif variant == "text_decrypt":
+        write_text_file(output_path, decrypt(read_bytes_file(input_path), key))
+    elif variant == "bytes_decrypt":
+        with map_file(input_path) as data:
+            write_bytes_file(output_path, decrypt_bytes(data, key))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "peak_allocated": peak,
+        "peak_rss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    }
+
+def measure(variant : str, input_path : str, output_path : str):
+    """
+    Runs a variant in a fresh interpreter so every peak RSS starts from the same baseline.
+
+    Args:
+        variant (str): One of VARIANTS.
+        input_path (str): The input file of the variant.
+        output_path (str): The output file of the variant.
+
+    Returns:
+        dict: The measurements reported by the child process.
+    """
+    result = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--variant", variant, input_path, output_path],
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    return json.loads(result.stdout)
+
+def main():
+    """
+    Encrypts and decrypts a generated text file with the str and the byte pipelines and prints,
+    for each one, the peak RSS and the number of full copies of the document that were allocated.
+    """
+    parser = argparse.ArgumentParser(description="Copies and peak memory of the str and byte pipelines")
+    parser.add_argument('--size', type=int, default=64, help='Size of the document in MiB')
+    parser.add_argument('--variant', choices=VARIANTS, help=argparse.SUPPRESS)
+    parser.add_argument('paths', nargs='*', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.variant:
+        print(json.dumps(run_variant(args.variant, *args.paths)))
+        return
+    size = args.size * 1024 * 1024
+    with tempfile.TemporaryDirectory() as directory:
+        plain_path = os.path.join(directory, "document.txt")
+        with open(plain_path, 'wb') as file:
+            file.write((b"lorem ipsum dolor sit amet\n" * (size // 27 + 1))[:size])
+        encrypted_path = os.path.join(directory, "document.aes")
+        print(f"{'variant':<16}{'copies':>10}{'peak RSS (MiB)':>18}")
+        for variant in VARIANTS:
+            if variant.endswith("encrypt"):
+                result = measure(variant, plain_path, encrypted_path)
+            else:
+                result = measure(variant, encrypted_path, os.path.join(directory, "revealed.txt"))
+            copies = result["peak_allocated"] / size
+            print(f"{variant:<16}{copies:>10.2f}{result['peak_rss'] / 2**20:>18.1f}")
+
+if __name__ == "__main__":
+    main()
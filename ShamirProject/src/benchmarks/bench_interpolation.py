@@ -0,0 +1,59 @@
+import argparse
+import os
+import random
+import sys
+import time
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "main"))
+from shamir_scheme import WeightCache, field_backend, generate_shares_batch, reconstruct_from_evaluations
+
+def time_engine(evaluations, engine : str, repeat : int):
+    """
+    Measures the reconstruction of a secret with one engine.
+
+    Args:
+        evaluations (list): The (x, P(x)) points.
+        engine (str): "naive" or "fast".
+        repeat (int): The number of runs, the best one is kept.
+
+    Returns:
+        tuple: The best time in seconds and the reconstructed secret.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        secret = reconstruct_from_evaluations(evaluations, engine, WeightCache(0))
+        best = min(best, time.perf_counter() - start)
+    return best, secret
+
+def main():
+    """
+    Times the O(k²) and the product tree reconstruction for growing numbers of shares and prints
+    the measured crossover, the value to use for the interpolation threshold of the field backend,
+    chosen as in shamir_scheme.field_backend.
+    """
+    parser = argparse.ArgumentParser(description="Naive against product tree reconstruction")
+    parser.add_argument('--shares', type=int, nargs='+', default=[100, 1000, 10000])
+    parser.add_argument('--naive-limit', type=int, default=10000, help='Largest k timed with the naive engine')
+    parser.add_argument('--repeat', type=int, default=1)
+    args = parser.parse_args()
+    print(f"{'k':>8}{'naive (s)':>14}{'fast (s)':>14}{'speedup':>10}")
+    crossover = None
+    for k in args.shares:
+        secret = random.randrange(2**256)
+        x_values = random.sample(range(1, 10**10), k)
+        evaluations = list(zip(x_values, [row[0] for row in generate_shares_batch([secret], x_values, k)]))
+        fast, fast_secret = time_engine(evaluations, "fast", args.repeat)
+        assert fast_secret == secret
+        if k <= args.naive_limit:
+            naive, naive_secret = time_engine(evaluations, "naive", args.repeat)
+            assert naive_secret == secret
+            print(f"{k:>8}{naive:>14.3f}{fast:>14.3f}{naive / fast:>10.2f}")
+            if crossover is None and fast < naive:
+                crossover = k
+        else:
+            print(f"{k:>8}{'-':>14}{fast:>14.3f}{'-':>10}")
+    backend = field_backend()
+    print(f"Measured crossover: {crossover} (current threshold of the {backend.name} backend: {backend.fast_interpolation_threshold})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "main"))
+from key_agent import send_requests
+
+MAIN_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "main", "main.py")
+
+def run_main(arguments, password : str = None):
+    """
+    Runs the command line once, as a new interpreter.
+
+    Args:
+        arguments (list of str): The command line arguments given to main.py.
+        password (str): The password written to the standard input, if any.
+    """
+    subprocess.run([sys.executable, MAIN_PATH] + arguments, input=password, text=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+
+def prepare_documents(directory : str, count : int, size : int):
+    """
+    Encrypts count random documents of size bytes with one set of shares.
+
+    Args:
+        directory (str): The directory of the files.
+        count (int): The number of documents.
+        size (int): The size in bytes of every document.
+
+    Returns:
+        tuple: The evaluations file and the encrypted files.
+    """
+    for i in range(count):
+        with open(os.path.join(directory, f"document_{i}.txt"), 'wb') as file:
+            file.write(os.urandom(size))
+    eval_path = os.path.join(directory, "shares.frg")
+    run_main(["c", eval_path, "5", "3", directory, "--processes", "1"], "benchmark password\n")
+    return eval_path, [os.path.join(directory, f"document_{i}.aes") for i in range(count)]
+
+def wait_for_socket(socket_path : str, timeout : float = 10):
+    """
+    Waits until the agent listens on its socket.
+
+    Args:
+        socket_path (str): The path of the Unix socket.
+        timeout (float): The maximum number of seconds to wait.
+    """
+    deadline = time.monotonic() + timeout
+    while not os.path.exists(socket_path):
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"The agent did not start on: {socket_path}")
+        time.sleep(0.01)
+
+def main():
+    """
+    Compares the latency and the throughput of decrypting small files with one command line
+    invocation per file against a running key agent.
+    """
+    parser = argparse.ArgumentParser(description="One-shot command line against the key agent")
+    parser.add_argument('--files', type=int, default=200, help='Number of documents')
+    parser.add_argument('--size', type=int, default=4096, help='Size in bytes of every document')
+    parser.add_argument('--cli-files', type=int, default=20, help='Documents decrypted with the one-shot command line')
+    parser.add_argument('--clients', type=int, default=4, help='Concurrent clients of the agent')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Threads of the agent')
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as directory:
+        eval_path, encrypted_paths = prepare_documents(directory, args.files, args.size)
+        start = time.perf_counter()
+        for path in encrypted_paths[:args.cli_files]:
+            run_main(["d", eval_path, path, "--processes", "1", "--workers", "1"])
+        cli = (time.perf_counter() - start) / args.cli_files
+
+        socket_path = os.path.join(directory, "agent.sock")
+        agent = subprocess.Popen([sys.executable, MAIN_PATH, "a", eval_path, socket_path, "--workers", str(args.workers)],
+                                 stdout=subprocess.DEVNULL)
+        try:
+            wait_for_socket(socket_path)
+            start = time.perf_counter()
+            send_requests(socket_path, [{"command": "decrypt", "path": encrypted_paths[0]}])
+            first = time.perf_counter() - start
+            start = time.perf_counter()
+            for path in encrypted_paths:
+                assert send_requests(socket_path, [{"command": "decrypt", "path": path}])[0]["ok"]
+            sequential = (time.perf_counter() - start) / args.files
+            start = time.perf_counter()
+            responses = send_requests(socket_path, [{"command": "decrypt", "path": path} for path in encrypted_paths])
+            pipelined = time.perf_counter() - start
+            assert all(response["ok"] for response in responses)
+            batches = [encrypted_paths[i::args.clients] for i in range(args.clients)]
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=args.clients) as executor:
+                list(executor.map(lambda paths: send_requests(socket_path, [{"command": "decrypt", "path": path} for path in paths]), batches))
+            concurrent = time.perf_counter() - start
+        finally:
+            send_requests(socket_path, [{"command": "shutdown"}])
+            agent.wait()
+    print(f"{'mode':<34}{'latency (ms)':>14}{'files/s':>10}")
+    print(f"{'one-shot command line':<34}{cli * 1000:>14.1f}{1 / cli:>10.0f}")
+    print(f"{'agent, first request':<34}{first * 1000:>14.1f}{'-':>10}")
+    print(f"{'agent, one request per connection':<34}{sequential * 1000:>14.2f}{1 / sequential:>10.0f}")
+    print(f"{'agent, pipelined connection':<34}{'-':>14}{args.files / pipelined:>10.0f}")
+    print(f"{f'agent, {args.clients} concurrent clients':<34}{'-':>14}{args.files / concurrent:>10.0f}")
+
+if __name__ == "__main__":
+    main()
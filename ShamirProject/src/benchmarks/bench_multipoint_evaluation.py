@@ -0,0 +1,58 @@
+import argparse
+import os
+import random
+import sys
+import time
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "main"))
+from shamir_scheme import PRIME, field_backend, _evaluate_polynomial
+from fast_polynomial import multipoint_evaluate
+
+def time_engines(n : int, t : int, repeat : int):
+    """
+    Measures the naive and the subproduct tree evaluation of one random polynomial.
+
+    Args:
+        n (int): The number of points.
+        t (int): The number of coefficients of the polynomial.
+        repeat (int): The number of runs, the best one is kept.
+
+    Returns:
+        tuple: The best time in seconds of the naive and of the fast engine.
+    """
+    x_values = random.sample(range(1, 10**10), n)
+    coefficients = [random.randrange(PRIME) for _ in range(t)]
+    naive, fast = float("inf"), float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        expected = [_evaluate_polynomial(coefficients, x) for x in x_values]
+        naive = min(naive, time.perf_counter() - start)
+        start = time.perf_counter()
+        values = multipoint_evaluate(coefficients, x_values)
+        fast = min(fast, time.perf_counter() - start)
+        assert values == expected
+    return naive, fast
+
+def main():
+    """
+    Times both evaluation engines for growing thresholds and prints the measured crossover,
+    the value to use for the evaluation threshold of the field backend, chosen as in
+    shamir_scheme.field_backend.
+    """
+    parser = argparse.ArgumentParser(description="Naive against subproduct tree multipoint evaluation")
+    parser.add_argument('--thresholds', type=int, nargs='+', default=[250, 500, 1000, 2000, 3000, 4000, 6000])
+    parser.add_argument('--holders', type=int, default=None, help='Number of points (default: equal to the threshold)')
+    parser.add_argument('--repeat', type=int, default=1)
+    args = parser.parse_args()
+    print(f"{'t':>8}{'n':>10}{'naive (s)':>14}{'fast (s)':>14}{'speedup':>10}")
+    crossover = None
+    for t in args.thresholds:
+        n = max(args.holders or t, t)
+        naive, fast = time_engines(n, t, args.repeat)
+        print(f"{t:>8}{n:>10}{naive:>14.3f}{fast:>14.3f}{naive / fast:>10.2f}")
+        if crossover is None and fast < naive:
+            crossover = t
+    backend = field_backend()
+    print(f"Measured crossover: {crossover} (current threshold of the {backend.name} backend: {backend.fast_evaluation_threshold})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+import argparse
+import os
+import random
+import sys
+import time
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "main"))
+from shamir_scheme import (
+    PRIME,
+    WeightCache,
+    encode_share_batch,
+    generate_packed_shares,
+    generate_shares_batch,
+    reconstruct_packed_secrets,
+    reconstruct_secrets_batch
+)
+
+def main():
+    """
+    Compares packed sharing, for several pack sizes, with one polynomial per secret: the time to
+    generate and to reconstruct a vault of secrets and the size of the file of one holder.
+    """
+    parser = argparse.ArgumentParser(description="Per secret against packed sharing")
+    parser.add_argument('--secrets', type=int, default=10000, help='Number of secrets')
+    parser.add_argument('-n', type=int, default=10, help='Number of holders')
+    parser.add_argument('-t', type=int, default=8, help='Shares needed to reconstruct')
+    parser.add_argument('--pack-sizes', type=int, nargs='+', default=[2, 4, 7], help='Secrets per share')
+    args = parser.parse_args()
+    x_values = random.sample(range(1, 10**10), args.n)
+    secret_values = [random.randrange(PRIME) for _ in range(args.secrets)]
+    print(f"{'mode':<12}{'private to':>11}{'generate (s)':>14}{'reconstruct (s)':>17}{'holder file (B)':>17}")
+    for pack_size in [1] + args.pack_sizes:
+        start = time.perf_counter()
+        if pack_size == 1:
+            shares = generate_shares_batch(secret_values, x_values, args.t)
+        else:
+            shares = generate_packed_shares(secret_values, x_values, args.t, pack_size)
+        generate = time.perf_counter() - start
+        start = time.perf_counter()
+        if pack_size == 1:
+            recovered = reconstruct_secrets_batch(x_values[:args.t], shares[:args.t], cache=WeightCache(0))
+        else:
+            recovered = reconstruct_packed_secrets(x_values[:args.t], shares[:args.t], args.t, pack_size, args.secrets)
+        reconstruct = time.perf_counter() - start
+        assert recovered == secret_values
+        size = len(b"".join(encode_share_batch(x_values[:1], shares[:1], args.t, pack_size, args.secrets)))
+        mode = "per secret" if pack_size == 1 else f"packed ℓ={pack_size}"
+        print(f"{mode:<12}{args.t - pack_size:>11}{generate:>14.3f}{reconstruct:>17.3f}{size:>17}")
+
+if __name__ == "__main__":
+    main()
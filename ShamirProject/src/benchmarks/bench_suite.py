@@ -0,0 +1,319 @@
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, List, NamedTuple
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "main"))
+
+MAIN_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "main", "main.py")
+
+BASELINES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines")
+
+DEFAULT_THRESHOLD = 0.25
+"""float: Relative slowdown against the baseline above which a case is flagged as a regression."""
+
+NOISE_FLOOR = 0.0005
+"""float: Slowdowns of fewer seconds than this are never flagged, they are within the timer noise."""
+
+PASSWORD = "benchmark password"
+
+class Case(NamedTuple):
+    """
+    A benchmark and the sizes it runs with.
+
+    Attributes:
+        name (str): The name of the case.
+        setup (Callable): Receives the working directory and the parameters and returns the
+            function to time and the number of bytes it processes, or None.
+        quick (List[dict]): The parameters of the quick profile.
+        full (List[dict]): The parameters of the full profile.
+    """
+    name: str
+    setup: Callable
+    quick: List[dict]
+    full: List[dict]
+
+def setup_generate_shares(directory : str, n : int, t : int):
+    """
+    Prepares the generation of n shares with threshold t of a random key.
+    """
+    from shamir_scheme import generate_shares
+    secret = random.randrange(2**256)
+    return (lambda: generate_shares(secret, n, t)), None
+
+def setup_reconstruct_secret(directory : str, k : int):
+    """
+    Prepares the reconstruction of a key from k shares, parsed from their text format every time.
+    """
+    from shamir_scheme import WeightCache, generate_shares, get_evaluations, reconstruct_from_evaluations
+    shares = generate_shares(random.randrange(2**256), k, k)
+    return (lambda: reconstruct_from_evaluations(get_evaluations(shares), cache=WeightCache(0))), None
+
+def setup_cipher(directory : str, operation : str, size : int):
+    """
+    Prepares the original AES-CBC encrypt or decrypt of a document of size bytes.
+    """
+    from cipher import decrypt, encrypt, get_key
+    text = ("lorem ipsum dolor sit amet\n" * (size // 27 + 1))[:size]
+    if operation == "encrypt":
+        return (lambda: encrypt(text, PASSWORD)), size
+    encrypted = encrypt(text, PASSWORD)
+    key = get_key(PASSWORD)
+    return (lambda: decrypt(encrypted, key)), size
+
+def setup_container(directory : str, operation : str, size : int):
+    """
+    Prepares the segmented AES-GCM encrypt or decrypt of a document of size bytes, with one thread.
+    """
+    from container import DEFAULT_SEGMENT_SIZE, decrypt_container, encrypt_container
+    from cipher import get_key
+    key = get_key(PASSWORD)
+    data = os.urandom(size)
+    chunks = [data[i:i + DEFAULT_SEGMENT_SIZE] for i in range(0, size, DEFAULT_SEGMENT_SIZE)]
+    if operation == "encrypt":
+        return (lambda: sum(map(len, encrypt_container(chunks, key)))), size
+    encrypted = b"".join(encrypt_container(chunks, key))
+    return (lambda: sum(map(len, decrypt_container(io.BytesIO(encrypted), key)))), size
+
+def setup_engine(directory : str, engine : str, operation : str, size : int):
+    """
+    Prepares the segmented encrypt or decrypt of a document of size bytes with one cipher engine.
+    """
+    from container import DEFAULT_SEGMENT_SIZE, decrypt_container, encrypt_container
+    from cipher import get_key
+    key = get_key(PASSWORD)
+    data = os.urandom(size)
+    chunks = [data[i:i + DEFAULT_SEGMENT_SIZE] for i in range(0, size, DEFAULT_SEGMENT_SIZE)]
+    if operation == "encrypt":
+        return (lambda: sum(map(len, encrypt_container(chunks, key, engine=engine)))), size
+    encrypted = b"".join(encrypt_container(chunks, key, engine=engine))
+    return (lambda: sum(map(len, decrypt_container(io.BytesIO(encrypted), key)))), size
+
+def setup_compression(directory : str, compression : str, size : int):
+    """
+    Prepares the segmented encryption of a text document of size bytes, compressing its segments.
+    """
+    from container import DEFAULT_SEGMENT_SIZE, encrypt_container
+    from cipher import get_key
+    key = get_key(PASSWORD)
+    data = b"".join(b"%08d lorem ipsum dolor sit amet %d\n" % (i, random.randrange(1000)) for i in range(size // 36 + 1))[:size]
+    chunks = [data[i:i + DEFAULT_SEGMENT_SIZE] for i in range(0, size, DEFAULT_SEGMENT_SIZE)]
+    return (lambda: sum(map(len, encrypt_container(chunks, key, compression=compression)))), size
+
+def setup_file(directory : str, operation : str, pipeline : bool, size : int):
+    """
+    Prepares the encrypt or decrypt of a file of size bytes with one thread, from disk to disk,
+    with the read, cipher and write stages pipelined on threads or run one after another.
+    """
+    from container import DEFAULT_SEGMENT_SIZE, decrypt_container, encrypt_container
+    from cipher import get_key
+    from io_manager import open_bytes_file, pipelined, read_file_chunks, write_file_chunks
+    key = get_key(PASSWORD)
+    stage = pipelined if pipeline else iter
+    plain_path = os.path.join(directory, f"file_{size}.txt")
+    encrypted_path = os.path.join(directory, f"file_{size}.aes")
+    with open(plain_path, 'wb') as file:
+        file.write(os.urandom(size))
+    encrypt = lambda: write_file_chunks(encrypted_path, stage(encrypt_container(stage(read_file_chunks(plain_path, DEFAULT_SEGMENT_SIZE)), key)))
+    encrypt()
+    if operation == "encrypt":
+        return encrypt, size
+
+    def decrypt():
+        with open_bytes_file(encrypted_path) as source:
+            return write_file_chunks(os.path.join(directory, f"file_{size}_revealed.txt"), stage(decrypt_container(source, key)))
+    return decrypt, size
+
+def setup_cli(directory : str, operation : str, size : int):
+    """
+    Prepares one run of main.py c or d, in a new interpreter, on a document of size bytes.
+    """
+    plain_path = os.path.join(directory, f"cli_{size}.txt")
+    eval_path = os.path.join(directory, f"cli_{size}.frg")
+    with open(plain_path, 'wb') as file:
+        file.write(os.urandom(size))
+    encrypt = [sys.executable, MAIN_PATH, "c", eval_path, "5", "3", plain_path, "--processes", "1"]
+    decrypt = [sys.executable, MAIN_PATH, "d", eval_path, plain_path.replace(".txt", ".aes"), "--processes", "1"]
+    run = lambda command: subprocess.run(command, input=PASSWORD + "\n", text=True, check=True,
+                                         stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    run(encrypt)
+    return (lambda: run(encrypt if operation == "encrypt" else decrypt)), size
+
+CASES = [
+    Case("generate_shares", setup_generate_shares,
+         [{"n": 10, "t": 3}, {"n": 100, "t": 10}, {"n": 1000, "t": 100}],
+         [{"n": 10, "t": 3}, {"n": 100, "t": 10}, {"n": 1000, "t": 100}, {"n": 1000, "t": 1000}, {"n": 5000, "t": 1000}]),
+    Case("reconstruct_secret", setup_reconstruct_secret,
+         [{"k": 3}, {"k": 10}, {"k": 100}],
+         [{"k": 3}, {"k": 10}, {"k": 100}, {"k": 1000}, {"k": 3000}]),
+    Case("cipher", setup_cipher,
+         [{"operation": operation, "size": size} for operation in ("encrypt", "decrypt") for size in (2**16, 2**20)],
+         [{"operation": operation, "size": size} for operation in ("encrypt", "decrypt") for size in (2**16, 2**20, 2**24)]),
+    Case("container", setup_container,
+         [{"operation": operation, "size": size} for operation in ("encrypt", "decrypt") for size in (2**16, 2**20)],
+         [{"operation": operation, "size": size} for operation in ("encrypt", "decrypt") for size in (2**16, 2**20, 2**24)]),
+    Case("engine", setup_engine,
+         [{"engine": engine, "operation": operation, "size": 2**22}
+          for engine in ("aes-gcm", "aes-ctr-hmac", "chacha20-poly1305") for operation in ("encrypt", "decrypt")],
+         [{"engine": engine, "operation": operation, "size": size}
+          for engine in ("aes-gcm", "aes-ctr-hmac", "chacha20-poly1305") for operation in ("encrypt", "decrypt") for size in (2**20, 2**24)]),
+    Case("compression", setup_compression,
+         [{"compression": compression, "size": 2**20} for compression in ("none", "zlib", "lzma", "bz2")],
+         [{"compression": compression, "size": size} for compression in ("none", "zlib", "lzma", "bz2") for size in (2**20, 2**24)]),
+    Case("file", setup_file,
+         [{"operation": operation, "pipeline": pipeline, "size": 2**24} for operation in ("encrypt", "decrypt") for pipeline in (False, True)],
+         [{"operation": operation, "pipeline": pipeline, "size": size}
+          for operation in ("encrypt", "decrypt") for pipeline in (False, True) for size in (2**24, 2**28)]),
+    Case("cli", setup_cli,
+         [{"operation": operation, "size": 2**20} for operation in ("encrypt", "decrypt")],
+         [{"operation": operation, "size": size} for operation in ("encrypt", "decrypt") for size in (2**10, 2**20, 2**24)])
+]
+
+def case_id(name : str, params : dict):
+    """
+    Names one run of a case, for example "cipher[operation=encrypt,size=65536]".
+
+    Args:
+        name (str): The name of the case.
+        params (dict): The parameters of the run.
+
+    Returns:
+        str: The identifier used to match runs against the baseline.
+    """
+    return f"{name}[{','.join(f'{key}={value}' for key, value in params.items())}]"
+
+def time_best(function : Callable, repeat : int):
+    """
+    Runs a function repeat times and keeps the fastest run, the one least disturbed by noise.
+
+    Args:
+        function (Callable): The function to time.
+        repeat (int): The number of runs.
+
+    Returns:
+        float: The best time in seconds.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def run_suite(profile : str, repeat : int, selected : list = None):
+    """
+    Runs every case of a profile.
+
+    Args:
+        profile (str): "quick" or "full".
+        repeat (int): The number of runs of every case, the best one is kept.
+        selected (list of str): The names of the cases to run, None runs all of them.
+
+    Returns:
+        dict: The environment and the results, ready to be written as JSON.
+    """
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for case in CASES:
+            if selected and case.name not in selected:
+                continue
+            for params in getattr(case, profile):
+                function, size = case.setup(directory, **params)
+                seconds = time_best(function, repeat)
+                result = {"seconds": seconds}
+                if size:
+                    result["mb_per_s"] = size / seconds / 1e6
+                results[case_id(case.name, params)] = result
+                print(f"{case_id(case.name, params):<48}{seconds * 1000:>12.3f} ms"
+                      + (f"{result['mb_per_s']:>10.1f} MB/s" if size else ""))
+    return {"environment": environment(), "profile": profile, "repeat": repeat, "results": results}
+
+def environment():
+    """
+    Describes where the suite ran, since baselines are only comparable on the same machine.
+
+    Returns:
+        dict: The Python version, the platform, the number of CPUs, the field backend and the git commit, if any.
+    """
+    from shamir_scheme import field_backend
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "field_backend": field_backend().name,
+        "commit": commit
+    }
+
+def compare(report : dict, baseline : dict, threshold : float):
+    """
+    Finds the cases that got slower than the baseline by more than the threshold and NOISE_FLOOR.
+
+    Args:
+        report (dict): The results of this run.
+        baseline (dict): The stored results.
+        threshold (float): The allowed relative slowdown, 0.25 allows 25%.
+
+    Returns:
+        list of tuple: The case, the baseline seconds and the current seconds of every regression.
+    """
+    regressions = []
+    for case, result in report["results"].items():
+        previous = baseline["results"].get(case)
+        slowdown = result["seconds"] - previous["seconds"] if previous else 0
+        if previous and slowdown > previous["seconds"] * threshold and slowdown > NOISE_FLOOR:
+            regressions.append((case, previous["seconds"], result["seconds"]))
+    return regressions
+
+def main():
+    """
+    Runs the benchmark suite, writes its JSON report and compares it with a stored baseline.
+
+    The exit status is 1 when a case is slower than the baseline by more than the threshold.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark suite of the Shamir project")
+    parser.add_argument('--profile', choices=['quick', 'full'], default='quick')
+    parser.add_argument('--repeat', type=int, default=5, help='Runs of every case, the best one is kept')
+    parser.add_argument('--case', action='append', choices=[case.name for case in CASES], help='Run only this case, can be repeated')
+    parser.add_argument('--output', help='File where the JSON report is written')
+    parser.add_argument('--baseline', help='JSON report to compare with (default: baselines/<profile>.json when it exists)')
+    parser.add_argument('--save-baseline', action='store_true', help='Store this run as baselines/<profile>.json')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, help='Allowed relative slowdown (default: 0.25)')
+    args = parser.parse_args()
+    random.seed(0)
+    report = run_suite(args.profile, args.repeat, args.case)
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+    baseline_path = args.baseline or os.path.join(BASELINES_DIR, f"{args.profile}.json")
+    if args.save_baseline:
+        os.makedirs(BASELINES_DIR, exist_ok=True)
+        with open(os.path.join(BASELINES_DIR, f"{args.profile}.json"), 'w') as file:
+            json.dump(report, file, indent=2)
+        print(f"Baseline saved in: {os.path.join(BASELINES_DIR, f'{args.profile}.json')}")
+        return
+    if not os.path.exists(baseline_path):
+        print(f"No baseline to compare with: {baseline_path}")
+        return
+    with open(baseline_path) as file:
+        baseline = json.load(file)
+    regressions = compare(report, baseline, args.threshold)
+    print(f"Compared with {baseline_path} (commit {baseline['environment'].get('commit')}):")
+    for case, previous, current in regressions:
+        print(f"  REGRESSION {case}: {previous * 1000:.3f} ms -> {current * 1000:.3f} ms ({current / previous - 1:+.0%})")
+    if not regressions:
+        print(f"  no case is more than {args.threshold:.0%} slower")
+    sys.exit(1 if regressions else 0)
+
+if __name__ == "__main__":
+    main()
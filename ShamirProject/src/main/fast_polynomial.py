@@ -0,0 +1,311 @@
+from typing import List, Sequence
+from shamir_scheme import PRIME, field_backend
+
+SCHOOLBOOK_THRESHOLD = 16
+"""int: Below this many coefficients polynomials are multiplied term by term."""
+
+LEAF_SIZE = 32
+"""int: Subtrees with at most this many points are evaluated directly with Horner's scheme."""
+
+def poly_mul(a: Sequence[int], b: Sequence[int]) -> List[int]:
+    """
+    Multiplies two polynomials over the prime field.
+
+    Polynomials are lists of coefficients, lowest degree first. Large products use Kronecker
+    substitution: both polynomials are packed into single integers with slots wide enough to hold
+    any coefficient of the product, multiplied once with the big-integer multiplication of the
+    interpreter, or of the field backend when it multiplies huge integers faster, and unpacked again.
+
+    Args:
+        a (Sequence[int]): The coefficients of the first polynomial, reduced modulo PRIME.
+        b (Sequence[int]): The coefficients of the second polynomial, reduced modulo PRIME.
+
+    Returns:
+        List[int]: The coefficients of the product, reduced modulo PRIME.
+    """
+    if not a or not b:
+        return []
+    if min(len(a), len(b)) < SCHOOLBOOK_THRESHOLD:
+        product = [0] * (len(a) + len(b) - 1)
+        for i, c in enumerate(a):
+            if c:
+                for j, d in enumerate(b):
+                    product[i + j] += c * d
+        return [c % PRIME for c in product]
+    slot = (2 * PRIME.bit_length() + min(len(a), len(b)).bit_length() + 7) // 8
+    packed = field_backend().multiply(_pack(a, slot), _pack(b, slot))
+    length = len(a) + len(b) - 1
+    raw = packed.to_bytes(length * slot, 'little')
+    return [int.from_bytes(raw[i:i + slot], 'little') % PRIME for i in range(0, length * slot, slot)]
+
+def poly_divmod(a: Sequence[int], b: Sequence[int]):
+    """
+    Divides two polynomials over the prime field.
+
+    The quotient is computed from the reversed polynomials with a power series inverse obtained by
+    Newton iteration, so the cost is a few multiplications instead of a long division.
+
+    Args:
+        a (Sequence[int]): The coefficients of the dividend.
+        b (Sequence[int]): The coefficients of the divisor, its last coefficient must not be zero.
+
+    Returns:
+        tuple: The coefficients of the quotient and of the remainder.
+    """
+    n, m = len(a) - 1, len(b) - 1
+    if n < m:
+        return [], list(a)
+    length = n - m + 1
+    inverse = _inverse_series(b[::-1], length)
+    quotient = poly_mul(a[::-1][:length], inverse)[:length]
+    quotient = (quotient + [0] * (length - len(quotient)))[::-1]
+    product = poly_mul(b, quotient)
+    remainder = [(c - d) % PRIME for c, d in zip(a[:m], product[:m])]
+    return quotient, remainder
+
+def product_tree(x_values: Sequence[int]) -> List[List[List[int]]]:
+    """
+    Builds the subproduct tree of the polynomials (x - x_i).
+
+    Args:
+        x_values (Sequence[int]): The points, reduced modulo PRIME.
+
+    Returns:
+        List[List[List[int]]]: The levels of the tree, from the leaves (x - x_i) to the root
+            prod(x - x_i). Every node is the product of its two children of the level below,
+            a node without sibling is carried up unchanged.
+    """
+    level = [[-x % PRIME, 1] for x in x_values]
+    tree = [level]
+    while len(level) > 1:
+        level = [poly_mul(level[i], level[i + 1]) if i + 1 < len(level) else level[i]
+                 for i in range(0, len(level), 2)]
+        tree.append(level)
+    return tree
+
+def multipoint_evaluate(coefficients: Sequence[int], x_values: Sequence[int]) -> List[int]:
+    """
+    Evaluates a polynomial at many points with remainder trees, in O(n log² n) operations.
+
+    The points are split into blocks of about the size of the polynomial, since the upper levels of
+    a tree over all the points would only hold products of higher degree than the polynomial. For
+    every block the polynomial is reduced modulo the root of its subproduct tree and the remainders
+    are pushed down the tree, so every node only holds a polynomial of the degree of its subtree.
+    Subtrees of at most LEAF_SIZE points are evaluated directly with Horner's scheme.
+
+    Args:
+        coefficients (Sequence[int]): The coefficients of the polynomial, lowest degree first.
+        x_values (Sequence[int]): The points at which the polynomial is evaluated.
+
+    Returns:
+        List[int]: The value of the polynomial at every point, modulo PRIME.
+    """
+    x_values = [x % PRIME for x in x_values]
+    coefficients = [c % PRIME for c in coefficients]
+    block = LEAF_SIZE
+    while block < len(coefficients):
+        block *= 2
+    values = []
+    for start in range(0, len(x_values), block):
+        points = x_values[start:start + block]
+        tree = product_tree(points)
+        _evaluate_subtree(coefficients, tree, len(tree) - 1, 0, points, values)
+    return values
+
+def lagrange_weights_at_zero(x_values: Sequence[int]) -> List[int]:
+    """
+    Computes the Lagrange basis polynomials evaluated at x = 0 in O(k log² k) operations.
+
+    With M(x) = prod(x - x_i), every weight is L_i(0) = M(0) / ((0 - x_i) M'(x_i)). M is the root of
+    the subproduct tree and the derivative M' is evaluated at all the points with the remainder
+    tree of that same tree, then every denominator is inverted with a single modular inversion.
+
+    Args:
+        x_values (Sequence[int]): The x coordinates of the evaluations, distinct and non zero in the field.
+
+    Returns:
+        List[int]: The weight of each evaluation, in the same order as x_values.
+
+    Raises:
+        ValueError: If two x values are equal or one of them is zero in the field.
+    """
+    from shamir_scheme import _batch_inverse
+    x_values = [x % PRIME for x in x_values]
+    tree = product_tree(x_values)
+    root = tree[-1][0]
+    derivative = [i * c % PRIME for i, c in enumerate(root)][1:]
+    values = []
+    _evaluate_subtree(derivative, tree, len(tree) - 1, 0, x_values, values)
+    denominators = [-x * value % PRIME for x, value in zip(x_values, values)]
+    if 0 in denominators:
+        raise ValueError(f"Repeated or zero x value: {x_values[denominators.index(0)]}")
+    return [root[0] * inverse % PRIME for inverse in _batch_inverse(denominators)]
+
+def interpolate(x_values: Sequence[int], y_values: Sequence[int]) -> List[int]:
+    """
+    Computes the polynomial of lowest degree through the points (x_i, y_i) in O(n log² n) operations.
+
+    With M(x) = prod(x - x_i), the polynomial is sum c_i M(x) / (x - x_i) with c_i = y_i / M'(x_i).
+    The sums are combined up the subproduct tree: a node is left * right_product + right * left_product.
+
+    Args:
+        x_values (Sequence[int]): The x coordinates, distinct in the field.
+        y_values (Sequence[int]): The y coordinates.
+
+    Returns:
+        List[int]: The coefficients of the polynomial, lowest degree first, of length len(x_values).
+
+    Raises:
+        ValueError: If two x values are equal in the field.
+    """
+    from shamir_scheme import _batch_inverse
+    x_values = [x % PRIME for x in x_values]
+    tree = product_tree(x_values)
+    root = tree[-1][0]
+    derivative = [i * c % PRIME for i, c in enumerate(root)][1:]
+    values = []
+    _evaluate_subtree(derivative, tree, len(tree) - 1, 0, x_values, values)
+    if 0 in values:
+        raise ValueError(f"Repeated x value: {x_values[values.index(0)]}")
+    level = [[y * inverse % PRIME] for y, inverse in zip(y_values, _batch_inverse(values))]
+    for depth in range(len(tree) - 1):
+        products = tree[depth]
+        level = [_add(poly_mul(level[i], products[i + 1]), poly_mul(level[i + 1], products[i]))
+                 if i + 1 < len(level) else level[i] for i in range(0, len(level), 2)]
+    return level[0] + [0] * (len(x_values) - len(level[0]))
+
+def gao_decode(x_values: Sequence[int], y_values: Sequence[int], k: int):
+    """
+    Finds the polynomial of degree lower than k through all but a few of the points, with Gao's algorithm.
+
+    The points are those of a Reed-Solomon code of length n = len(x_values) and dimension k, so up
+    to (n - k) // 2 wrong y values are corrected. With g0 = prod(x - x_i) and g1 the interpolation
+    of all the points, the extended Euclidean algorithm on (g0, g1) is stopped at the first remainder
+    g of degree lower than (n + k) / 2, where g = u g0 + v g1. The polynomial is then g / v and the
+    wrong points are the roots of v. Every step is a polynomial division, so the cost is polynomial
+    in n instead of trying every subset of k points.
+
+    Args:
+        x_values (Sequence[int]): The x coordinates, distinct in the field.
+        y_values (Sequence[int]): The y coordinates, some of which may be wrong.
+        k (int): The number of coefficients of the polynomial.
+
+    Returns:
+        tuple: The k coefficients of the polynomial, lowest degree first, and the positions of the
+            points it does not go through.
+
+    Raises:
+        ValueError: If k is not between 1 and the number of points, two x values are equal,
+            or there are more wrong points than can be corrected.
+    """
+    n = len(x_values)
+    if not 0 < k <= n:
+        raise ValueError(f"Invalid number of coefficients: {k} for {n} points.")
+    x_values = [x % PRIME for x in x_values]
+    y_values = [y % PRIME for y in y_values]
+    r0, r1 = product_tree(x_values)[-1][0], _trim(interpolate(x_values, y_values))
+    v0, v1 = [], [1]
+    while 2 * (len(r1) - 1) >= n + k:
+        quotient, remainder = poly_divmod(r0, r1)
+        r0, r1 = r1, _trim(remainder)
+        v0, v1 = v1, _trim(_add(v0, [-c % PRIME for c in poly_mul(quotient, v1)]))
+    quotient, remainder = poly_divmod(r1, v1)
+    if _trim(remainder) or len(_trim(quotient)) > k:
+        raise ValueError(f"Too many wrong points, at most {(n - k) // 2} of {n} can be corrected.")
+    coefficients = quotient + [0] * (k - len(quotient))
+    values = multipoint_evaluate(coefficients, x_values)
+    errors = [i for i, (value, y) in enumerate(zip(values, y_values)) if value != y]
+    if 2 * len(errors) > n - k:
+        raise ValueError(f"Too many wrong points, at most {(n - k) // 2} of {n} can be corrected.")
+    return coefficients, errors
+
+def _add(a: Sequence[int], b: Sequence[int]) -> List[int]:
+    """
+    Adds two polynomials over the prime field.
+
+    Args:
+        a (Sequence[int]): The coefficients of the first polynomial.
+        b (Sequence[int]): The coefficients of the second polynomial.
+
+    Returns:
+        List[int]: The coefficients of the sum, as long as the longest polynomial.
+    """
+    if len(a) < len(b):
+        a, b = b, a
+    return [(c + d) % PRIME for c, d in zip(a, b)] + list(a[len(b):])
+
+def _trim(coefficients: List[int]) -> List[int]:
+    """
+    Removes the zero coefficients of highest degree, so the last coefficient is the leading one.
+
+    Args:
+        coefficients (List[int]): The coefficients of a polynomial.
+
+    Returns:
+        List[int]: The same coefficients without the trailing zeros, empty for the zero polynomial.
+    """
+    end = len(coefficients)
+    while end and coefficients[end - 1] == 0:
+        end -= 1
+    return coefficients[:end]
+
+def _evaluate_subtree(remainder: List[int], tree, depth: int, position: int, x_values: Sequence[int], values: List[int]):
+    """
+    Pushes a remainder down one node of the subproduct tree and evaluates its leaves.
+
+    Args:
+        remainder (List[int]): The polynomial reduced modulo the parent node.
+        tree (List[List[List[int]]]): The subproduct tree.
+        depth (int): The level of the node, 0 is the leaves.
+        position (int): The position of the node in its level.
+        x_values (Sequence[int]): All the points.
+        values (List[int]): The list where the values are appended in order.
+    """
+    width = 1 << depth
+    first = position * width
+    last = min(first + width, len(x_values))
+    if len(remainder) >= len(tree[depth][position]):
+        _, remainder = poly_divmod(remainder, tree[depth][position])
+    if last - first <= LEAF_SIZE:
+        for x in x_values[first:last]:
+            value = 0
+            for c in reversed(remainder):
+                value = (value * x + c) % PRIME
+            values.append(value)
+        return
+    _evaluate_subtree(remainder, tree, depth - 1, 2 * position, x_values, values)
+    if 2 * position + 1 < len(tree[depth - 1]):
+        _evaluate_subtree(remainder, tree, depth - 1, 2 * position + 1, x_values, values)
+
+def _inverse_series(f: Sequence[int], length: int) -> List[int]:
+    """
+    Computes the power series inverse of a polynomial by Newton iteration.
+
+    Args:
+        f (Sequence[int]): The coefficients of the polynomial, its constant term must not be zero.
+        length (int): The number of terms of the inverse.
+
+    Returns:
+        List[int]: g such that f * g = 1 modulo x^length.
+    """
+    inverse = [int(field_backend().inverse(f[0]))]
+    size = 1
+    while size < length:
+        size = min(2 * size, length)
+        error = [-c % PRIME for c in poly_mul(f[:size], inverse)[:size]]
+        error[0] = (error[0] + 2) % PRIME
+        inverse = poly_mul(inverse, error)[:size]
+    return inverse
+
+def _pack(coefficients: Sequence[int], slot: int) -> int:
+    """
+    Packs coefficients into one integer with slot bytes per coefficient.
+
+    Args:
+        coefficients (Sequence[int]): The coefficients, lowest degree first.
+        slot (int): The number of bytes of every slot.
+
+    Returns:
+        int: The packed integer.
+    """
+    return int.from_bytes(b"".join(c.to_bytes(slot, 'little') for c in coefficients), 'little')
@@ -0,0 +1,132 @@
+import os
+from instrumentation import span, timed_chunks
+from io_manager import (
+    map_file,
+    open_bytes_file,
+    pipelined,
+    read_bytes_file,
+    read_file_chunks,
+    write_file_chunks
+)
+
+STREAMING_THRESHOLD = 16 * 1024 * 1024
+"""int: Size in bytes from which files in the original AES-CBC format are decrypted in chunks instead of mapped."""
+
+def has_valid_extension(file_path : str, valid_extensions : str):
+    """
+    Checks if the file has a valid extension.
+
+    Args:
+        file_path (str): The path to the file to check.
+        valid_extensions (str): A string containing valid file extensions separated by spaces.
+
+    Returns:
+        bool: True if the file has a valid extension, False otherwise.
+    """
+    return any(file_path.endswith(ext) for ext in valid_extensions)
+
+def validate_file_exists(file_path : str, valid_extensions : str):
+    """
+    Checks if the file exists and has a valid extension.
+
+    Args:
+        file_path (str): The path to the file that needs to be validated.
+        valid_extensions (list of str): A list of valid file extensions.
+
+    Raises:
+        ValueError: If the file does not have a valid extension.
+    """
+    if not has_valid_extension(file_path, valid_extensions):
+        raise ValueError(f"The file must have one of the following extensions: {', '.join(valid_extensions)}.")
+
+def load_key(eval_paths, robust : bool = False):
+    """
+    Reconstructs the key from files of polynomial evaluations in the text or the binary format.
+
+    The files are parsed in chunks and their format is detected from their first bytes. When
+    their headers record the threshold, reading stops as soon as t distinct evaluations are
+    known and the remaining files are never opened.
+
+    In robust mode every evaluation is read and the corrupted ones are found by error-correcting
+    decoding and left out of the reconstruction. With n evaluations, up to (n - t) // 2
+    corrupted ones are found.
+
+    Args:
+        eval_paths (str or list of str): Files with at least t of the n polynomial evaluations.
+        robust (bool): Read every evaluation and ignore the corrupted ones.
+
+    Returns:
+        tuple: The reconstructed key and the list of the corrupted (x, P(x)) evaluations, always empty outside robust mode.
+
+    Raises:
+        ValueError: If the file is not a valid evaluations file.
+        ValueError: In robust mode, if the threshold is not recorded or too many evaluations are corrupted.
+        FileNotFoundError: If the file does not exist.
+        PermissionError: If the file is not readable.
+    """
+    from shamir_scheme import SHARE_CHUNK_SIZE, collect_evaluations, reconstruct_from_evaluations, reconstruct_robust
+    if isinstance(eval_paths, str):
+        eval_paths = [eval_paths]
+    with span("share parsing"):
+        header, evaluations = collect_evaluations((read_file_chunks(path, SHARE_CHUNK_SIZE) for path in eval_paths),
+                                                  not robust)
+    if not robust:
+        with span("reconstruction"):
+            return reconstruct_from_evaluations(evaluations), []
+    if header.threshold is None:
+        raise ValueError("Robust reconstruction needs evaluations files that record the threshold.")
+    with span("reconstruction"):
+        return reconstruct_robust(evaluations, header.threshold)
+
+def encrypt_document(input_path : str, key : bytes, workers : int, compression : str = "none", engine : str = "auto",
+                     envelope : bool = False):
+    """
+    Encrypts one document into a segmented container.
+
+    Args:
+        input_path (str): File with the clear document.
+        key (bytes): The AES key.
+        workers (int): Threads used to encrypt segments.
+        compression (str): "none", "zlib", "lzma" or "bz2", the compression of the segments.
+        engine (str): "auto" or the cipher engine of the segments, see cipher.CIPHER_ENGINES.
+        envelope (bool): Encrypt with a random data key wrapped by key.
+
+    Returns:
+        str: The path of the encrypted file.
+    """
+    from container import DEFAULT_SEGMENT_SIZE, encrypt_container
+    output_file = input_path.replace(".txt", ".aes")
+    chunks = pipelined(read_file_chunks(input_path, DEFAULT_SEGMENT_SIZE))
+    write_file_chunks(output_file, pipelined(encrypt_container(chunks, key, workers, compression=compression,
+                                                                engine=engine, envelope=envelope)))
+    return output_file
+
+def decrypt_document(encrypted_path : str, key : bytes, workers : int):
+    """
+    Decrypts one document, either a segmented container or the original AES-CBC format.
+
+    Files in the original format are decrypted in chunks when they have at least
+    STREAMING_THRESHOLD bytes and through a memory map otherwise.
+
+    Args:
+        encrypted_path (str): File with the encrypted document.
+        key (bytes): The AES key.
+        workers (int): Threads used to decrypt segments.
+
+    Returns:
+        str: The path of the decrypted file.
+    """
+    from cipher import CHUNK_SIZE, decrypt_bytes, decrypt_stream
+    from container import HEADER, decrypt_container, is_container
+    output_file = encrypted_path.replace(".aes", "_revealed.txt")
+    if is_container(read_bytes_file(encrypted_path, HEADER.size)):
+        with open_bytes_file(encrypted_path) as source:
+            write_file_chunks(output_file, pipelined(decrypt_container(source, key, workers)))
+    elif os.path.getsize(encrypted_path) >= STREAMING_THRESHOLD:
+        chunks = pipelined(read_file_chunks(encrypted_path, CHUNK_SIZE))
+        write_file_chunks(output_file, pipelined(timed_chunks("decrypt", decrypt_stream(chunks, key))))
+    else:
+        with map_file(encrypted_path) as encrypted_content, span("decrypt", len(encrypted_content)):
+            decrypted_content = decrypt_bytes(encrypted_content, key)
+        write_file_chunks(output_file, [decrypted_content])
+    return output_file
@@ -0,0 +1,185 @@
+import threading
+import time
+from contextlib import contextmanager
+
+_recorder = None
+
+class Recorder:
+    """
+    Collects the time and the bytes of every named stage of a run.
+
+    Spans nest: the time of a span is its own time, without the time of the spans opened inside
+    it in the same thread, so the stages of a streaming pipeline of generators are separated.
+    Spans of worker threads are added to the same stages, so with several workers the time of a
+    stage may exceed the wall time.
+
+    Attributes:
+        stages (dict): The seconds, bytes and calls of every stage, in order of first use.
+    """
+
+    def __init__(self):
+        """
+        Creates an empty recorder and starts its wall clock.
+        """
+        self.stages = {}
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def add(self, name : str, seconds : float, size : int):
+        """
+        Adds the measurement of one span to its stage.
+
+        Args:
+            name (str): The name of the stage.
+            seconds (float): The own time of the span.
+            size (int): The bytes processed by the span.
+        """
+        with self._lock:
+            stage = self.stages.setdefault(name, {"seconds": 0.0, "bytes": 0, "calls": 0})
+            stage["seconds"] += seconds
+            stage["bytes"] += size
+            stage["calls"] += 1
+
+    def stack(self):
+        """
+        Returns the stack of open spans of the current thread.
+
+        Returns:
+            list: For every open span, the time of the spans nested in it so far.
+        """
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def report(self):
+        """
+        Summarizes the run.
+
+        Returns:
+            dict: The wall time, the time outside every span, the peak resident memory and, for
+                every stage, its seconds, bytes, calls and MB/s when it processed bytes.
+        """
+        wall_seconds = time.perf_counter() - self._start
+        stages = {}
+        for name, stage in self.stages.items():
+            stages[name] = dict(stage)
+            if stage["bytes"] and stage["seconds"]:
+                stages[name]["mb_per_s"] = stage["bytes"] / stage["seconds"] / 1e6
+        return {
+            "wall_seconds": wall_seconds,
+            "unattributed_seconds": wall_seconds - sum(stage["seconds"] for stage in self.stages.values()),
+            "peak_rss_bytes": peak_rss(),
+            "stages": stages
+        }
+
+class _Span:
+    """
+    Measures the own time of one stage, see span.
+    """
+
+    def __init__(self, recorder : Recorder, name : str, size : int):
+        self.recorder = recorder
+        self.name = name
+        self.size = size
+
+    def __enter__(self):
+        self.stack = self.recorder.stack()
+        self.stack.append(0.0)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        elapsed = time.perf_counter() - self.start
+        nested = self.stack.pop()
+        if self.stack:
+            self.stack[-1] += elapsed
+        self.recorder.add(self.name, elapsed - nested, self.size)
+        return False
+
+class _NullSpan:
+    """
+    The span used when nothing is recorded, it costs a single attribute lookup.
+    """
+
+    size = 0
+
+    def __setattr__(self, name, value):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+_NULL_SPAN = _NullSpan()
+
+def span(name : str, size : int = 0):
+    """
+    Opens a span around a stage, to be used as a context manager.
+
+    Args:
+        name (str): The name of the stage, for example "read" or "encrypt".
+        size (int): The bytes processed inside the span.
+
+    Returns:
+        The context manager measuring the span, which does nothing when no Recorder is active.
+    """
+    if _recorder is None:
+        return _NULL_SPAN
+    return _Span(_recorder, name, size)
+
+def timed_chunks(name : str, chunks):
+    """
+    Measures a stream of chunks as a stage, the time spent producing every chunk and its size.
+
+    Args:
+        name (str): The name of the stage.
+        chunks (Iterable[bytes]): The chunks.
+
+    Yields:
+        bytes: The same chunks.
+    """
+    if _recorder is None:
+        yield from chunks
+        return
+    iterator = iter(chunks)
+    while True:
+        with span(name) as current:
+            chunk = next(iterator, None)
+            current.size = len(chunk) if chunk is not None else 0
+        if chunk is None:
+            return
+        yield chunk
+
+@contextmanager
+def recording():
+    """
+    Activates a Recorder for the spans opened inside the block.
+
+    Yields:
+        Recorder: The recorder, whose report is complete when the block ends.
+    """
+    global _recorder
+    previous, _recorder = _recorder, Recorder()
+    try:
+        yield _recorder
+    finally:
+        _recorder = previous
+
+def peak_rss():
+    """
+    Returns the peak resident memory of the process.
+
+    Returns:
+        int: The peak in bytes, or None where the platform does not report it.
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    import sys
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
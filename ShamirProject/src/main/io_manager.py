@@ -1,9 +1,18 @@
-def read_bytes_file(file_path : str):
+import mmap
+import os
+from contextlib import contextmanager
+from instrumentation import span, timed_chunks
+
+PIPELINE_DEPTH = 2
+WRITE_BUFFER_SIZE = 4 * 1024 * 1024
+
+def read_bytes_file(file_path : str, size : int = -1):
     """
     Reads byte content of a file.
     
     Args:
         file_path (str): The path of the file.
+        size (int): The maximum number of bytes to read from the beginning of the file, -1 reads all of it.
     
     Returns:
         bytes: The bytes content of the file.
@@ -13,7 +22,38 @@ def read_bytes_file(file_path : str):
         PermissionError: If the file is not readable.
     """
     with open(file_path, 'rb') as file:
-        return file.read()
+        return file.read(size)
+
+def open_bytes_file(file_path : str):
+    """
+    Opens a file for reading bytes, for consumers that parse it incrementally.
+    
+    Args:
+        file_path (str): The path of the file.
+    
+    Returns:
+        BinaryIO: The open file, to be used as a context manager.
+    
+    Raises:
+        FileNotFoundError: If the file does not exist.
+        PermissionError: If the file is not readable.
+    """
+    file = open(file_path, 'rb')
+    _advise_sequential(file)
+    return file
+
+def _advise_sequential(file):
+    """
+    Tells the kernel that a file is read from start to end, so it reads ahead more aggressively.
+
+    Args:
+        file (BinaryIO): The open file, the hint is skipped where posix_fadvise is not available.
+    """
+    if hasattr(os, "posix_fadvise"):
+        try:
+            os.posix_fadvise(file.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        except OSError:
+            pass
 
 
 def write_bytes_file(file_path : str, data : bytes):
@@ -22,7 +62,7 @@ def write_bytes_file(file_path : str, data : bytes):
     
     Args:
         file_path (str): The path of the file.
-        data (bytes): The byte data to write.
+        data (bytes): The byte data to write, any bytes-like object such as a memoryview is accepted.
     
     Raises:
         FileNotFoundError: If the directory does not exist.
@@ -62,3 +102,302 @@ def write_text_file(file_path : str, data : bytes):
     """
     with open(file_path, 'w', encoding='utf-8') as file:
         file.write(data)
+
+@contextmanager
+def map_file(file_path : str):
+    """
+    Memory-maps a file for reading and exposes it as a read-only memoryview.
+
+    Slicing the view does not copy the content. Slices must not outlive the with block,
+    because the mapping is closed when it exits.
+
+    Args:
+        file_path (str): The path of the file.
+
+    Yields:
+        memoryview: The content of the file.
+
+    Raises:
+        FileNotFoundError: If the file does not exist.
+        PermissionError: If the file is not readable.
+    """
+    with open(file_path, 'rb') as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            yield memoryview(b"")
+            return
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            with memoryview(mapped) as view:
+                yield view
+
+def read_file_chunks(file_path : str, chunk_size : int):
+    """
+    Reads the byte content of a file in fixed-size chunks.
+
+    Args:
+        file_path (str): The path of the file.
+        chunk_size (int): The maximum size in bytes of every chunk.
+
+    Yields:
+        bytes: The next chunk of the file, only the last one may be shorter than chunk_size.
+
+    Raises:
+        FileNotFoundError: If the file does not exist.
+        PermissionError: If the file is not readable.
+    """
+    with open(file_path, 'rb') as file:
+        _advise_sequential(file)
+        yield from timed_chunks("read", iter(lambda: file.read(chunk_size), b""))
+
+def write_file_chunks(file_path : str, chunks):
+    """
+    Writes an iterable of byte chunks to a file as they are produced.
+
+    The chunks are written through a large buffer to a temporary file in the same directory,
+    which is flushed to the disk and replaces file_path only when every chunk was written. If
+    producing a chunk fails, for example because a segment does not authenticate, file_path is
+    left untouched.
+
+    Args:
+        file_path (str): The path of the file.
+        chunks (Iterable[bytes]): The byte chunks to write.
+
+    Returns:
+        int: The number of bytes written.
+
+    Raises:
+        FileNotFoundError: If the directory does not exist.
+        PermissionError: If the directory is not writable.
+    """
+    temporary_path, written = _write_temporary(file_path, chunks)
+    try:
+        os.replace(temporary_path, file_path)
+    except BaseException:
+        os.remove(temporary_path)
+        raise
+    _sync_directory(os.path.dirname(file_path))
+    return written
+
+def stage_files(outputs):
+    """
+    Writes several files to temporary files next to them without replacing any of them yet.
+
+    Together with replace_staged, this replaces a set of files only when every one of them was
+    written, for example the share files of every holder, which must not mix old and new shares.
+    If writing one of the files fails, the temporary files already written are removed.
+
+    Args:
+        outputs (Iterable[Tuple[str, Iterable[bytes]]]): The path and the byte chunks of every file.
+
+    Returns:
+        List[Tuple[str, str]]: The path and the temporary path of every file, for replace_staged or discard_staged.
+
+    Raises:
+        FileNotFoundError: If a directory does not exist.
+        PermissionError: If a directory is not writable.
+    """
+    staged = []
+    try:
+        for file_path, chunks in outputs:
+            temporary_path, _ = _write_temporary(file_path, chunks)
+            staged.append((file_path, temporary_path))
+    except BaseException:
+        discard_staged(staged)
+        raise
+    return staged
+
+def replace_staged(staged):
+    """
+    Replaces every file by its temporary file written with stage_files.
+
+    Args:
+        staged (List[Tuple[str, str]]): The path and the temporary path of every file.
+
+    Raises:
+        OSError: If a file cannot be replaced, the temporary files not used yet are removed.
+    """
+    for i, (file_path, temporary_path) in enumerate(staged):
+        try:
+            os.replace(temporary_path, file_path)
+        except BaseException:
+            discard_staged(staged[i:])
+            raise
+    for directory in {os.path.dirname(file_path) for file_path, _ in staged}:
+        _sync_directory(directory)
+
+def discard_staged(staged):
+    """
+    Removes the temporary files written with stage_files, leaving the files they were meant to replace untouched.
+
+    Args:
+        staged (List[Tuple[str, str]]): The path and the temporary path of every file.
+    """
+    for _, temporary_path in staged:
+        try:
+            os.remove(temporary_path)
+        except FileNotFoundError:
+            pass
+
+def _write_temporary(file_path : str, chunks):
+    """
+    Writes byte chunks to a new temporary file next to a file and flushes it to the disk.
+
+    The temporary file gets the permissions of file_path when it exists. Otherwise it is
+    created with the default permissions of the process, so the umask applies as for open.
+
+    Args:
+        file_path (str): The file the temporary file is meant to replace.
+        chunks (Iterable[bytes]): The byte chunks to write, closed when writing fails.
+
+    Returns:
+        tuple: The path of the temporary file and the number of bytes written.
+
+    Raises:
+        FileNotFoundError: If the directory does not exist.
+        PermissionError: If the directory is not writable.
+    """
+    try:
+        mode = os.stat(file_path).st_mode & 0o7777
+    except OSError:
+        mode = None
+    directory, name = os.path.split(file_path)
+    flags = os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, "O_CLOEXEC", 0)
+    while True:
+        temporary_path = os.path.join(directory, f".{name}.{os.urandom(6).hex()}.tmp")
+        try:
+            descriptor = os.open(temporary_path, flags, 0o666)
+            break
+        except FileExistsError:
+            pass
+        except OSError as e:
+            raise type(e)(e.errno, e.strerror, file_path) from None
+    written = 0
+    try:
+        with open(descriptor, 'wb', buffering=WRITE_BUFFER_SIZE) as file:
+            if mode is not None:
+                os.fchmod(file.fileno(), mode)
+            for chunk in chunks:
+                with span("write", len(chunk)):
+                    file.write(chunk)
+                written += len(chunk)
+            file.flush()
+            os.fsync(file.fileno())
+    except BaseException:
+        os.remove(temporary_path)
+        close = getattr(chunks, "close", None)
+        if close is not None:
+            close()
+        raise
+    return temporary_path, written
+
+def _sync_directory(directory : str):
+    """
+    Flushes the entries of renamed files to the disk, where directories can be opened.
+
+    Args:
+        directory (str): The directory of the renamed files, empty for the current one.
+    """
+    try:
+        descriptor = os.open(directory or ".", os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(descriptor)
+    except OSError:
+        pass
+    finally:
+        os.close(descriptor)
+
+def pipelined(chunks, depth : int = PIPELINE_DEPTH):
+    """
+    Produces the chunks of an iterable on a background thread, ahead of their consumer.
+
+    Chaining pipelined stages, for example reading, encrypting and writing a file, runs every
+    stage on its own thread, so the disk and the cipher work at the same time and the time of
+    the whole pipeline approaches that of its slowest stage instead of their sum. At most depth
+    chunks wait between the stages. An exception of the producer is raised in the consumer, and
+    a consumer that stops early stops the producer. With a single CPU the stages could only take
+    turns, so the chunks are passed through on the calling thread.
+
+    Args:
+        chunks (Iterable[bytes]): The chunks, produced on the background thread.
+        depth (int): The maximum number of chunks produced ahead of the consumer.
+
+    Yields:
+        bytes: The same chunks, in order.
+    """
+    if (os.cpu_count() or 1) < 2:
+        yield from chunks
+        return
+    import queue
+    import threading
+    buffer = queue.Queue(depth)
+    stopped = threading.Event()
+    end = object()
+
+    def put(item):
+        while not stopped.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce():
+        iterator = iter(chunks)
+        try:
+            for chunk in iterator:
+                if not put((chunk, None)):
+                    return
+            put((end, None))
+        except BaseException as e:
+            put((None, e))
+        finally:
+            close = getattr(iterator, "close", None)
+            if close is not None:
+                close()
+
+    producer = threading.Thread(target=produce, daemon=True)
+    producer.start()
+    try:
+        while True:
+            chunk, error = buffer.get()
+            if error is not None:
+                raise error
+            if chunk is end:
+                return
+            yield chunk
+    finally:
+        stopped.set()
+        producer.join()
+
+def expand_paths(patterns, extension : str):
+    """
+    Expands a list of files, directories and glob patterns into the files they name.
+
+    Directories contribute the files directly inside them that have the given extension and
+    glob patterns contribute their matches with that extension. Plain paths are kept as given.
+
+    Args:
+        patterns (Iterable[str]): The files, directories or glob patterns.
+        extension (str): The extension of the files taken from directories and patterns.
+
+    Returns:
+        List[str]: The files, sorted within each pattern and without repetitions.
+
+    Raises:
+        FileNotFoundError: If a directory or a glob pattern does not match any file.
+    """
+    import glob
+    paths = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            matches = sorted(os.path.join(pattern, name) for name in os.listdir(pattern) if name.endswith(extension))
+        elif glob.has_magic(pattern):
+            matches = sorted(path for path in glob.glob(pattern) if path.endswith(extension) and os.path.isfile(path))
+        else:
+            matches = [pattern]
+        if not matches:
+            raise FileNotFoundError(f"No {extension} files match: {pattern}")
+        paths.extend(path for path in matches if path not in paths)
+    return paths
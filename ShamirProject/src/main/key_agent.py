@@ -0,0 +1,340 @@
+import json
+import os
+import socket
+import threading
+import time
+from file_operations import decrypt_document, encrypt_document, load_key, validate_file_exists
+
+DEFAULT_TTL = 300
+"""int: Seconds the reconstructed key is kept in memory before it is dropped and the shares are read again."""
+
+COMMANDS = ("encrypt", "decrypt", "ping", "shutdown")
+
+SHUTDOWN_GRACE = 5
+"""int: Seconds open connections are given to finish after a shutdown request."""
+
+class KeyAgent:
+    """
+    A long running agent that reconstructs the key once and serves encrypt and decrypt requests.
+
+    Requests are newline delimited JSON objects, {"command": "decrypt", "path": "document.aes"},
+    received over a Unix socket. Every request is answered, in order, with a JSON object holding
+    "ok", and "output" and "seconds" or "error". Requests of one connection and of different
+    connections are processed concurrently by a pool of threads.
+
+    Attributes:
+        eval_paths (list of str): Files with at least t of the n polynomial evaluations.
+        ttl (float): Seconds the key is kept in memory after it is reconstructed.
+        workers (int): Threads used to process requests.
+        reconstructions (int): The number of times the key has been reconstructed.
+    """
+
+    def __init__(self, eval_paths : list, ttl : float = DEFAULT_TTL, workers : int = 1):
+        """
+        Creates an agent without key, the shares are read on the first request.
+
+        Args:
+            eval_paths (list of str): Files with at least t of the n polynomial evaluations.
+            ttl (float): Seconds the key is kept in memory after it is reconstructed.
+            workers (int): Threads used to process requests.
+        """
+        self.eval_paths = eval_paths
+        self.ttl = ttl
+        self.workers = workers
+        self.reconstructions = 0
+        self._key = None
+        self._expires = 0.0
+        self._lock = threading.Lock()
+        self._stop = None
+        self._executor = None
+        self._connections = set()
+
+    def key(self):
+        """
+        Returns the key, reconstructing it from the shares when it is missing or expired.
+
+        Returns:
+            bytes: The AES key.
+
+        Raises:
+            ValueError: If the evaluation files are not valid.
+            FileNotFoundError: If an evaluation file does not exist.
+            PermissionError: If an evaluation file is not readable.
+        """
+        with self._lock:
+            if self._key is None or time.monotonic() >= self._expires:
+                self._key = load_key(self.eval_paths)[0].to_bytes(32, 'big')
+                self._expires = time.monotonic() + self.ttl
+                self.reconstructions += 1
+            return self._key
+
+    def forget_expired(self):
+        """
+        Drops the key from memory once its time to live is over.
+
+        Returns:
+            float: The seconds until the key expires, or ttl when there is no key.
+        """
+        with self._lock:
+            remaining = self._expires - time.monotonic()
+            if self._key is not None and remaining <= 0:
+                self._key = None
+            return remaining if self._key is not None else self.ttl
+
+    def handle(self, request):
+        """
+        Processes one encrypt or decrypt request.
+
+        Args:
+            request (dict): The request, with a "command" and the "path" of the document.
+
+        Returns:
+            dict: The response, with "ok" and either "output" and "seconds" or "error".
+        """
+        start = time.perf_counter()
+        try:
+            command, path = request.get("command"), request.get("path")
+            if command not in ("encrypt", "decrypt") or not isinstance(path, str):
+                raise ValueError(f"Invalid request: {request}")
+            validate_file_exists(path, ['.txt'] if command == "encrypt" else ['.aes'])
+            function = encrypt_document if command == "encrypt" else decrypt_document
+            output_file = function(path, self.key(), 1)
+            return {"ok": True, "output": output_file, "seconds": time.perf_counter() - start}
+        except ValueError as e:
+            return {"ok": False, "error": str(e)}
+        except OSError as e:
+            return {"ok": False, "error": f"File error: {e}"}
+
+    def run(self, socket_path : str, ready = None):
+        """
+        Serves requests on a Unix socket until a shutdown request arrives.
+
+        The socket is created readable and writable only by its owner. An existing path is only
+        replaced when it is a socket nobody listens on, left behind by an agent that did not exit
+        cleanly. On exit the socket is removed if the path still names the socket this agent created.
+
+        Args:
+            socket_path (str): The path of the Unix socket.
+            ready (Callable): Called without arguments once the agent accepts connections, None does nothing.
+
+        Raises:
+            FileExistsError: If the path exists and is not a socket.
+            OSError: If another agent listens on the socket or it cannot be created.
+        """
+        import asyncio
+        listener, identity = _bind_socket(socket_path)
+        try:
+            asyncio.run(self._serve(listener, ready))
+        finally:
+            listener.close()
+            _remove_socket(socket_path, identity)
+
+    async def _serve(self, listener : socket.socket, ready = None):
+        """
+        Listens on the socket, drops the key when it expires and waits for a shutdown request.
+
+        After the shutdown request no connection is accepted and the open ones are given
+        SHUTDOWN_GRACE seconds to finish.
+
+        Args:
+            listener (socket.socket): The bound Unix socket.
+            ready (Callable): Called once the agent accepts connections, None does nothing.
+        """
+        import asyncio
+        from concurrent.futures import ThreadPoolExecutor
+        self._stop = asyncio.Event()
+        self._executor = ThreadPoolExecutor(max_workers=self.workers)
+        try:
+            server = await asyncio.start_unix_server(self._serve_connection, sock=listener)
+            async with server:
+                if ready is not None:
+                    ready()
+                while not self._stop.is_set():
+                    try:
+                        await asyncio.wait_for(self._stop.wait(), max(self.forget_expired(), 0.01))
+                    except asyncio.TimeoutError:
+                        pass
+                server.close()
+                if self._connections:
+                    await asyncio.wait(self._connections, timeout=SHUTDOWN_GRACE)
+        finally:
+            self._executor.shutdown(wait=True)
+            with self._lock:
+                self._key = None
+
+    async def _serve_connection(self, reader, writer):
+        """
+        Reads the requests of one connection and answers them in order as they complete.
+
+        At most 2 × workers requests of a connection are in flight, so a client that sends
+        faster than the agent decrypts is slowed down instead of filling the memory. A request
+        that fails unexpectedly is answered with an error, a request longer than the stream limit
+        is answered with an error and ends the connection, and a connection whose answers can no
+        longer be written stops being read.
+
+        Args:
+            reader (asyncio.StreamReader): The incoming side of the connection.
+            writer (asyncio.StreamWriter): The outgoing side of the connection.
+        """
+        import asyncio
+        self._connections.add(asyncio.current_task())
+        pending = asyncio.Queue(maxsize=2 * self.workers)
+
+        async def respond():
+            while True:
+                task = await pending.get()
+                if task is None:
+                    return
+                try:
+                    response = await task
+                except Exception as e:
+                    response = {"ok": False, "error": f"Internal error: {e!r}"}
+                writer.write(json.dumps(response).encode('utf-8') + b"\n")
+                await writer.drain()
+
+        async def enqueue(item):
+            putting = asyncio.ensure_future(pending.put(item))
+            await asyncio.wait({putting, responder}, return_when=asyncio.FIRST_COMPLETED)
+            if not putting.done():
+                putting.cancel()
+                return False
+            return True
+
+        responder = asyncio.create_task(respond())
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    rejected = asyncio.get_running_loop().create_future()
+                    rejected.set_result({"ok": False, "error": "Invalid request: longer than the stream limit."})
+                    await enqueue(rejected)
+                    break
+                if not line or not await enqueue(asyncio.create_task(self._dispatch(line))):
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            await enqueue(None)
+            try:
+                await responder
+            except ConnectionError:
+                pass
+            writer.close()
+            self._connections.discard(asyncio.current_task())
+
+    async def _dispatch(self, line : bytes):
+        """
+        Decodes one request and runs it in the thread pool.
+
+        Args:
+            line (bytes): The JSON request.
+
+        Returns:
+            dict: The response.
+        """
+        import asyncio
+        try:
+            request = json.loads(line)
+        except ValueError:
+            return {"ok": False, "error": "Invalid request: not JSON."}
+        if not isinstance(request, dict) or request.get("command") not in COMMANDS:
+            return {"ok": False, "error": f"Invalid request: {request}"}
+        if request["command"] == "ping":
+            return {"ok": True}
+        if request["command"] == "shutdown":
+            self._stop.set()
+            return {"ok": True}
+        return await asyncio.get_running_loop().run_in_executor(self._executor, self.handle, request)
+
+def _bind_socket(socket_path : str):
+    """
+    Creates the Unix socket of an agent without taking over a path that is in use.
+
+    A socket left behind by an agent that did not exit cleanly refuses connections and is replaced.
+    The socket is restricted to its owner before it listens, so nobody else can connect in between.
+
+    Args:
+        socket_path (str): The path of the Unix socket.
+
+    Returns:
+        tuple: The bound socket and the (device, inode) of its path.
+
+    Raises:
+        FileExistsError: If the path exists and is not a socket.
+        OSError: If another agent listens on the socket or it cannot be created.
+    """
+    import errno
+    import stat
+    try:
+        status = os.lstat(socket_path)
+    except FileNotFoundError:
+        status = None
+    if status is not None:
+        if not stat.S_ISSOCK(status.st_mode):
+            raise FileExistsError(errno.EEXIST, "The path exists and is not a socket", socket_path)
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+            try:
+                probe.connect(socket_path)
+            except ConnectionRefusedError:
+                pass
+            else:
+                raise OSError(errno.EADDRINUSE, "An agent is already listening on the socket", socket_path)
+        _remove_socket(socket_path, (status.st_dev, status.st_ino))
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        listener.bind(socket_path)
+        status = os.lstat(socket_path)
+        os.chmod(socket_path, 0o600)
+    except BaseException:
+        listener.close()
+        raise
+    return listener, (status.st_dev, status.st_ino)
+
+def _remove_socket(socket_path : str, identity : tuple):
+    """
+    Removes a socket path if it still names the same file.
+
+    Args:
+        socket_path (str): The path of the Unix socket.
+        identity (tuple): The (device, inode) of the socket to remove.
+    """
+    try:
+        status = os.lstat(socket_path)
+        if (status.st_dev, status.st_ino) == identity:
+            os.remove(socket_path)
+    except FileNotFoundError:
+        pass
+
+def send_requests(socket_path : str, requests : list):
+    """
+    Sends requests to a running agent over one connection and waits for all the responses.
+
+    The requests are written at once and the agent answers them in order, so the round trips
+    of the documents overlap.
+
+    Args:
+        socket_path (str): The path of the Unix socket of the agent.
+        requests (list of dict): The requests.
+
+    Returns:
+        list of dict: The response to every request, in order.
+
+    Raises:
+        FileNotFoundError: If there is no agent listening on the socket.
+        ConnectionError: If the agent closes the connection before answering.
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+        try:
+            connection.connect(socket_path)
+        except ConnectionRefusedError:
+            raise FileNotFoundError(f"No agent is listening on: {socket_path}")
+        sender = threading.Thread(target=connection.sendall,
+                                  args=(b"".join(json.dumps(request).encode('utf-8') + b"\n" for request in requests),))
+        sender.start()
+        with connection.makefile('rb') as stream:
+            responses = [stream.readline() for _ in requests]
+        sender.join()
+    if not all(responses):
+        raise ConnectionError("The agent closed the connection before answering.")
+    return [json.loads(response) for response in responses]
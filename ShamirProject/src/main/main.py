@@ -1,41 +1,22 @@
 import argparse
 import getpass
-from shamir_scheme import generate_shares, reconstruct_secret
-from cipher import encrypt, decrypt, get_key
+import os
+import time
+from contextlib import contextmanager
+from file_operations import decrypt_document, encrypt_document, load_key, validate_file_exists
+from instrumentation import span
 from io_manager import (
+    discard_staged,
+    expand_paths,
+    open_bytes_file,
+    pipelined,
     read_bytes_file,
-    read_text_file,
-    write_bytes_file,
-    write_text_file
+    read_file_chunks,
+    replace_staged,
+    stage_files,
+    write_file_chunks
 )
 
-def has_valid_extension(file_path : str, valid_extensions : str):
-    """
-    Checks if the file has a valid extension.
-
-    Args:
-        file_path (str): The path to the file to check.
-        valid_extensions (str): A string containing valid file extensions separated by spaces.
-
-    Returns:
-        bool: True if the file has a valid extension, False otherwise.
-    """
-    return any(file_path.endswith(ext) for ext in valid_extensions)
-
-def validate_file_exists(file_path : str, valid_extensions : str):
-    """
-    Checks if the file exists and has a valid extension.
-
-    Args:
-        file_path (str): The path to the file that needs to be validated.
-        valid_extensions (list of str): A list of valid file extensions.
-
-    Raises:
-        ValueError: If the file does not have a valid extension.
-    """
-    if not has_valid_extension(file_path, valid_extensions):
-        raise ValueError(f"The file must have one of the following extensions: {', '.join(valid_extensions)}.")
-
 def validate_n_t(n : int, t : int):
     """
     Validates the values of n and t.
@@ -55,6 +36,62 @@ def validate_n_t(n : int, t : int):
     if n <= 2 or t <= 1 or t > n:
         raise ValueError("Invalid values for n and t. Ensure that n > 2 and 1 < t ≤ n.")
 
+def validate_workers(workers : int):
+    """
+    Validates the number of workers.
+
+    Parameters:
+        workers (int): The number of threads or processes used to encrypt or decrypt.
+
+    Raises:
+        ValueError: If workers is less than 1.
+    """
+    if workers < 1:
+        raise ValueError("Invalid number of workers. Ensure that workers ≥ 1.")
+
+def add_instrumentation_arguments(parser : argparse.ArgumentParser):
+    """
+    Adds the --timings and --profile options to a subcommand.
+
+    Args:
+        parser (argparse.ArgumentParser): The parser of the subcommand.
+    """
+    parser.add_argument('--timings', action='store_true', help='Print a JSON breakdown of the time, bytes and MB/s of every stage (runs in one process)')
+    parser.add_argument('--profile', type=str, default=None, help='Write a cProfile dump of the run to this file (runs in one process)')
+
+@contextmanager
+def instrumented(timings : bool, profile_path : str = None):
+    """
+    Records the stages of the commands run inside the block and profiles them on request.
+
+    The spans opened by this module, io_manager, cipher and container are only measured inside
+    the block. Files are processed in the current process, so every stage is seen.
+
+    Args:
+        timings (bool): Print the JSON report of the stages, the wall time and the peak memory at the end.
+        profile_path (str): File where the cProfile statistics are written, None disables profiling.
+    """
+    if not timings and not profile_path:
+        yield
+        return
+    import json
+    from instrumentation import recording
+    profiler = None
+    if profile_path:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+    with recording() as recorder:
+        try:
+            yield
+        finally:
+            if profiler:
+                profiler.disable()
+                profiler.dump_stats(profile_path)
+                print(f"Profile saved in: {profile_path}")
+            if timings:
+                print(json.dumps(recorder.report(), indent=2))
+
 def main():
     """
     Main function to handle command-line arguments and execute the appropriate
@@ -62,33 +99,129 @@ def main():
     """
     parser = argparse.ArgumentParser(description="Shamir's Secret Sharing Scheme")
     subparsers = parser.add_subparsers(dest='command', help='Sub-command help')
-    encrypt_parser = subparsers.add_parser('c', help='Encrypt a file')
+    encrypt_parser = subparsers.add_parser('c', help='Encrypt one or more files')
     encrypt_parser.add_argument('eval_file', type=str, help='Path to save the polynomial evaluations (.frg)')
     encrypt_parser.add_argument('n', type=int, help='Total number of evaluations (n > 2)')
     encrypt_parser.add_argument('t', type=int, help='Minimum number of points needed to decrypt (1 < t ≤ n)')
-    encrypt_parser.add_argument('input_file', type=str, help='File with the clear document (.txt)')
-    decrypt_parser = subparsers.add_parser('d', help='Decrypt a file')
-    decrypt_parser.add_argument('eval_file', type=str, help='File with at least t of the n polynomial evaluations (.frg)')
-    decrypt_parser.add_argument('encrypted_file', type=str, help='File with the encrypted document (.aes)')
+    encrypt_parser.add_argument('input_file', type=str, nargs='+', help='Files, directories or glob patterns with the clear documents (.txt)')
+    encrypt_parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Threads used to encrypt segments (default: number of CPUs)')
+    encrypt_parser.add_argument('--processes', type=int, default=os.cpu_count() or 1, help='Processes used to encrypt several files (default: number of CPUs)')
+    add_instrumentation_arguments(encrypt_parser)
+    encrypt_parser.add_argument('--share-format', choices=['text', 'binary'], default='text', help='Format of the evaluations file (default: text)')
+    encrypt_parser.add_argument('--per-holder', action='store_true', help='Save every evaluation in its own file, named after eval_file with the number of the holder')
+    encrypt_parser.add_argument('--compression', choices=['none', 'zlib', 'lzma', 'bz2'], default='none', help='Compress the segments before encrypting them, skipped for documents that do not compress (default: none)')
+    encrypt_parser.add_argument('--envelope', action='store_true', help='Encrypt every document with a random data key wrapped by the key, so the key can be rotated without encrypting again')
+    encrypt_parser.add_argument('--cipher', choices=['auto', 'aes-gcm', 'aes-ctr-hmac', 'chacha20-poly1305'], default='auto', help='Cipher of the segments, auto measures the fastest on this host once and caches it (default: auto)')
+    decrypt_parser = subparsers.add_parser('d', help='Decrypt one or more files')
+    decrypt_parser.add_argument('eval_file', type=str, help='File, directory or glob pattern with at least t of the n polynomial evaluations (.frg)')
+    decrypt_parser.add_argument('encrypted_file', type=str, nargs='+', help='Files, directories or glob patterns with the encrypted documents (.aes)')
+    decrypt_parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Threads used to decrypt segments (default: number of CPUs)')
+    decrypt_parser.add_argument('--processes', type=int, default=os.cpu_count() or 1, help='Processes used to decrypt several files (default: number of CPUs)')
+    decrypt_parser.add_argument('--robust', action='store_true', help='Read every evaluation and find and ignore the corrupted ones, needs the threshold in the evaluations files')
+    add_instrumentation_arguments(decrypt_parser)
+    range_parser = subparsers.add_parser('p', help='Decrypt a byte range of a file')
+    range_parser.add_argument('eval_file', type=str, help='File, directory or glob pattern with at least t of the n polynomial evaluations (.frg)')
+    range_parser.add_argument('encrypted_file', type=str, help='File with the encrypted document (.aes)')
+    range_parser.add_argument('--offset', type=int, default=0, help='First byte of the range, negative values count from the end (default: 0)')
+    range_parser.add_argument('--length', type=int, default=None, help='Number of bytes of the range (default: up to the end)')
+    range_parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Threads used to decrypt segments (default: number of CPUs)')
+    range_parser.add_argument('--robust', action='store_true', help='Read every evaluation and find and ignore the corrupted ones, needs the threshold in the evaluations files')
+    add_instrumentation_arguments(range_parser)
+    extend_parser = subparsers.add_parser('e', help='Issue new evaluations of the same key from t existing ones')
+    extend_parser.add_argument('eval_file', type=str, help='File, directory or glob pattern with at least t of the n polynomial evaluations (.frg)')
+    extend_parser.add_argument('count', type=int, help='Number of new evaluations')
+    extend_parser.add_argument('--output', type=str, default=None, help='File for the new evaluations (.frg), by default they are added to eval_file')
+    refresh_parser = subparsers.add_parser('r', help='Replace every evaluation by a new one of the same key')
+    refresh_parser.add_argument('eval_file', type=str, help='File, directory or glob pattern with the evaluations of every holder (.frg)')
+    rotate_parser = subparsers.add_parser('k', help='Change the password and the evaluations of envelope encrypted files without encrypting them again')
+    rotate_parser.add_argument('eval_file', type=str, help='File, directory or glob pattern with at least t of the n current polynomial evaluations (.frg)')
+    rotate_parser.add_argument('new_eval_file', type=str, help='Path to save the new polynomial evaluations (.frg)')
+    rotate_parser.add_argument('n', type=int, help='Total number of new evaluations (n > 2)')
+    rotate_parser.add_argument('t', type=int, help='Minimum number of new points needed to decrypt (1 < t ≤ n)')
+    rotate_parser.add_argument('encrypted_file', type=str, nargs='+', help='Files, directories or glob patterns with the encrypted documents (.aes)')
+    rotate_parser.add_argument('--share-format', choices=['text', 'binary'], default='text', help='Format of the new evaluations file (default: text)')
+    rotate_parser.add_argument('--per-holder', action='store_true', help='Save every new evaluation in its own file, named after new_eval_file with the number of the holder')
+    agent_parser = subparsers.add_parser('a', help='Run an agent that keeps the key and serves requests on a Unix socket')
+    agent_parser.add_argument('eval_file', type=str, help='File, directory or glob pattern with at least t of the n polynomial evaluations (.frg)')
+    agent_parser.add_argument('socket', type=str, help='Path of the Unix socket')
+    agent_parser.add_argument('--ttl', type=float, default=300, help='Seconds the key is kept in memory before the evaluations are read again (default: 300)')
+    agent_parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Threads used to serve requests (default: number of CPUs)')
+    send_parser = subparsers.add_parser('s', help='Encrypt or decrypt files through a running agent')
+    send_parser.add_argument('socket', type=str, help='Path of the Unix socket of the agent')
+    send_parser.add_argument('action', choices=['c', 'd'], help='c encrypts .txt files, d decrypts .aes files')
+    send_parser.add_argument('files', type=str, nargs='+', help='Files, directories or glob patterns with the documents')
     args = parser.parse_args()
+    if getattr(args, 'timings', False) or getattr(args, 'profile', None):
+        args.processes = 1
     try:
-        if args.command == 'c':
-            validate_file_exists(args.eval_file, ['.frg'])
-            validate_file_exists(args.input_file, ['.txt'])
-            validate_n_t(args.n, args.t)
-            encrypt_file(args.eval_file, args.n, args.t, args.input_file)
-        elif args.command == 'd':
-            validate_file_exists(args.eval_file, ['.frg'])
-            validate_file_exists(args.encrypted_file, ['.aes'])
-            decrypt_file(args.eval_file, args.encrypted_file)
-        else:
-            parser.print_help()
+        with instrumented(getattr(args, 'timings', False), getattr(args, 'profile', None)):
+            if args.command == 'c':
+                validate_file_exists(args.eval_file, ['.frg'])
+                input_files = expand_paths(args.input_file, '.txt')
+                for input_file in input_files:
+                    validate_file_exists(input_file, ['.txt'])
+                validate_n_t(args.n, args.t)
+                validate_workers(args.workers)
+                validate_workers(args.processes)
+                encrypt_files(args.eval_file, args.n, args.t, input_files, args.workers, args.processes,
+                              args.share_format, args.per_holder, args.compression, args.cipher, args.envelope)
+            elif args.command == 'd':
+                eval_files = expand_paths([args.eval_file], '.frg')
+                for eval_file in eval_files:
+                    validate_file_exists(eval_file, ['.frg'])
+                encrypted_files = expand_paths(args.encrypted_file, '.aes')
+                for encrypted_file in encrypted_files:
+                    validate_file_exists(encrypted_file, ['.aes'])
+                validate_workers(args.workers)
+                validate_workers(args.processes)
+                decrypt_files(eval_files, encrypted_files, args.workers, args.processes, args.robust)
+            elif args.command == 'p':
+                eval_files = expand_paths([args.eval_file], '.frg')
+                for eval_file in eval_files:
+                    validate_file_exists(eval_file, ['.frg'])
+                validate_file_exists(args.encrypted_file, ['.aes'])
+                validate_workers(args.workers)
+                decrypt_range_file(eval_files, args.encrypted_file, args.offset, args.length, args.workers, args.robust)
+            elif args.command == 'e':
+                eval_files = expand_paths([args.eval_file], '.frg')
+                for eval_file in eval_files + ([args.output] if args.output else []):
+                    validate_file_exists(eval_file, ['.frg'])
+                extend_shares(eval_files, args.count, args.output)
+            elif args.command == 'r':
+                eval_files = expand_paths([args.eval_file], '.frg')
+                for eval_file in eval_files:
+                    validate_file_exists(eval_file, ['.frg'])
+                refresh_shares(eval_files)
+            elif args.command == 'k':
+                eval_files = expand_paths([args.eval_file], '.frg')
+                for eval_file in eval_files + [args.new_eval_file]:
+                    validate_file_exists(eval_file, ['.frg'])
+                encrypted_files = expand_paths(args.encrypted_file, '.aes')
+                for encrypted_file in encrypted_files:
+                    validate_file_exists(encrypted_file, ['.aes'])
+                validate_n_t(args.n, args.t)
+                rotate_files(eval_files, args.new_eval_file, args.n, args.t, encrypted_files,
+                             args.share_format, args.per_holder)
+            elif args.command == 'a':
+                eval_files = expand_paths([args.eval_file], '.frg')
+                for eval_file in eval_files:
+                    validate_file_exists(eval_file, ['.frg'])
+                validate_workers(args.workers)
+                run_agent(eval_files, args.socket, args.ttl, args.workers)
+            elif args.command == 's':
+                extension = '.txt' if args.action == 'c' else '.aes'
+                paths = expand_paths(args.files, extension)
+                for path in paths:
+                    validate_file_exists(path, [extension])
+                send_to_agent(args.socket, args.action, paths)
+            else:
+                parser.print_help()
     except ValueError as e:
         print(f"Error: {e}")
     except (FileNotFoundError, PermissionError) as e:
         print(f"File error: {e}")
 
-def encrypt_file(eval_path : str, n : int, t : int, input_path : str):
+def encrypt_file(eval_path : str, n : int, t : int, input_path : str, workers : int = 1):
     """
     Encrypts a file and generates polynomial evaluations for Shamir's Secret Sharing Scheme.
 
@@ -97,41 +230,485 @@ def encrypt_file(eval_path : str, n : int, t : int, input_path : str):
         n (int): Total number of evaluations (n > 2).
         t (int): Minimum number of points needed to decrypt (1 < t ≤ n).
         input_file (str): File with the clear document.
+        workers (int): Threads used to encrypt segments.
+    """
+    encrypt_files(eval_path, n, t, [input_path], workers)
+
+def encrypt_files(eval_path : str, n : int, t : int, input_paths : list, workers : int = 1, processes : int = 1,
+                  share_format : str = "text", per_holder : bool = False, compression : str = "none",
+                  engine : str = "auto", envelope : bool = False):
     """
+    Encrypts several files under one password and generates a single set of polynomial evaluations.
+
+    The password is asked and the shares are generated once. Every document is read in segments
+    and written as a segmented container, so memory use stays flat and the segments are encrypted
+    in parallel, while the documents themselves are spread over a pool of processes. The threshold
+    is recorded in the header of the evaluations file, so decryption reads only t evaluations.
+
+    Args:
+        eval_file (str): File to save the polynomial evaluations.
+        n (int): Total number of evaluations (n > 2).
+        t (int): Minimum number of points needed to decrypt (1 < t ≤ n).
+        input_paths (list of str): Files with the clear documents.
+        workers (int): Threads used to encrypt the segments of each file.
+        processes (int): Processes used to encrypt several files at once.
+        share_format (str): "text" or "binary", the format of the evaluations file.
+        per_holder (bool): Save every evaluation in its own file, eval_path with the number of the holder.
+        compression (str): "none", "zlib", "lzma" or "bz2", the compression of the segments.
+        engine (str): "auto" or the cipher engine of the segments, see cipher.CIPHER_ENGINES.
+        envelope (bool): Encrypt every document with a random data key wrapped by the key, see rotate_files.
+    """
+    from functools import partial
+    from shamir_scheme import generate_evaluations
+    from cipher import get_key, resolve_engine
     try:
+        engine = resolve_engine(engine)
         password = getpass.getpass("Enter password: ")
-        text = read_text_file(input_path)
-        encrypted_content = encrypt(text, password)
-        write_bytes_file(input_path.replace(".txt", ".aes"), encrypted_content)
-        shares = generate_shares(int.from_bytes(get_key(password), 'big'), n, t)
-        write_text_file(eval_path, shares)
-        print(f"File encrypted and saved as: {input_path.replace('.txt', '.aes')}")
-        print(f"Evaluations saved in: {eval_path}")
+        key = get_key(password)
+        with span("share generation"):
+            evaluations = generate_evaluations(int.from_bytes(key, 'big'), n, t)
+        start = time.perf_counter()
+        results = _run_batch(partial(encrypt_document, compression=compression, engine=engine, envelope=envelope),
+                             input_paths, key, workers, processes)
+        elapsed = time.perf_counter() - start
+        if any(error is None for _, _, _, error in results):
+            _save_evaluations(eval_path, evaluations, t, share_format, per_holder)
+        _print_batch_summary(results, "encrypted", elapsed)
     except ValueError as e:
         print(f"Encryption error: {e}")
     except (FileNotFoundError, PermissionError ) as e:
         print(f"Unexpected error during writing: {e}")
 
-def decrypt_file(eval_path : str, encrypted_path : str):
+def _save_evaluations(eval_path : str, evaluations : list, t : int, share_format : str, per_holder : bool):
+    """
+    Writes the evaluations to one file, or to one file per holder.
+
+    Args:
+        eval_path (str): File to save the polynomial evaluations.
+        evaluations (list of tuple): The (x, P(x)) points.
+        t (int): The threshold recorded in the header of the files.
+        share_format (str): "text" or "binary", the format of the files.
+        per_holder (bool): Save every evaluation in its own file, eval_path with the number of the holder.
+    """
+    with span("share formatting"):
+        replace_staged(stage_files(_evaluation_files(eval_path, evaluations, t, share_format, per_holder)))
+    _print_saved_evaluations(eval_path, len(evaluations), per_holder)
+
+def _evaluation_files(eval_path : str, evaluations : list, t : int, share_format : str, per_holder : bool):
+    """
+    Encodes the evaluations as one file, or as one file per holder.
+
+    Args:
+        eval_path (str): File to save the polynomial evaluations.
+        evaluations (list of tuple): The (x, P(x)) points.
+        t (int): The threshold recorded in the header of the files.
+        share_format (str): "text" or "binary", the format of the files.
+        per_holder (bool): Save every evaluation in its own file, eval_path with the number of the holder.
+
+    Returns:
+        list of tuple: The path and the byte chunks of every file, for io_manager.stage_files.
+    """
+    from shamir_scheme import encode_evaluations
+    if per_holder:
+        return [(share_path, encode_evaluations([evaluation], share_format, t))
+                for share_path, evaluation in zip(holder_paths(eval_path, len(evaluations)), evaluations)]
+    return [(eval_path, encode_evaluations(evaluations, share_format, t))]
+
+def _print_saved_evaluations(eval_path : str, n : int, per_holder : bool):
+    """
+    Prints where the evaluations were saved.
+
+    Args:
+        eval_path (str): File of the polynomial evaluations.
+        n (int): The number of evaluations.
+        per_holder (bool): Every evaluation was saved in its own file.
+    """
+    if per_holder:
+        share_paths = holder_paths(eval_path, n)
+        print(f"Evaluations saved in: {share_paths[0]} ... {share_paths[-1]}")
+    else:
+        print(f"Evaluations saved in: {eval_path}")
+
+def rotate_files(eval_paths : list, new_eval_path : str, n : int, t : int, encrypted_paths : list,
+                 share_format : str = "text", per_holder : bool = False):
+    """
+    Changes the password of envelope encrypted files and replaces their evaluations.
+
+    The current key is reconstructed from the evaluations and a new password is asked. Every file
+    keeps its data key and its segments, only its wrapped data key is rewritten, so the cost per
+    file is a few dozen bytes whatever its size. Files that fail, for example because they were not
+    encrypted in envelope mode, keep the current key, so the current evaluations must be kept until
+    they are encrypted again.
+
+    The new evaluations are written to temporary files before any file is rotated, so a failed
+    write leaves every file under the current key. They replace new_eval_path once at least one
+    file was rotated. If that replacement fails, the rotated files are given back the current key.
+
+    Args:
+        eval_paths (list of str): Files with at least t of the n current polynomial evaluations.
+        new_eval_path (str): File to save the new polynomial evaluations.
+        n (int): Total number of new evaluations (n > 2).
+        t (int): Minimum number of new points needed to decrypt (1 < t ≤ n).
+        encrypted_paths (list of str): Files with the encrypted documents.
+        share_format (str): "text" or "binary", the format of the new evaluations file.
+        per_holder (bool): Save every new evaluation in its own file, new_eval_path with the number of the holder.
+    """
+    from shamir_scheme import generate_evaluations
+    from cipher import get_key
+    try:
+        replaced = {os.path.abspath(path) for path in (holder_paths(new_eval_path, n) if per_holder else [new_eval_path])}
+        if replaced & {os.path.abspath(path) for path in eval_paths}:
+            raise ValueError("The new evaluations must not overwrite the current ones.")
+        key = load_secret(eval_paths).to_bytes(32, 'big')
+        new_key = get_key(getpass.getpass("Enter new password: "))
+        with span("share generation"):
+            evaluations = generate_evaluations(int.from_bytes(new_key, 'big'), n, t)
+        with span("share formatting"):
+            staged = stage_files(_evaluation_files(new_eval_path, evaluations, t, share_format, per_holder))
+        start = time.perf_counter()
+        try:
+            results = _run_batch(_rotate_one, encrypted_paths, (key, new_key), 1, 1)
+        except BaseException:
+            # Some files may already use the new key, so the new evaluations are kept.
+            replace_staged(staged)
+            raise
+        elapsed = time.perf_counter() - start
+        rotated = [path for path, _, _, error in results if error is None]
+        if rotated:
+            try:
+                replace_staged(staged)
+            except OSError:
+                _run_batch(_rotate_one, rotated, (new_key, key), 1, 1)
+                raise
+            _print_saved_evaluations(new_eval_path, n, per_holder)
+        else:
+            discard_staged(staged)
+        _print_batch_summary(results, "rotated", elapsed)
+    except ValueError as e:
+        print(f"Rotation error: {e}")
+    except (FileNotFoundError, PermissionError) as e:
+        print(f"Unexpected error during rotation: {e}")
+
+def _rotate_one(encrypted_path : str, keys : tuple, workers : int):
+    """
+    Rewraps the data key of one envelope encrypted document and flushes it to the disk.
+
+    Args:
+        encrypted_path (str): File with the encrypted document.
+        keys (tuple): The current and the new key.
+        workers (int): Unused, for _timed.
+
+    Returns:
+        str: The path of the rotated file.
+    """
+    from container import rewrap_key
+    with open(encrypted_path, 'r+b') as target:
+        rewrap_key(target, *keys)
+        os.fsync(target.fileno())
+    return encrypted_path
+
+def holder_paths(eval_path : str, n : int):
+    """
+    Names the evaluation file of every holder after the evaluations file.
+
+    Args:
+        eval_path (str): The evaluations file, for example shares.frg.
+        n (int): The number of holders.
+
+    Returns:
+        list of str: shares_1.frg to shares_n.frg, next to eval_path.
+    """
+    stem, extension = os.path.splitext(eval_path)
+    return [f"{stem}_{i}{extension}" for i in range(1, n + 1)]
+
+def decrypt_file(eval_path : str, encrypted_path : str, workers : int = 1):
     """
     Decrypts a file using polynomial evaluations from Shamir's Secret Sharing Scheme.
 
     Args:
         eval_file (str): File with at least t of the n polynomial evaluations.
         encrypted_file (str): File with the encrypted document.
+        workers (int): Threads used to decrypt segments.
+    """
+    decrypt_files(eval_path, [encrypted_path], workers)
+
+def decrypt_files(eval_paths, encrypted_paths : list, workers : int = 1, processes : int = 1, robust : bool = False):
+    """
+    Decrypts several files using one reconstruction of the key from the polynomial evaluations.
+
+    The evaluations may be spread over several files, they are read until the threshold is
+    reached. Segmented containers are decrypted in parallel. Files in the original AES-CBC format are
+    decrypted in chunks when they have at least file_operations.STREAMING_THRESHOLD bytes. The documents
+    themselves are spread over a pool of processes.
+
+    Args:
+        eval_paths (str or list of str): Files with at least t of the n polynomial evaluations.
+        encrypted_paths (list of str): Files with the encrypted documents.
+        workers (int): Threads used to decrypt the segments of each file.
+        processes (int): Processes used to decrypt several files at once.
+        robust (bool): Read every evaluation and ignore the corrupted ones, see load_secret.
     """
     try:
-        shares = read_text_file(eval_path)
-        k = reconstruct_secret(shares)
-        encrypted_content = read_bytes_file(encrypted_path)
-        decrypted_content = decrypt(encrypted_content, k.to_bytes((k.bit_length() + 7) // 8, 'big'))
-        output_file = encrypted_path.replace(".aes", "_revealed.txt")
-        write_text_file(output_file, decrypted_content)
-        print(f"File decrypted and saved as: {output_file}")
+        k = load_secret(eval_paths, robust)
+        start = time.perf_counter()
+        results = _run_batch(decrypt_document, encrypted_paths, k.to_bytes(32, 'big'), workers, processes)
+        _print_batch_summary(results, "decrypted", time.perf_counter() - start)
     except ValueError as e:
         print(f"Decryption error: {e}")
     except (FileNotFoundError, PermissionError ) as e:
         print(f"Unexpected error during reading: {e}")
 
+def load_secret(eval_paths, robust : bool = False):
+    """
+    Reconstructs the key from files of polynomial evaluations, see file_operations.load_key.
+
+    In robust mode the corrupted evaluations that were left out are reported.
+
+    Args:
+        eval_paths (str or list of str): Files with at least t of the n polynomial evaluations.
+        robust (bool): Read every evaluation and ignore the corrupted ones.
+
+    Returns:
+        int: The reconstructed key.
+
+    Raises:
+        ValueError: If the file is not a valid evaluations file.
+        ValueError: In robust mode, if the threshold is not recorded or too many evaluations are corrupted.
+        FileNotFoundError: If the file does not exist.
+        PermissionError: If the file is not readable.
+    """
+    secret, corrupted = load_key(eval_paths, robust)
+    if corrupted:
+        print(f"Corrupted evaluations ignored: {', '.join(f'x = {x}' for x, _ in corrupted)}")
+    return secret
+
+def extend_shares(eval_paths : list, count : int, output_path : str = None):
+    """
+    Issues new evaluations of the key from t existing ones, without the password or the encrypted files.
+
+    The new evaluations are written to output_path, or added to the evaluations file when a
+    single one is given, in the format and with the threshold of the existing files. output_path
+    must not be one of the evaluations files, whose evaluations it would replace.
+
+    Args:
+        eval_paths (list of str): Files with at least t of the n polynomial evaluations.
+        count (int): The number of new evaluations.
+        output_path (str): File for the new evaluations, None adds them to the single file of eval_paths.
+    """
+    from shamir_scheme import encode_evaluations, extend_evaluations, fresh_x_values
+    try:
+        if output_path is None and len(eval_paths) != 1:
+            raise ValueError("New evaluations can only be added to a single file, choose a file with --output.")
+        if output_path is not None and os.path.realpath(output_path) in {os.path.realpath(path) for path in eval_paths}:
+            raise ValueError("The new evaluations must not overwrite the current ones, choose another --output file.")
+        files, header = _read_share_files(eval_paths)
+        evaluations = [evaluation for _, _, file_evaluations in files for evaluation in file_evaluations]
+        new_evaluations = extend_evaluations(evaluations, header.threshold, fresh_x_values(evaluations, count))
+        if output_path is None:
+            output_path, new_evaluations = eval_paths[0], evaluations + new_evaluations
+        write_file_chunks(output_path, encode_evaluations(new_evaluations, header.share_format, header.threshold))
+        print(f"{count} new evaluations saved in: {output_path}")
+    except ValueError as e:
+        print(f"Extension error: {e}")
+    except (FileNotFoundError, PermissionError) as e:
+        print(f"File error: {e}")
+
+def refresh_shares(eval_paths : list):
+    """
+    Replaces the evaluations of every holder by new ones of the same key, in place.
+
+    Old and refreshed evaluations cannot be combined, so every evaluation still in use must be
+    among eval_paths. At least t evaluations are needed, and they are checked to be shares of one
+    key before they are refreshed. Every file is written to a temporary file first and the files
+    are only replaced once all of them were written, so a failed refresh keeps the old shares.
+
+    Args:
+        eval_paths (list of str): Files with the evaluations of every holder.
+    """
+    from shamir_scheme import encode_evaluations, refresh_evaluations
+    try:
+        files, header = _read_share_files(eval_paths)
+        evaluations = refresh_evaluations([evaluation for _, _, file_evaluations in files for evaluation in file_evaluations],
+                                          header.threshold)
+        outputs, start = [], 0
+        for path, file_header, file_evaluations in files:
+            refreshed = evaluations[start:start + len(file_evaluations)]
+            start += len(file_evaluations)
+            outputs.append((path, encode_evaluations(refreshed, file_header.share_format, header.threshold)))
+        replace_staged(stage_files(outputs))
+        print(f"{len(evaluations)} evaluations refreshed in {len(files)} files")
+    except ValueError as e:
+        print(f"Refresh error: {e}")
+    except (FileNotFoundError, PermissionError) as e:
+        print(f"File error: {e}")
+
+def _read_share_files(eval_paths : list):
+    """
+    Reads every evaluation of several share files, keeping track of the file of each one.
+
+    Args:
+        eval_paths (list of str): The share files.
+
+    Returns:
+        tuple: The path, the ShareHeader and the evaluations of every file, and the merged ShareHeader.
+
+    Raises:
+        ValueError: If a file is not valid, the files disagree, an x value is repeated, the threshold
+            is not recorded or there are fewer evaluations than the threshold.
+    """
+    from shamir_scheme import PRIME, SHARE_CHUNK_SIZE, _merge_headers, open_evaluations
+    files, header, used = [], None, set()
+    for path in eval_paths:
+        file_header, evaluations = open_evaluations(read_file_chunks(path, SHARE_CHUNK_SIZE))
+        evaluations = list(evaluations)
+        header = _merge_headers(header, file_header)
+        for x, _ in evaluations:
+            if x % PRIME in used:
+                raise ValueError(f"Repeated evaluation for x = {x}.")
+            used.add(x % PRIME)
+        files.append((path, file_header, evaluations))
+    if header is None:
+        raise ValueError("At least one share file is needed.")
+    if header.threshold is None:
+        raise ValueError("The evaluations files do not record the threshold.")
+    if len(used) < header.threshold:
+        raise ValueError(f"Only {len(used)} evaluations, {header.threshold} are needed.")
+    return files, header
+
+def _timed(function, path : str, key : bytes, workers : int):
+    """
+    Runs the encryption or decryption of one file, measuring it and capturing its errors.
+
+    Args:
+        function (Callable): encrypt_document or decrypt_document.
+        path (str): The file to process.
+        key (bytes): The AES key.
+        workers (int): Threads used for the segments of the file.
+
+    Returns:
+        tuple: The input path, the output path, the elapsed seconds and the error message or None.
+    """
+    start = time.perf_counter()
+    try:
+        output_file = function(path, key, workers)
+        return path, output_file, time.perf_counter() - start, None
+    except ValueError as e:
+        return path, None, time.perf_counter() - start, str(e)
+    except (FileNotFoundError, PermissionError) as e:
+        return path, None, time.perf_counter() - start, f"File error: {e}"
+
+def _run_batch(function, paths : list, key : bytes, workers : int, processes : int):
+    """
+    Applies encrypt_document or decrypt_document to every file, spreading the files over a process pool.
+
+    A single file, or a single process, runs in the current process.
+
+    Args:
+        function (Callable): encrypt_document or decrypt_document.
+        paths (list of str): The files to process.
+        key (bytes): The AES key.
+        workers (int): Threads used for the segments of each file.
+        processes (int): Processes used to handle several files at once.
+
+    Returns:
+        list of tuple: The result of _timed for every file, in the order of paths.
+    """
+    processes = min(processes, len(paths))
+    if processes <= 1:
+        return [_timed(function, path, key, workers) for path in paths]
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        futures = [executor.submit(_timed, function, path, key, workers) for path in paths]
+        return [future.result() for future in futures]
+
+def _print_batch_summary(results : list, action : str, elapsed : float):
+    """
+    Prints the outcome of every file and, for more than one file, a summary of the timings.
+
+    Args:
+        results (list of tuple): The result of _timed for every file.
+        action (str): "encrypted" or "decrypted".
+        elapsed (float): The wall time in seconds of the whole batch.
+    """
+    for path, output_file, _, error in results:
+        if error is None:
+            print(f"File {action} and saved as: {output_file}")
+        else:
+            print(f"Error in {path}: {error}")
+    if len(results) > 1:
+        failed = sum(error is not None for _, _, _, error in results)
+        print("Timings:")
+        for path, _, seconds, error in results:
+            print(f"  {seconds:10.3f} s  {path}{'  (failed)' if error else ''}")
+        print(f"  {elapsed:10.3f} s  wall time for {len(results)} files, {failed} failed")
+
+def decrypt_range_file(eval_paths, encrypted_path : str, offset : int, length : int = None, workers : int = 1,
+                       robust : bool = False):
+    """
+    Decrypts a byte range of a file using polynomial evaluations from Shamir's Secret Sharing Scheme.
+
+    Only the segments of the container that overlap the range are read and decrypted.
+
+    Args:
+        eval_paths (str or list of str): Files with at least t of the n polynomial evaluations.
+        encrypted_file (str): File with the encrypted document.
+        offset (int): First byte of the range, negative values count from the end.
+        length (int): Number of bytes of the range, None reaches the end of the document.
+        workers (int): Threads used to decrypt segments.
+        robust (bool): Read every evaluation and ignore the corrupted ones, see load_secret.
+    """
+    from container import HEADER, decrypt_range, is_container
+    try:
+        if not is_container(read_bytes_file(encrypted_path, HEADER.size)):
+            raise ValueError("Partial decryption needs a file encrypted as a segmented container.")
+        k = load_secret(eval_paths, robust)
+        output_file = encrypted_path.replace(".aes", "_range.txt")
+        with open_bytes_file(encrypted_path) as source:
+            write_file_chunks(output_file, pipelined(decrypt_range(source, k.to_bytes(32, 'big'), offset, length, workers)))
+        print(f"Range decrypted and saved as: {output_file}")
+    except ValueError as e:
+        print(f"Decryption error: {e}")
+    except (FileNotFoundError, PermissionError ) as e:
+        print(f"Unexpected error during reading: {e}")
+
+def run_agent(eval_paths : list, socket_path : str, ttl : float, workers : int = 1):
+    """
+    Runs a key agent until it receives a shutdown request or the process is interrupted.
+
+    Args:
+        eval_paths (list of str): Files with at least t of the n polynomial evaluations.
+        socket_path (str): The path of the Unix socket.
+        ttl (float): Seconds the key is kept in memory before the evaluations are read again.
+        workers (int): Threads used to serve requests.
+    """
+    from key_agent import KeyAgent
+    try:
+        KeyAgent(eval_paths, ttl, workers).run(socket_path, lambda: print(f"Agent listening on: {socket_path}", flush=True))
+    except KeyboardInterrupt:
+        pass
+    except OSError as e:
+        print(f"Agent error: {e}")
+
+def send_to_agent(socket_path : str, action : str, paths : list):
+    """
+    Encrypts or decrypts files through a running key agent.
+
+    Args:
+        socket_path (str): The path of the Unix socket of the agent.
+        action (str): "c" to encrypt or "d" to decrypt.
+        paths (list of str): The documents.
+    """
+    from key_agent import send_requests
+    command = "encrypt" if action == 'c' else "decrypt"
+    start = time.perf_counter()
+    try:
+        responses = send_requests(socket_path, [{"command": command, "path": os.path.abspath(path)} for path in paths])
+    except (FileNotFoundError, ConnectionError) as e:
+        print(f"Agent error: {e}")
+        return
+    results = [(path, response.get("output"), response.get("seconds", 0.0), response.get("error"))
+               for path, response in zip(paths, responses)]
+    _print_batch_summary(results, "encrypted" if action == 'c' else "decrypted", time.perf_counter() - start)
+
 if __name__ == "__main__":
     main()
@@ -1,6 +1,98 @@
+import itertools
+import os
 import random
-from typing import List, Tuple
-from sympy import symbols
+import secrets
+import struct
+from collections import OrderedDict
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+PRIME = 2**256 + 297
+"""int: Smallest prime above 2**256, large enough to hold any SHA-256 key as a field element."""
+
+FAST_EVALUATION_THRESHOLD = 3000
+"""int: Polynomials with at least this many coefficients are evaluated with the subproduct tree engine.
+
+Measured with src/benchmarks/bench_multipoint_evaluation.py, below it the naive Horner
+evaluation at every point is faster.
+"""
+
+FAST_INTERPOLATION_THRESHOLD = 2000
+"""int: Reconstructions from at least this many evaluations use the product tree engine.
+
+Measured with src/benchmarks/bench_interpolation.py, below it the O(k²) Lagrange weights are faster.
+"""
+
+ENGINES = ("auto", "naive", "fast")
+
+GMPY2_FAST_EVALUATION_THRESHOLD = 500
+"""int: FAST_EVALUATION_THRESHOLD of the gmpy2 field backend, whose products of huge integers favor the subproduct tree."""
+
+GMPY2_FAST_INTERPOLATION_THRESHOLD = 400
+"""int: FAST_INTERPOLATION_THRESHOLD of the gmpy2 field backend."""
+
+FIELD_BACKENDS = ("auto", "python", "gmpy2")
+"""Tuple[str]: Backends of the field arithmetic, "auto" uses gmpy2 when it is installed, see field_backend."""
+
+FIELD_BACKEND_ENV = "SHAMIR_FIELD_BACKEND"
+"""str: Environment variable that overrides the automatic choice of the field backend."""
+
+DEFAULT_WEIGHT_CACHE_SIZE = 128
+"""int: Number of sets of x values whose Lagrange weights are kept by WEIGHT_CACHE."""
+
+FIELD_BYTES = (PRIME.bit_length() + 7) // 8
+"""int: Width in bytes of a field element in the binary share format."""
+
+FIELD_ID = 1
+"""int: Identifier of the field of PRIME in share file headers."""
+
+FIELD_NAME = "2^256+297"
+
+SCHEME_SHAMIR = 1
+"""int: Identifier of Shamir's scheme, one share per holder, in share file headers."""
+
+SCHEME_PACKED = 2
+"""int: Identifier of packed Shamir sharing, one share per holder for every pack of secrets, in batch share file headers."""
+
+SCHEME_NAMES = {SCHEME_SHAMIR: "shamir"}
+
+SHARE_FORMATS = ("text", "binary")
+
+TEXT_HEADER = "x, P(x)"
+
+SHARE_MAGIC = b"SHMF"
+
+BINARY_VERSION = 2
+
+BINARY_HEADER = struct.Struct(">4sBBBHI")
+"""struct.Struct: Magic, version, scheme, field, field element width and threshold of a binary share file.
+
+A threshold of 0 means that it is unknown. Version 1 files only have the magic, the version and the width.
+"""
+
+_BINARY_HEADER_V1 = struct.Struct(">4sBH")
+
+BATCH_MAGIC = b"SHMB"
+
+BATCH_VERSION = 1
+
+BATCH_HEADER = struct.Struct(">4sBBBHIII")
+"""struct.Struct: Magic, version, scheme, field, field element width, threshold, holders and secrets of a batch share file.
+
+The header is followed by one record per holder: its x and the P_j(x) of every secret j, all of them
+fixed width big-endian field elements. A threshold of 0 means that it is unknown.
+"""
+
+PACK_HEADER = struct.Struct(">H")
+"""struct.Struct: Pack size of a packed batch share file, right after its batch header.
+
+Every holder record then holds its x and one share per pack of secrets, see generate_packed_shares.
+"""
+
+SHARE_CHUNK_SIZE = 64 * 1024
+
+_RANDOM_ELEMENT_BYTES = (PRIME.bit_length() + 64 + 7) // 8
+
+_field_backend = None
 
 def reconstruct_secret(evaluations_format: str) -> int:
     """
@@ -21,9 +113,435 @@ def reconstruct_secret(evaluations_format: str) -> int:
     Raises:
         ValueError: If evaluations_format does not match the given format.
     """
+    return reconstruct_from_evaluations(get_evaluations(evaluations_format))
+
+def reconstruct_from_evaluations(evaluations: Sequence[Tuple[int, int]], engine: str = "auto",
+                                 cache: Optional["WeightCache"] = None) -> int:
+    """
+    Reconstructs the secret by evaluating the Lagrange interpolation at x = 0 over the prime field.
+
+    The weights depend only on the x values, so they are taken from a WeightCache and a repeated
+    reconstruction with the same holders is a single dot product with the y values.
+
+    Args:
+        evaluations (Sequence[Tuple[int, int]]): The (x, P(x)) points of the polynomial.
+        engine (str): "naive" computes the weights in O(k²), "fast" with product trees in
+            O(k log² k) and "auto" chooses by the threshold of the field backend.
+        cache (Optional[WeightCache]): The cache of weights, None uses WEIGHT_CACHE.
+
+    Returns:
+        int: The secret reconstructed from the evaluations.
+
+    Raises:
+        ValueError: If there are no evaluations or two of them share the same x.
+        ValueError: If the engine is not one of ENGINES.
+    """
+    if not evaluations:
+        raise ValueError("At least one evaluation is needed to reconstruct the secret.")
+    weights = (WEIGHT_CACHE if cache is None else cache).weights([x for x, _ in evaluations], engine)
+    return sum(w * y for w, (_, y) in zip(weights, evaluations)) % PRIME
+
+def reconstruct_robust(evaluations: Sequence[Tuple[int, int]], threshold: int) -> Tuple[int, List[Tuple[int, int]]]:
+    """
+    Reconstructs the secret from more than t evaluations when some of them may be corrupted.
+
+    The evaluations are decoded as a Reed-Solomon codeword with Gao's algorithm, see
+    fast_polynomial.gao_decode, which finds the corrupted evaluations in polynomial time. With n
+    evaluations up to (n - t) // 2 corrupted ones are found. The secret is then reconstructed from
+    t of the evaluations that agree with the decoded polynomial.
+
+    Args:
+        evaluations (Sequence[Tuple[int, int]]): The (x, P(x)) points, with distinct x values.
+        threshold (int): The number t of evaluations needed to reconstruct the secret.
+
+    Returns:
+        tuple: The secret and the corrupted evaluations, in the order of evaluations.
+
+    Raises:
+        ValueError: If there are fewer than t evaluations, two of them share the same x,
+            or more of them are corrupted than can be found.
+    """
+    from fast_polynomial import gao_decode
+    if len(evaluations) < threshold:
+        raise ValueError(f"Only {len(evaluations)} distinct evaluations, {threshold} are needed.")
+    _, errors = gao_decode([x for x, _ in evaluations], [y for _, y in evaluations], threshold)
+    corrupted = [evaluations[i] for i in errors]
+    wrong = set(errors)
+    valid = [evaluation for i, evaluation in enumerate(evaluations) if i not in wrong]
+    return reconstruct_from_evaluations(valid[:threshold]), corrupted
+
+def _weights_at_zero(x_values: Sequence[int], engine: str = "auto") -> List[int]:
+    """
+    Computes the Lagrange weights at x = 0 with the chosen engine.
+
+    A zero x value makes its own y the secret, those sets always go to the naive engine, which
+    gives it weight 1 and every other point weight 0.
+
+    Args:
+        x_values (Sequence[int]): The x coordinates of the evaluations.
+        engine (str): One of ENGINES.
+
+    Returns:
+        List[int]: The weight of each evaluation, in the same order as x_values.
+
+    Raises:
+        ValueError: If two x values are equal in the field or the engine is not one of ENGINES.
+    """
+    _validate_engine(engine)
+    if engine == "auto":
+        engine = "fast" if len(x_values) >= field_backend().fast_interpolation_threshold else "naive"
+    if engine == "naive" or any(x % PRIME == 0 for x in x_values):
+        return _lagrange_weights_at_zero(x_values)
+    from fast_polynomial import lagrange_weights_at_zero
+    return lagrange_weights_at_zero(x_values)
+
+def _validate_engine(engine: str):
+    """
+    Checks the name of an interpolation engine.
+
+    Args:
+        engine (str): The name of the engine.
+
+    Raises:
+        ValueError: If the engine is not one of ENGINES.
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"Invalid engine: {engine}. Ensure that it is one of {', '.join(ENGINES)}.")
+
+class WeightCache:
+    """
+    A bounded least recently used cache of Lagrange weights at x = 0.
+
+    The weights of a set of evaluations depend only on their x values, so they are keyed by the
+    sorted set of x values reduced modulo PRIME and found again whatever the order of the points.
+
+    Attributes:
+        max_size (int): The maximum number of sets of x values kept, 0 disables the cache.
+        hits (int): The number of lookups answered from the cache.
+        misses (int): The number of lookups that computed the weights.
+    """
+
+    def __init__(self, max_size: int = DEFAULT_WEIGHT_CACHE_SIZE):
+        """
+        Creates an empty cache.
+
+        Args:
+            max_size (int): The maximum number of sets of x values kept, 0 disables the cache.
+
+        Raises:
+            ValueError: If max_size is negative.
+        """
+        self.max_size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self.resize(max_size)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def weights(self, x_values: Sequence[int], engine: str = "auto") -> List[int]:
+        """
+        Returns the Lagrange weights at x = 0, computing and storing them on a miss.
+
+        Args:
+            x_values (Sequence[int]): The x coordinates of the evaluations.
+            engine (str): One of ENGINES, used on a miss.
+
+        Returns:
+            List[int]: The weight of each evaluation, in the same order as x_values.
+
+        Raises:
+            ValueError: If two x values are equal in the field or the engine is not one of ENGINES.
+        """
+        _validate_engine(engine)
+        reduced = [x % PRIME for x in x_values]
+        key = tuple(sorted(reduced))
+        entry = self._entries.get(key)
+        if entry is not None:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return [entry[x] for x in reduced]
+        self.misses += 1
+        weights = _weights_at_zero(x_values, engine)
+        if self.max_size:
+            self._entries[key] = dict(zip(reduced, weights))
+            if len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return weights
+
+    def resize(self, max_size: int):
+        """
+        Changes the maximum number of sets of x values, dropping the least recently used ones.
+
+        Args:
+            max_size (int): The new limit, 0 disables the cache.
+
+        Raises:
+            ValueError: If max_size is negative.
+        """
+        if max_size < 0:
+            raise ValueError("Invalid cache size. Ensure that it is ≥ 0.")
+        self.max_size = max_size
+        while len(self._entries) > max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        """
+        Drops every entry and resets the counters.
+        """
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+WEIGHT_CACHE = WeightCache()
+"""WeightCache: The cache used by reconstruct_from_evaluations when no other one is given."""
+
+def _lagrange_weights_at_zero(x_values: Sequence[int]) -> List[int]:
+    """
+    Computes the Lagrange basis polynomials L_j evaluated at x = 0.
+
+    L_j(0) = prod(-x_m) / prod(x_j - x_m) for every m != j. The numerators come from prefix and
+    suffix products and all the denominators are inverted at once with a single modular inversion.
+
+    Args:
+        x_values (Sequence[int]): The x coordinates of the evaluations.
+
+    Returns:
+        List[int]: The weight of each evaluation, in the same order as x_values.
+
+    Raises:
+        ValueError: If two x values are equal in the field.
+    """
+    backend = field_backend()
+    prime = backend.prime
+    xs = backend.elements(x % PRIME for x in x_values)
+    k = len(xs)
+    prefix = [1] * (k + 1)
+    for i, x in enumerate(xs):
+        prefix[i + 1] = prefix[i] * -x % prime
+    suffix = 1
+    numerators = [0] * k
+    for j in range(k - 1, -1, -1):
+        numerators[j] = prefix[j] * suffix % prime
+        suffix = suffix * -xs[j] % prime
+    denominators = []
+    for j, x_j in enumerate(xs):
+        denominator = 1
+        for m, x_m in enumerate(xs):
+            if m != j:
+                denominator = denominator * (x_j - x_m) % prime
+        if denominator == 0:
+            raise ValueError(f"Repeated x value: {x_values[j]}")
+        denominators.append(denominator)
+    inverses = _batch_inverse(backend.integers(denominators))
+    return backend.integers(n * inv % prime for n, inv in zip(numerators, inverses))
+
+def _batch_inverse(values: Sequence[int]) -> List[int]:
+    """
+    Inverts every value modulo PRIME using a single modular inversion (Montgomery's trick).
+
+    Args:
+        values (Sequence[int]): Non zero field elements.
+
+    Returns:
+        List[int]: The inverse of each value, in the same order.
+    """
+    accumulated = [1] * (len(values) + 1)
+    for i, value in enumerate(values):
+        accumulated[i + 1] = accumulated[i] * value % PRIME
+    inverse = int(field_backend().inverse(accumulated[-1]))
+    inverses = [0] * len(values)
+    for i in range(len(values) - 1, -1, -1):
+        inverses[i] = inverse * accumulated[i] % PRIME
+        inverse = inverse * values[i] % PRIME
+    return inverses
+
+class FieldBackend:
+    """
+    The arithmetic of the prime field on Python ints, the default backend.
+
+    Elements of every backend support the usual operators, so the scheme is written once and
+    converts its values with element or elements before the loops whose cost depends on the type
+    of the integers: Horner steps, reductions modulo prime, inversions and the huge products of
+    the Kronecker substitution. Values leave a backend as Python ints through integers.
+
+    Attributes:
+        name (str): The name of the backend, one of FIELD_BACKENDS.
+        prime: PRIME as an element of the backend.
+    """
+
+    name = "python"
+    prime = PRIME
+
+    @property
+    def fast_evaluation_threshold(self) -> int:
+        """
+        int: Polynomials with at least this many coefficients are evaluated with the subproduct tree.
+        """
+        return FAST_EVALUATION_THRESHOLD
+
+    @property
+    def fast_interpolation_threshold(self) -> int:
+        """
+        int: Reconstructions from at least this many evaluations use the product tree engine.
+        """
+        return FAST_INTERPOLATION_THRESHOLD
+
+    def element(self, value: int):
+        """
+        Converts a Python int to an element of the backend.
+        """
+        return value
+
+    def elements(self, values: Iterable[int]) -> list:
+        """
+        Converts Python ints to a list of elements of the backend.
+        """
+        return list(values)
+
+    def integers(self, values: Iterable) -> List[int]:
+        """
+        Converts elements of the backend to a list of Python ints.
+        """
+        return list(values)
+
+    def inverse(self, value):
+        """
+        Inverts a non zero element modulo PRIME.
+
+        Raises:
+            ValueError: If the value is zero in the field.
+        """
+        return pow(value, -1, PRIME)
+
+    def multiply(self, a: int, b: int) -> int:
+        """
+        Multiplies two Python ints of any size, returning a Python int.
+        """
+        return a * b
+
+class Gmpy2Backend(FieldBackend):
+    """
+    The arithmetic of the prime field on the mpz integers of gmpy2, backed by GMP.
+
+    Its inversions and products of huge integers are much faster than those of Python ints,
+    Horner steps somewhat faster and products of field elements alone about the same.
+    """
+
+    name = "gmpy2"
+
+    def __init__(self):
+        """
+        Imports gmpy2.
+
+        Raises:
+            ImportError: If gmpy2 is not installed.
+        """
+        import gmpy2
+        self._gmpy2 = gmpy2
+        self.prime = gmpy2.mpz(PRIME)
+
+    @property
+    def fast_evaluation_threshold(self) -> int:
+        return GMPY2_FAST_EVALUATION_THRESHOLD
+
+    @property
+    def fast_interpolation_threshold(self) -> int:
+        return GMPY2_FAST_INTERPOLATION_THRESHOLD
+
+    def element(self, value: int):
+        return self._gmpy2.mpz(value)
+
+    def elements(self, values: Iterable[int]) -> list:
+        return list(map(self._gmpy2.mpz, values))
+
+    def integers(self, values: Iterable) -> List[int]:
+        return list(map(int, values))
+
+    def inverse(self, value):
+        try:
+            return self._gmpy2.invert(value, self.prime)
+        except ZeroDivisionError:
+            raise ValueError("base is not invertible for the given modulus") from None
+
+    def multiply(self, a: int, b: int) -> int:
+        mpz = self._gmpy2.mpz
+        return int(mpz(a) * mpz(b))
+
+def new_field_backend(name: str) -> FieldBackend:
+    """
+    Creates a field backend by name.
+
+    Args:
+        name (str): One of FIELD_BACKENDS, "auto" is gmpy2 when it can be imported and Python ints otherwise.
+
+    Returns:
+        FieldBackend: The backend.
+
+    Raises:
+        ValueError: If the backend is not supported or gmpy2 is requested and not installed.
+    """
+    if name in ("auto", "gmpy2"):
+        try:
+            return Gmpy2Backend()
+        except ImportError:
+            if name == "gmpy2":
+                raise ValueError("The gmpy2 field backend needs the gmpy2 package, install it with: pip install gmpy2") from None
+    elif name != "python":
+        raise ValueError(f"Unsupported field backend: {name}")
+    return FieldBackend()
+
+def field_backend() -> FieldBackend:
+    """
+    Returns the field backend of the process, chosen on first use.
+
+    The backend is FIELD_BACKEND_ENV when it is set and "auto" otherwise, set_field_backend replaces it.
+
+    Returns:
+        FieldBackend: The backend.
+
+    Raises:
+        ValueError: If the environment variable names an unsupported or unavailable backend.
+    """
+    global _field_backend
+    if _field_backend is None:
+        _field_backend = new_field_backend(os.environ.get(FIELD_BACKEND_ENV, "auto"))
+    return _field_backend
+
+def set_field_backend(name: str) -> FieldBackend:
+    """
+    Replaces the field backend of the process.
+
+    Args:
+        name (str): One of FIELD_BACKENDS.
+
+    Returns:
+        FieldBackend: The new backend.
+
+    Raises:
+        ValueError: If the backend is not supported or not available.
+    """
+    global _field_backend
+    _field_backend = new_field_backend(name)
+    return _field_backend
+
+def _reconstruct_secret_symbolic(evaluations: Sequence[Tuple[int, int]]) -> int:
+    """
+    Reconstructs the secret with sympy rational arithmetic and reduces the result into the field.
+
+    This is the original reconstruction, it is kept as a reference to check the field engine against.
+    sympy is imported here so that the command line never pays for it.
+
+    Args:
+        evaluations (Sequence[Tuple[int, int]]): The (x, P(x)) points of the polynomial.
+
+    Returns:
+        int: The secret reconstructed from the evaluations.
+    """
+    from sympy import symbols
     x = symbols('x')
-    evaluations = get_evaluations(evaluations_format)
-    secret_expr = 0 * x  
+    secret_expr = 0 * x
     k = len(evaluations)
     for j in range(k):
         x_j, y_j = evaluations[j]
@@ -34,7 +552,7 @@ def reconstruct_secret(evaluations_format: str) -> int:
                 L_j *= (x - x_m) / (x_j - x_m)
         secret_expr += y_j * L_j
     result = secret_expr.subs(x, 0)
-    return int(result)
+    return int(result.p) * pow(int(result.q), -1, PRIME) % PRIME
 
 def generate_shares(secret: int, n: int, t: int, max_range: int = 10**10):
     """
@@ -57,17 +575,399 @@ def generate_shares(secret: int, n: int, t: int, max_range: int = 10**10):
 
     Raises:
         ValueError: If t > n or if n <= 0 or t <= 0.
+        ValueError: If the secret is not an element of the prime field.
+    """
+    return get_evaluations_format(generate_evaluations(secret, n, t, max_range))
+
+def generate_evaluations(secret: int, n: int, t: int, max_range: int = 10**10) -> List[Tuple[int, int]]:
+    """
+    Generates n shares of the secret as (x, P(x)) points, to be written in any share format.
+
+    Args:
+        secret (int): The secret to be shared.
+        n (int): The total number of shares to be generated.
+        t (int): The minimum number of shares needed to reconstruct the secret.
+        max_range (int): The maximum range for generating unique x values.
+
+    Returns:
+        List[Tuple[int, int]]: The evaluations of a random polynomial of degree t-1 with the secret as constant term.
+
+    Raises:
+        ValueError: If t > n or if n <= 0 or t <= 0.
+        ValueError: If the secret is not an element of the prime field.
     """
     if t > n or n <= 0 or t <= 0:
         raise ValueError("Invalid values for n and t. Ensure that n > 0, t > 0, and t <= n.")
+    if not 0 <= secret < PRIME:
+        raise ValueError("Invalid secret. Ensure that 0 <= secret < PRIME.")
     coefficients = _generate_polynomial(secret, t)
     x_values = random.sample(range(1, max_range), n)
-    evaluations = [(x, _evaluate_polynomial(coefficients, x)) for x in x_values]
-    return get_evaluations_format(evaluations)
+    return list(zip(x_values, _evaluate_polynomial_many(coefficients, x_values)))
+
+def fresh_x_values(evaluations: Sequence[Tuple[int, int]], count: int, max_range: int = 10**10) -> List[int]:
+    """
+    Chooses x values for new shares that differ from the x values already in use.
+
+    Args:
+        evaluations (Sequence[Tuple[int, int]]): The existing (x, P(x)) points.
+        count (int): The number of x values.
+        max_range (int): The maximum range for generating unique x values.
+
+    Returns:
+        List[int]: Distinct x values in [1, max_range) not used by any of the evaluations.
+
+    Raises:
+        ValueError: If count is not positive or the range does not have enough unused values.
+    """
+    used = {x % PRIME for x, _ in evaluations}
+    available = max_range - 1 - sum(1 <= x < max_range for x in used)
+    if count <= 0 or count > available:
+        raise ValueError(f"Invalid number of new shares: {count}. Ensure that 0 < count <= {available}.")
+    x_values = []
+    while len(x_values) < count:
+        for x in random.sample(range(1, max_range), count - len(x_values)):
+            if x not in used:
+                used.add(x)
+                x_values.append(x)
+    return x_values
+
+def extend_evaluations(evaluations: Sequence[Tuple[int, int]], threshold: int,
+                       x_values: Sequence[int]) -> List[Tuple[int, int]]:
+    """
+    Issues new shares of the same secret from t existing ones, without knowing the secret.
+
+    The polynomial of degree t-1 is interpolated from the first t evaluations and evaluated at
+    the new x values, which is Lagrange evaluation at those points. The cost depends on t and
+    on the number of new shares, and the encrypted documents are not involved. A corrupted
+    share would give wrong new shares, so with more than t evaluations they are first checked
+    to lie on one polynomial, as in refresh_evaluations.
+
+    Args:
+        evaluations (Sequence[Tuple[int, int]]): At least t (x, P(x)) points of the polynomial.
+        threshold (int): The number t of shares needed to reconstruct the secret.
+        x_values (Sequence[int]): The x values of the new shares.
+
+    Returns:
+        List[Tuple[int, int]]: The new (x, P(x)) points.
+
+    Raises:
+        ValueError: If there are fewer than t evaluations, they do not lie on one polynomial, or a
+            new x value is zero, repeated or already one of the evaluations.
+    """
+    from fast_polynomial import interpolate
+    if threshold <= 0 or len(evaluations) < threshold:
+        raise ValueError(f"Only {len(evaluations)} distinct evaluations, {threshold} are needed.")
+    used = {x % PRIME for x, _ in evaluations}
+    reduced = [x % PRIME for x in x_values]
+    if 0 in reduced or len(set(reduced)) != len(reduced) or used.intersection(reduced):
+        raise ValueError("Invalid x values. Ensure that they are distinct, non zero and not already used.")
+    _check_consistent(evaluations, threshold)
+    base = evaluations[:threshold]
+    coefficients = interpolate([x for x, _ in base], [y for _, y in base])
+    return list(zip(x_values, _evaluate_polynomial_many(coefficients, x_values)))
+
+def refresh_evaluations(evaluations: Sequence[Tuple[int, int]], threshold: int) -> List[Tuple[int, int]]:
+    """
+    Re-randomizes shares without changing the secret, by adding a random polynomial Q with Q(0) = 0.
+
+    Every share becomes (x, P(x) + Q(x)) with Q of degree t-1, so the new shares reconstruct the
+    same secret but are independent of the old ones, and old and new shares cannot be combined.
+    A corrupted share would be refreshed into a corrupted share of a different polynomial, so
+    with more than t evaluations they are first checked to lie on one polynomial of degree t-1,
+    see fast_polynomial.gao_decode.
+
+    Args:
+        evaluations (Sequence[Tuple[int, int]]): The (x, P(x)) points of every holder, at least t of them.
+        threshold (int): The number t of shares needed to reconstruct the secret.
+
+    Returns:
+        List[Tuple[int, int]]: The refreshed points, in the same order.
+
+    Raises:
+        ValueError: If t is not positive, there are fewer than t evaluations or they do not lie on one polynomial.
+    """
+    if threshold <= 0:
+        raise ValueError(f"Invalid threshold: {threshold}.")
+    if len(evaluations) < threshold:
+        raise ValueError(f"Only {len(evaluations)} distinct evaluations, {threshold} are needed.")
+    _check_consistent(evaluations, threshold)
+    coefficients = [0] + _random_field_elements(threshold - 1)
+    x_values = [x for x, _ in evaluations]
+    offsets = _evaluate_polynomial_many(coefficients, x_values)
+    return [(x, (y + offset) % PRIME) for (x, y), offset in zip(evaluations, offsets)]
+
+def _check_consistent(evaluations: Sequence[Tuple[int, int]], threshold: int):
+    """
+    Checks that more than t evaluations lie on one polynomial of degree t-1, see fast_polynomial.gao_decode.
+
+    Exactly t evaluations always lie on one such polynomial, so they cannot be checked.
+
+    Args:
+        evaluations (Sequence[Tuple[int, int]]): The (x, P(x)) points, with distinct x values.
+        threshold (int): The number t of shares needed to reconstruct the secret.
+
+    Raises:
+        ValueError: If the evaluations are not shares of one secret, naming the ones found to be wrong.
+    """
+    from fast_polynomial import gao_decode
+    if len(evaluations) <= threshold:
+        return
+    try:
+        _, errors = gao_decode([x for x, _ in evaluations], [y for _, y in evaluations], threshold)
+    except ValueError:
+        errors = None
+    if errors != []:
+        wrong = "" if errors is None else ": " + ", ".join(f"x = {evaluations[i][0]}" for i in errors)
+        raise ValueError(f"The evaluations are not shares of one secret{wrong}.")
+
+def generate_shares_batch(secret_values: Sequence[int], x_values: Sequence[int], t: int) -> List[List[int]]:
+    """
+    Generates the shares of many secrets for the same holders at once.
+
+    Every secret gets its own random polynomial of degree t-1. All the coefficients are drawn
+    from a single buffer of the operating system CSPRNG and all the polynomials are evaluated
+    together, one Horner step at a time, at every x value.
+
+    Args:
+        secret_values (Sequence[int]): The secrets to be shared.
+        x_values (Sequence[int]): The x coordinate of every holder, distinct and non zero in the field.
+        t (int): The minimum number of shares needed to reconstruct each secret.
+
+    Returns:
+        List[List[int]]: The holder-major matrix of shares, row i holds P_j(x_i) for every secret j.
+
+    Raises:
+        ValueError: If t <= 0 or t is greater than the number of x values.
+        ValueError: If an x value is repeated or zero in the field.
+        ValueError: If a secret is not an element of the prime field.
+    """
+    if t <= 0 or t > len(x_values):
+        raise ValueError("Invalid values for n and t. Ensure that n > 0, t > 0, and t <= n.")
+    reduced = {x % PRIME for x in x_values}
+    if len(reduced) != len(x_values) or 0 in reduced:
+        raise ValueError("Invalid x values. Ensure that they are distinct and non zero.")
+    if any(not 0 <= secret < PRIME for secret in secret_values):
+        raise ValueError("Invalid secret. Ensure that 0 <= secret < PRIME.")
+    backend = field_backend()
+    prime = backend.prime
+    m = len(secret_values)
+    randomness = backend.elements(_random_field_elements(m * (t - 1)))
+    coefficients = [randomness[d * m:(d + 1) * m] for d in range(t - 1)]
+    coefficients.insert(0, backend.elements(secret_values))
+    shares = []
+    for x in backend.elements(x_values):
+        row = coefficients[-1]
+        for degree in range(t - 2, -1, -1):
+            row = [(y * x + c) % prime for y, c in zip(row, coefficients[degree])]
+        shares.append(backend.integers(row))
+    return shares
+
+def reconstruct_secrets_batch(x_values: Sequence[int], shares: Sequence[Sequence[int]], engine: str = "auto",
+                              cache: Optional["WeightCache"] = None) -> List[int]:
+    """
+    Reconstructs many secrets shared with the same holders at once.
+
+    The Lagrange weights depend only on the x values, so they are computed, or taken from the
+    cache, once. The secrets are then accumulated one holder row at a time, every row scaled by
+    the weight of its holder, and reduced modulo PRIME only at the end.
+
+    Args:
+        x_values (Sequence[int]): The x coordinate of every holder, distinct in the field.
+        shares (Sequence[Sequence[int]]): The holder-major matrix of shares, row i holds P_j(x_i)
+            for every secret j, as returned by generate_shares_batch.
+        engine (str): One of ENGINES, used to compute the weights.
+        cache (Optional[WeightCache]): The cache of weights, None uses WEIGHT_CACHE.
+
+    Returns:
+        List[int]: The secrets, in the order of the columns.
+
+    Raises:
+        ValueError: If there are no holders, the matrix does not have one row per holder or its rows differ in length.
+        ValueError: If two x values are equal in the field or the engine is not one of ENGINES.
+    """
+    if not x_values:
+        raise ValueError("At least one evaluation is needed to reconstruct the secret.")
+    if len(shares) != len(x_values) or len({len(row) for row in shares}) != 1:
+        raise ValueError("Invalid shares. Ensure that there is one row of the same length per x value.")
+    weights = (WEIGHT_CACHE if cache is None else cache).weights(x_values, engine)
+    totals = [0] * len(shares[0])
+    for weight, row in zip(weights, shares):
+        totals = [total + weight * y for total, y in zip(totals, row)]
+    return [total % PRIME for total in totals]
+
+def packed_points(pack_size: int) -> List[int]:
+    """
+    Returns the reserved points where packed sharing places the secrets of a pack.
+
+    Args:
+        pack_size (int): The number ℓ of secrets of every pack.
+
+    Returns:
+        List[int]: The points PRIME-1, ..., PRIME-ℓ, which random x values of holders never take.
+    """
+    return [PRIME - j for j in range(1, pack_size + 1)]
+
+def generate_packed_shares(secret_values: Sequence[int], x_values: Sequence[int], t: int,
+                           pack_size: int) -> List[List[int]]:
+    """
+    Generates the shares of many secrets for the same holders, packing ℓ secrets in every polynomial.
+
+    The secrets are split in packs of ℓ, the last one padded with zeros. The polynomial of a pack
+    has degree t-1, takes the secrets at the points of packed_points and is otherwise random:
+    P(x) = Σ s_j·λ_j(x) + Z(x)·R(x), with λ_j the Lagrange basis of the reserved points, Z their
+    vanishing polynomial and R random of degree t-ℓ-1. Every holder stores one share per pack
+    instead of one per secret, and λ_j(x) and Z(x) are computed once per holder, so generating
+    a pack costs t products per holder instead of ℓ·(t-1).
+
+    The pack size is the trade-off knob: any t shares reconstruct the pack, but only sets of at
+    most t-ℓ shares reveal nothing about the secrets. ℓ = 1 is plain Shamir sharing.
+
+    Args:
+        secret_values (Sequence[int]): The secrets to be shared.
+        x_values (Sequence[int]): The x coordinate of every holder, distinct and none of them a reserved point.
+        t (int): The minimum number of shares needed to reconstruct each pack.
+        pack_size (int): The number ℓ of secrets of every pack, 1 ≤ ℓ < t.
+
+    Returns:
+        List[List[int]]: The holder-major matrix of shares, row i holds P_b(x_i) for every pack b.
+
+    Raises:
+        ValueError: If t <= 0, t is greater than the number of x values or the pack size is out of range.
+        ValueError: If an x value is repeated or a reserved point.
+        ValueError: If a secret is not an element of the prime field.
+    """
+    if t <= 0 or t > len(x_values):
+        raise ValueError("Invalid values for n and t. Ensure that n > 0, t > 0, and t <= n.")
+    if not 1 <= pack_size <= max(t - 1, 1):
+        raise ValueError("Invalid pack size. Ensure that 1 <= pack size < t.")
+    points = packed_points(pack_size)
+    xs = [x % PRIME for x in x_values]
+    if len(set(xs)) != len(xs) or set(xs).intersection(points):
+        raise ValueError("Invalid x values. Ensure that they are distinct and not reserved points.")
+    if any(not 0 <= secret < PRIME for secret in secret_values):
+        raise ValueError("Invalid secret. Ensure that 0 <= secret < PRIME.")
+    backend = field_backend()
+    prime = backend.prime
+    count = -(-len(secret_values) // pack_size)
+    padded = backend.elements(itertools.chain(secret_values, [0] * (count * pack_size - len(secret_values))))
+    columns = [padded[j::pack_size] for j in range(pack_size)]
+    degree = t - pack_size
+    randomness = backend.elements(_random_field_elements(count * degree))
+    coefficients = [randomness[d * count:(d + 1) * count] for d in range(degree)]
+    shares = []
+    for x, (vanishing, weights) in zip(xs, _packed_basis(xs, points)):
+        x = backend.element(x)
+        row = coefficients[-1] if coefficients else [0] * count
+        for d in range(degree - 2, -1, -1):
+            row = [(y * x + c) % prime for y, c in zip(row, coefficients[d])]
+        row = [vanishing * y for y in row]
+        for weight, column in zip(backend.elements(weights), columns):
+            row = [y + weight * secret for y, secret in zip(row, column)]
+        shares.append(backend.integers(y % prime for y in row))
+    return shares
+
+def reconstruct_packed_secrets(x_values: Sequence[int], shares: Sequence[Sequence[int]], t: int, pack_size: int,
+                               secret_count: Optional[int] = None) -> List[int]:
+    """
+    Reconstructs the secrets shared with generate_packed_shares.
+
+    The polynomial of every pack is interpolated at its ℓ reserved points at once: the t·ℓ
+    Lagrange weights depend only on the x values, so they are computed once for all the packs,
+    and every secret is then a dot product with the shares of its pack.
+
+    Args:
+        x_values (Sequence[int]): The x coordinate of at least t holders, distinct in the field.
+        shares (Sequence[Sequence[int]]): The holder-major matrix of shares, row i holds P_b(x_i)
+            for every pack b, as returned by generate_packed_shares.
+        t (int): The threshold the secrets were shared with.
+        pack_size (int): The number ℓ of secrets of every pack.
+        secret_count (Optional[int]): The number of secrets, None keeps the padding of the last pack.
+
+    Returns:
+        List[int]: The secrets, in the order in which they were shared.
+
+    Raises:
+        ValueError: If t <= 0, there are fewer than t holders or the pack size is out of range.
+        ValueError: If the matrix does not have one row per holder or its rows differ in length.
+        ValueError: If two x values are equal in the field or one of them is a reserved point.
+    """
+    if t <= 0:
+        raise ValueError("Invalid value for t. Ensure that t > 0.")
+    if len(x_values) < t:
+        raise ValueError(f"Only {len(x_values)} evaluations, {t} are needed to reconstruct the secrets.")
+    if not 1 <= pack_size <= max(t - 1, 1):
+        raise ValueError("Invalid pack size. Ensure that 1 <= pack size < t.")
+    if len(shares) != len(x_values) or len({len(row) for row in shares}) != 1:
+        raise ValueError("Invalid shares. Ensure that there is one row of the same length per x value.")
+    points = packed_points(pack_size)
+    xs = [x % PRIME for x in x_values]
+    if set(xs).intersection(points):
+        raise ValueError("Invalid x values. Ensure that they are not reserved points.")
+    weights = [row for _, row in _packed_basis(points, xs)]
+    secret_values = [0] * (len(shares[0]) * pack_size)
+    for j, row_weights in enumerate(weights):
+        totals = [0] * len(shares[0])
+        for weight, row in zip(row_weights, shares):
+            totals = [total + weight * y for total, y in zip(totals, row)]
+        secret_values[j::pack_size] = [total % PRIME for total in totals]
+    return secret_values[:secret_count] if secret_count is not None else secret_values
+
+def _packed_basis(targets: Sequence[int], points: Sequence[int]) -> List[Tuple[int, List[int]]]:
+    """
+    Evaluates the vanishing polynomial and the Lagrange basis of some points at other points.
+
+    With Z(x) = Π (x - p_j), the basis polynomial of p_j at x is Z(x) / ((x - p_j)·Z'(p_j)), so all
+    of them come from the barycentric weights 1/Z'(p_j) and one batch inversion of the differences.
+
+    Args:
+        targets (Sequence[int]): The points where the basis is evaluated, none of them in points.
+        points (Sequence[int]): The interpolation points, reduced modulo PRIME.
+
+    Returns:
+        List[Tuple[int, List[int]]]: For every target, Z(target) and the value of every basis polynomial.
+
+    Raises:
+        ValueError: If two points are equal in the field.
+    """
+    denominators = []
+    for j, p_j in enumerate(points):
+        denominator = 1
+        for m, p_m in enumerate(points):
+            if m != j:
+                denominator = denominator * (p_j - p_m) % PRIME
+        if denominator == 0:
+            raise ValueError(f"Repeated x value: {p_j}")
+        denominators.append(denominator)
+    barycentric = _batch_inverse(denominators)
+    inverses = _batch_inverse([(target - p) % PRIME for target in targets for p in points])
+    basis = []
+    for i, target in enumerate(targets):
+        vanishing = 1
+        for p in points:
+            vanishing = vanishing * (target - p) % PRIME
+        row = inverses[i * len(points):(i + 1) * len(points)]
+        basis.append((vanishing, [vanishing * w * inverse % PRIME for w, inverse in zip(barycentric, row)]))
+    return basis
+
+def _random_field_elements(count: int) -> List[int]:
+    """
+    Draws non zero field elements from one buffer of the operating system CSPRNG.
+
+    Every element is reduced from 64 more bits than the prime, so the bias is negligible.
+
+    Args:
+        count (int): The number of elements.
+
+    Returns:
+        List[int]: Uniform elements of the range [1, PRIME).
+    """
+    size = _RANDOM_ELEMENT_BYTES
+    buffer = os.urandom(count * size)
+    return [int.from_bytes(buffer[i:i + size], 'big') % (PRIME - 1) + 1 for i in range(0, count * size, size)]
 
 def _generate_polynomial(secret, k):
     """
-    Generates a polynomial of degree k-1 with the secret as the constant term.
+    Generates a polynomial of degree k-1 over the prime field with the secret as the constant term.
 
     Args:
         secret (int): The secret to be shared.
@@ -76,21 +976,59 @@ def _generate_polynomial(secret, k):
     Returns:
         list: List of polynomial coefficients.
     """
-    coefficients = [secret] + [random.randint(1, 100) for _ in range(k - 1)]
+    coefficients = [secret] + [secrets.randbelow(PRIME - 1) + 1 for _ in range(k - 1)]
     return coefficients
 
 def _evaluate_polynomial(coefficients, x):
     """
-    Evaluates the polynomial at a given point.
+    Evaluates the polynomial at a given point over the prime field using Horner's scheme.
 
     Args:
         coefficients (list): List of polynomial coefficients.
         x (int): The point at which the polynomial is evaluated.
 
     Returns:
-        int: The value of the polynomial evaluated at x.
+        int: The value of the polynomial evaluated at x modulo PRIME.
+    """
+    return _horner(reversed(coefficients), x, PRIME)
+
+def _horner(reversed_coefficients, x, prime):
+    """
+    Evaluates a polynomial with Horner's scheme on elements of the field backend.
+
+    Args:
+        reversed_coefficients (Iterable): The coefficients, highest degree first.
+        x: The point at which the polynomial is evaluated.
+        prime: PRIME as an element of the backend.
+
+    Returns:
+        The value of the polynomial at x modulo prime, an element of the backend.
+    """
+    result = 0
+    for c in reversed_coefficients:
+        result = (result * x + c) % prime
+    return result
+
+def _evaluate_polynomial_many(coefficients, x_values):
+    """
+    Evaluates the polynomial at many points, choosing the engine by the degree of the polynomial.
+
+    Polynomials with at least the evaluation threshold of the field backend use the subproduct tree
+    multipoint evaluation, O(n log² n), and smaller ones Horner's scheme at every point, O(n·t).
+
+    Args:
+        coefficients (list): List of polynomial coefficients.
+        x_values (list): The points at which the polynomial is evaluated.
+
+    Returns:
+        list: The value of the polynomial at every point modulo PRIME.
     """
-    return sum(c * (x ** i) for i, c in enumerate(coefficients))
+    if len(coefficients) >= field_backend().fast_evaluation_threshold:
+        from fast_polynomial import multipoint_evaluate
+        return multipoint_evaluate(coefficients, x_values)
+    backend = field_backend()
+    reversed_coefficients = backend.elements(reversed(coefficients))
+    return backend.integers(_horner(reversed_coefficients, x, backend.prime) for x in backend.elements(x_values))
 
 def get_evaluations_format(evaluations: List[Tuple[int, int]]) -> str:
     """
@@ -105,12 +1043,7 @@ def get_evaluations_format(evaluations: List[Tuple[int, int]]) -> str:
     Raises:
         ValueError: If any tuple in the evaluations list does not contain exactly two elements.
     """
-    evaluations_format = "x, P(x)"
-    for evaluation in evaluations:
-        if len(evaluation) != 2:
-            raise ValueError("No 2 dimensional point")
-        evaluations_format += f"\n{evaluation[0]}, {evaluation[1]}"
-    return evaluations_format
+    return "\n".join(_iter_text_lines(evaluations))
 
 def get_evaluations(evaluations_format: str) -> List[Tuple[int, int]]:
     """
@@ -118,24 +1051,551 @@ def get_evaluations(evaluations_format: str) -> List[Tuple[int, int]]:
 
     Args:
         evaluations_format (str): A string containing evaluations in the format "x, P(x)".
-                                    The first line should be "x, P(x)" as a header, followed by
+                                    The first line should be "x, P(x)" as a header, optionally after
+                                    a "# scheme=shamir field=2^256+297 t=3" metadata line, followed by
                                     evaluations in the format "x, y" on each subsequent line.
 
     Returns:
         List[Tuple[int, int]]: A list of tuples where each tuple contains two integers (x, y).
 
     Raises:
-        ValueError: If the input string does not contain the header "x, P(x)".
+        ValueError: If the input string does not start with the header "x, P(x)".
+        ValueError: If the metadata line is malformed or names another scheme or field.
         ValueError: If any line in the input string is not in the format "x, y".
     """
-    if not "x, P(x)" in evaluations_format:
+    lines = evaluations_format.split("\n")
+    if lines[0].startswith("#"):
+        _parse_metadata(lines.pop(0))
+    if lines[-1] == "":
+        lines.pop()
+    if not lines or lines[0] != TEXT_HEADER:
         raise ValueError("Invalid format: there is no header.")
-    raw_evaluations = evaluations_format.replace("x, P(x)\n", "").split("\n")
-    evaluations = list()
-    for raw_evaluation in raw_evaluations:
-        try:
-            x, y = map(int, raw_evaluation.split(', '))
+    return [_parse_evaluation(line) for line in lines[1:]]
+
+class ShareHeader(NamedTuple):
+    """
+    The metadata of a share file.
+
+    Attributes:
+        share_format (str): "text" or "binary".
+        scheme (int): The sharing scheme, SCHEME_SHAMIR.
+        field (int): The field of the shares, FIELD_ID.
+        threshold (Optional[int]): The number of shares needed to reconstruct, None if the file does not record it.
+    """
+    share_format: str
+    scheme: int
+    field: int
+    threshold: Optional[int]
+
+def encode_evaluations(evaluations: Iterable[Tuple[int, int]], share_format: str = "text",
+                       threshold: Optional[int] = None) -> Iterator[bytes]:
+    """
+    Encodes polynomial evaluations as the chunks of a share file, without building the whole file.
+
+    The text format is the original "x, P(x)" listing, preceded by a "# scheme=shamir field=2^256+297 t=3"
+    line when the threshold is given. The binary format starts with BINARY_HEADER followed by one record
+    per evaluation with x and P(x) as fixed width big-endian field elements.
+
+    Args:
+        evaluations (Iterable[Tuple[int, int]]): The (x, P(x)) points.
+        share_format (str): One of SHARE_FORMATS.
+        threshold (Optional[int]): The number of shares needed to reconstruct, recorded in the header.
+
+    Returns:
+        Iterator[bytes]: The chunks of the file, of about SHARE_CHUNK_SIZE bytes.
+
+    Raises:
+        ValueError: If the format is not one of SHARE_FORMATS or an evaluation is not a 2 dimensional point.
+    """
+    if share_format not in SHARE_FORMATS:
+        raise ValueError(f"Invalid share format: {share_format}. Choose one of {', '.join(SHARE_FORMATS)}.")
+    if share_format == "text":
+        return _encode_text(evaluations, threshold)
+    return _encode_binary(evaluations, threshold)
+
+def decode_evaluations(chunks: Iterable[bytes]) -> Iterator[Tuple[int, int]]:
+    """
+    Parses the chunks of a share file, detecting whether it is in the text or the binary format.
+
+    Args:
+        chunks (Iterable[bytes]): The content of the file in chunks of any size.
+
+    Returns:
+        Iterator[Tuple[int, int]]: The (x, P(x)) points, in the order of the file.
+
+    Raises:
+        ValueError: If the file is neither a valid text nor a valid binary share file.
+    """
+    return open_evaluations(chunks)[1]
+
+def open_evaluations(chunks: Iterable[bytes]) -> Tuple[ShareHeader, Iterator[Tuple[int, int]]]:
+    """
+    Reads the header of a share file and returns a lazy parser of its evaluations.
+
+    Only the bytes of the header are consumed from the chunks. The evaluations are yielded as
+    soon as their line or record is complete, so a large share file is never held in memory.
+
+    Args:
+        chunks (Iterable[bytes]): The content of the file in chunks of any size.
+
+    Returns:
+        tuple: The ShareHeader of the file and an iterator of its (x, P(x)) points.
+
+    Raises:
+        ValueError: If the header is not valid or names another scheme or field.
+    """
+    chunks = iter(chunks)
+    buffer = b""
+    for chunk in chunks:
+        buffer += chunk
+        if len(buffer) >= BINARY_HEADER.size:
+            break
+    if buffer.startswith(SHARE_MAGIC):
+        return _open_binary(buffer, chunks)
+    return _open_text(buffer, chunks)
+
+def collect_evaluations(sources: Iterable[Iterable[bytes]],
+                        stop_at_threshold: bool = True) -> Tuple[ShareHeader, List[Tuple[int, int]]]:
+    """
+    Gathers the evaluations of one or several share files, stopping once the threshold is reached.
+
+    The files are opened one after the other and read lazily. When the headers record the
+    threshold t, reading stops as soon as t distinct evaluations are known, so the cost of the
+    reconstruction depends on t and not on how many shares or files are given. Evaluations that
+    repeat an x already read with the same value are skipped.
+
+    Args:
+        sources (Iterable[Iterable[bytes]]): The chunks of every share file, produced lazily.
+        stop_at_threshold (bool): Stop at t evaluations, False reads every evaluation, for
+            reconstruct_robust.
+
+    Returns:
+        tuple: The merged ShareHeader and the distinct evaluations, exactly t of them when the
+            threshold is known and stop_at_threshold is True.
+
+    Raises:
+        ValueError: If there are no files or the files disagree on the scheme, the field, the threshold or the value of an x.
+        ValueError: If the threshold is known and the files hold fewer distinct evaluations.
+    """
+    header, evaluations, values = None, [], {}
+    for chunks in sources:
+        file_header, file_evaluations = open_evaluations(chunks)
+        header = _merge_headers(header, file_header)
+        for x, y in file_evaluations:
+            x_key, y_key = x % PRIME, y % PRIME
+            if x_key in values:
+                if values[x_key] != y_key:
+                    raise ValueError(f"Conflicting evaluations for x = {x}.")
+                continue
+            values[x_key] = y_key
             evaluations.append((x, y))
-        except ValueError:
-            raise ValueError(f"Invalid format: {raw_evaluation} is not in 'x, y' format")
-    return evaluations
\ No newline at end of file
+            if stop_at_threshold and len(evaluations) == header.threshold:
+                return header, evaluations
+    if header is None:
+        raise ValueError("At least one share file is needed.")
+    if header.threshold is not None and len(evaluations) < header.threshold:
+        raise ValueError(f"Only {len(evaluations)} distinct evaluations, {header.threshold} are needed.")
+    return header, evaluations
+
+def _merge_headers(header: Optional[ShareHeader], other: ShareHeader) -> ShareHeader:
+    """
+    Checks that the headers of two share files are compatible and combines their thresholds.
+
+    Args:
+        header (Optional[ShareHeader]): The header of the files read so far, None for the first file.
+        other (ShareHeader): The header of the next file.
+
+    Returns:
+        ShareHeader: The header of all the files.
+
+    Raises:
+        ValueError: If the files disagree on the scheme, the field or the threshold.
+    """
+    if header is None:
+        return other
+    if (header.scheme, header.field) != (other.scheme, other.field):
+        raise ValueError("The share files belong to different schemes or fields.")
+    if None not in (header.threshold, other.threshold) and header.threshold != other.threshold:
+        raise ValueError(f"The share files disagree on the threshold: {header.threshold} and {other.threshold}.")
+    return header if header.threshold is not None else header._replace(threshold=other.threshold)
+
+def _iter_text_lines(evaluations: Iterable[Tuple[int, int]]) -> Iterator[str]:
+    """
+    Formats the header and every evaluation as the lines of the text format.
+
+    Args:
+        evaluations (Iterable[Tuple[int, int]]): The (x, P(x)) points.
+
+    Returns:
+        Iterator[str]: The lines, without line breaks.
+
+    Raises:
+        ValueError: If any evaluation does not contain exactly two elements.
+    """
+    yield TEXT_HEADER
+    for evaluation in evaluations:
+        if len(evaluation) != 2:
+            raise ValueError("No 2 dimensional point")
+        yield f"{evaluation[0]}, {evaluation[1]}"
+
+def _parse_evaluation(line: str) -> Tuple[int, int]:
+    """
+    Parses one "x, y" line of the text format.
+
+    Args:
+        line (str): The line, without line break.
+
+    Returns:
+        Tuple[int, int]: The point (x, y).
+
+    Raises:
+        ValueError: If the line is not in the format "x, y".
+    """
+    try:
+        x, y = map(int, line.split(', '))
+    except ValueError:
+        raise ValueError(f"Invalid format: {line} is not in 'x, y' format")
+    return x, y
+
+def _parse_metadata(line: str) -> ShareHeader:
+    """
+    Parses the "# scheme=shamir field=2^256+297 t=3" line of the text format.
+
+    Args:
+        line (str): The line, without line break.
+
+    Returns:
+        ShareHeader: The header it describes.
+
+    Raises:
+        ValueError: If the line is malformed or names another scheme or field.
+    """
+    try:
+        fields = dict(item.split("=", 1) for item in line[1:].split())
+        threshold = int(fields["t"])
+    except (KeyError, ValueError):
+        raise ValueError(f"Invalid format: {line} is not a share file header")
+    if fields.get("scheme") not in SCHEME_NAMES.values():
+        raise ValueError(f"Unsupported scheme: {fields.get('scheme')}.")
+    if fields.get("field") != FIELD_NAME:
+        raise ValueError(f"Unsupported field: {fields.get('field')}.")
+    scheme = next(scheme for scheme, name in SCHEME_NAMES.items() if name == fields["scheme"])
+    return ShareHeader("text", scheme, FIELD_ID, threshold)
+
+def _encode_text(evaluations: Iterable[Tuple[int, int]], threshold: Optional[int]) -> Iterator[bytes]:
+    """
+    Encodes the evaluations in the text format, joining lines into chunks.
+
+    Args:
+        evaluations (Iterable[Tuple[int, int]]): The (x, P(x)) points.
+        threshold (Optional[int]): The threshold recorded in the metadata line, None omits the line.
+
+    Returns:
+        Iterator[bytes]: The chunks of the file.
+    """
+    lines, size = [], 0
+    if threshold is not None:
+        lines.append(f"# scheme={SCHEME_NAMES[SCHEME_SHAMIR]} field={FIELD_NAME} t={threshold}")
+    for line in _iter_text_lines(evaluations):
+        lines.append(line)
+        size += len(line) + 1
+        if size >= SHARE_CHUNK_SIZE:
+            yield ("\n".join(lines) + "\n").encode('utf-8')
+            lines, size = [], 0
+    if lines:
+        yield "\n".join(lines).encode('utf-8')
+
+def _encode_binary(evaluations: Iterable[Tuple[int, int]], threshold: Optional[int]) -> Iterator[bytes]:
+    """
+    Encodes the evaluations in the binary format, joining records into chunks.
+
+    Args:
+        evaluations (Iterable[Tuple[int, int]]): The (x, P(x)) points.
+        threshold (Optional[int]): The threshold recorded in the header, None records 0.
+
+    Returns:
+        Iterator[bytes]: The chunks of the file.
+
+    Raises:
+        ValueError: If any evaluation does not contain exactly two elements.
+    """
+    records = [BINARY_HEADER.pack(SHARE_MAGIC, BINARY_VERSION, SCHEME_SHAMIR, FIELD_ID, FIELD_BYTES, threshold or 0)]
+    size = BINARY_HEADER.size
+    for evaluation in evaluations:
+        if len(evaluation) != 2:
+            raise ValueError("No 2 dimensional point")
+        records.append((evaluation[0] % PRIME).to_bytes(FIELD_BYTES, 'big'))
+        records.append((evaluation[1] % PRIME).to_bytes(FIELD_BYTES, 'big'))
+        size += 2 * FIELD_BYTES
+        if size >= SHARE_CHUNK_SIZE:
+            yield b"".join(records)
+            records, size = [], 0
+    if records:
+        yield b"".join(records)
+
+def _open_text(buffer: bytes, chunks: Iterator[bytes]) -> Tuple[ShareHeader, Iterator[Tuple[int, int]]]:
+    """
+    Reads the header lines of a share file in the text format.
+
+    Args:
+        buffer (bytes): The bytes already read from the file.
+        chunks (Iterator[bytes]): The rest of the file.
+
+    Returns:
+        tuple: The ShareHeader and an iterator of the (x, P(x)) points.
+
+    Raises:
+        ValueError: If the file does not start with the header "x, P(x)", optionally after a metadata line.
+    """
+    lines = _iter_lines(buffer, chunks)
+    line = next(lines, None)
+    header = ShareHeader("text", SCHEME_SHAMIR, FIELD_ID, None)
+    if line is not None and line.startswith("#"):
+        header = _parse_metadata(line)
+        line = next(lines, None)
+    if line != TEXT_HEADER:
+        raise ValueError("Invalid format: there is no header.")
+    return header, (_parse_evaluation(line) for line in lines)
+
+def _iter_lines(buffer: bytes, chunks: Iterator[bytes]) -> Iterator[str]:
+    """
+    Splits the rest of a text file into lines as its chunks arrive.
+
+    A single line break at the end of the file does not produce an empty last line.
+
+    Args:
+        buffer (bytes): The bytes already read from the file.
+        chunks (Iterator[bytes]): The rest of the file.
+
+    Returns:
+        Iterator[str]: The lines, without line breaks.
+    """
+    for chunk in itertools.chain([b""], chunks):
+        buffer += chunk
+        lines = buffer.split(b"\n")
+        buffer = lines.pop()
+        for line in lines:
+            yield line.decode('utf-8', 'replace')
+    if buffer:
+        yield buffer.decode('utf-8', 'replace')
+
+def _open_binary(buffer: bytes, chunks: Iterator[bytes]) -> Tuple[ShareHeader, Iterator[Tuple[int, int]]]:
+    """
+    Reads the header of a share file in the binary format, version 1 or 2.
+
+    Args:
+        buffer (bytes): The bytes already read from the file, at least the header if the file has one.
+        chunks (Iterator[bytes]): The rest of the file.
+
+    Returns:
+        tuple: The ShareHeader and an iterator of the (x, P(x)) points.
+
+    Raises:
+        ValueError: If the header is truncated or of an unsupported version, scheme or field.
+    """
+    version = buffer[len(SHARE_MAGIC)] if len(buffer) > len(SHARE_MAGIC) else None
+    if version == 1 and len(buffer) >= _BINARY_HEADER_V1.size:
+        _, _, width = _BINARY_HEADER_V1.unpack_from(buffer)
+        header = ShareHeader("binary", SCHEME_SHAMIR, FIELD_ID, None)
+        buffer = buffer[_BINARY_HEADER_V1.size:]
+    elif version == BINARY_VERSION and len(buffer) >= BINARY_HEADER.size:
+        _, _, scheme, field, width, threshold = BINARY_HEADER.unpack_from(buffer)
+        if scheme not in SCHEME_NAMES:
+            raise ValueError(f"Unsupported scheme: {scheme}.")
+        if field != FIELD_ID:
+            raise ValueError(f"Unsupported field: {field}.")
+        header = ShareHeader("binary", scheme, field, threshold or None)
+        buffer = buffer[BINARY_HEADER.size:]
+    elif version in (1, BINARY_VERSION, None):
+        raise ValueError("Invalid format: the binary share header is truncated.")
+    else:
+        raise ValueError(f"Invalid format: unsupported binary share version {version}.")
+    if width != FIELD_BYTES:
+        raise ValueError(f"Invalid format: field elements of {width} bytes, expected {FIELD_BYTES}.")
+    return header, _iter_records(buffer, chunks)
+
+def _iter_records(buffer: bytes, chunks: Iterator[bytes]) -> Iterator[Tuple[int, int]]:
+    """
+    Parses the records of a binary share file as its chunks arrive.
+
+    Args:
+        buffer (bytes): The bytes already read after the header.
+        chunks (Iterator[bytes]): The rest of the file.
+
+    Returns:
+        Iterator[Tuple[int, int]]: The (x, P(x)) points.
+
+    Raises:
+        ValueError: If the last record is truncated.
+    """
+    record = 2 * FIELD_BYTES
+    for chunk in itertools.chain([b""], chunks):
+        buffer += chunk
+        end = len(buffer) - len(buffer) % record
+        for offset in range(0, end, record):
+            yield (int.from_bytes(buffer[offset:offset + FIELD_BYTES], 'big'),
+                   int.from_bytes(buffer[offset + FIELD_BYTES:offset + record], 'big'))
+        buffer = buffer[end:]
+    if buffer:
+        raise ValueError("Invalid format: the last binary share record is truncated.")
+
+class BatchHeader(NamedTuple):
+    """
+    The metadata of a batch share file.
+
+    Attributes:
+        scheme (int): The sharing scheme, SCHEME_SHAMIR.
+        field (int): The field of the shares, FIELD_ID.
+        threshold (Optional[int]): The number of holders needed to reconstruct, None if the file does not record it.
+        holders (int): The number of holder records in the file.
+        secrets (int): The number of secrets.
+        pack_size (int): The number of secrets of every share, 1 outside SCHEME_PACKED.
+    """
+    scheme: int
+    field: int
+    threshold: Optional[int]
+    holders: int
+    secrets: int
+    pack_size: int = 1
+
+    @property
+    def columns(self) -> int:
+        """
+        int: The number of shares of every holder record.
+        """
+        return -(-self.secrets // self.pack_size)
+
+def encode_share_batch(x_values: Sequence[int], shares: Sequence[Sequence[int]],
+                       threshold: Optional[int] = None, pack_size: int = 1,
+                       secret_count: Optional[int] = None) -> Iterator[bytes]:
+    """
+    Encodes the holder-major matrix of shares of many secrets as the chunks of a batch share file.
+
+    Args:
+        x_values (Sequence[int]): The x coordinate of every holder.
+        shares (Sequence[Sequence[int]]): Row i holds P_j(x_i) for every secret j, or for every
+            pack j of generate_packed_shares.
+        threshold (Optional[int]): The number of holders needed to reconstruct, recorded in the header.
+        pack_size (int): The number of secrets of every pack, more than 1 writes a SCHEME_PACKED file.
+        secret_count (Optional[int]): The number of packed secrets, None counts full packs.
+
+    Returns:
+        Iterator[bytes]: The header and then the record of every holder.
+
+    Raises:
+        ValueError: If the matrix does not have one row of the same length per x value.
+        ValueError: If the number of secrets does not fill the packs of the rows.
+    """
+    if len(shares) != len(x_values) or len({len(row) for row in shares}) > 1:
+        raise ValueError("Invalid shares. Ensure that there is one row of the same length per x value.")
+    columns = len(shares[0]) if shares else 0
+    if secret_count is None:
+        secret_count = columns * pack_size
+    if -(-secret_count // pack_size) != columns:
+        raise ValueError("Invalid number of secrets. Ensure that it fills the packs of the shares.")
+    scheme = SCHEME_PACKED if pack_size > 1 else SCHEME_SHAMIR
+    yield BATCH_HEADER.pack(BATCH_MAGIC, BATCH_VERSION, scheme, FIELD_ID, FIELD_BYTES,
+                            threshold or 0, len(x_values), secret_count)
+    if scheme == SCHEME_PACKED:
+        yield PACK_HEADER.pack(pack_size)
+    for x, row in zip(x_values, shares):
+        yield b"".join(value.to_bytes(FIELD_BYTES, 'big') for value in itertools.chain([x % PRIME], (y % PRIME for y in row)))
+
+def open_share_batch(chunks: Iterable[bytes]) -> Tuple[BatchHeader, Iterator[Tuple[int, List[int]]]]:
+    """
+    Reads the header of a batch share file and returns a lazy parser of its holder records.
+
+    Args:
+        chunks (Iterable[bytes]): The content of the file in chunks of any size.
+
+    Returns:
+        tuple: The BatchHeader and an iterator of the (x, row of shares) of every holder.
+
+    Raises:
+        ValueError: If the header is truncated or of an unsupported version, scheme or field.
+    """
+    chunks = iter(chunks)
+    buffer = b""
+    for chunk in chunks:
+        buffer += chunk
+        if len(buffer) >= BATCH_HEADER.size + PACK_HEADER.size:
+            break
+    if len(buffer) < BATCH_HEADER.size or not buffer.startswith(BATCH_MAGIC):
+        raise ValueError("Invalid format: there is no batch share header.")
+    _, version, scheme, field, width, threshold, holders, secret_count = BATCH_HEADER.unpack_from(buffer)
+    if version != BATCH_VERSION:
+        raise ValueError(f"Invalid format: unsupported batch share version {version}.")
+    if scheme not in SCHEME_NAMES and scheme != SCHEME_PACKED:
+        raise ValueError(f"Unsupported scheme: {scheme}.")
+    if field != FIELD_ID or width != FIELD_BYTES:
+        raise ValueError(f"Unsupported field: {field}.")
+    size, pack_size = BATCH_HEADER.size, 1
+    if scheme == SCHEME_PACKED:
+        if len(buffer) < size + PACK_HEADER.size:
+            raise ValueError("Invalid format: the batch share header is truncated.")
+        pack_size, = PACK_HEADER.unpack_from(buffer, size)
+        size += PACK_HEADER.size
+        if pack_size == 0:
+            raise ValueError("Invalid format: packs of 0 secrets.")
+    header = BatchHeader(scheme, field, threshold or None, holders, secret_count, pack_size)
+    return header, _iter_batch_records(buffer[size:], chunks, header)
+
+def load_share_batch(chunks: Iterable[bytes]) -> Tuple[BatchHeader, List[int], List[List[int]]]:
+    """
+    Reads the holders needed to reconstruct the secrets of a batch share file.
+
+    When the header records the threshold t only the first t holder records are parsed,
+    otherwise every record is.
+
+    Args:
+        chunks (Iterable[bytes]): The content of the file in chunks of any size.
+
+    Returns:
+        tuple: The BatchHeader, the x values and the holder-major matrix of shares. With
+            SCHEME_SHAMIR they are ready for reconstruct_secrets_batch, with SCHEME_PACKED for
+            reconstruct_packed_secrets with the threshold, pack size and secrets of the header.
+
+    Raises:
+        ValueError: If the file is not a valid batch share file or has fewer holders than the threshold.
+    """
+    header, records = open_share_batch(chunks)
+    if header.threshold is not None:
+        if header.threshold > header.holders:
+            raise ValueError(f"Only {header.holders} holders, {header.threshold} are needed.")
+        records = itertools.islice(records, header.threshold)
+    x_values, shares = [], []
+    for x, row in records:
+        x_values.append(x)
+        shares.append(row)
+    return header, x_values, shares
+
+def _iter_batch_records(buffer: bytes, chunks: Iterator[bytes], header: BatchHeader) -> Iterator[Tuple[int, List[int]]]:
+    """
+    Parses the holder records of a batch share file as its chunks arrive.
+
+    Args:
+        buffer (bytes): The bytes already read after the header.
+        chunks (Iterator[bytes]): The rest of the file.
+        header (BatchHeader): The header of the file.
+
+    Returns:
+        Iterator[Tuple[int, List[int]]]: The x and the row of shares of every holder.
+
+    Raises:
+        ValueError: If the file ends before the last record or has bytes after it.
+    """
+    record = (header.columns + 1) * FIELD_BYTES
+    remaining = header.holders
+    for chunk in itertools.chain([b""], chunks):
+        buffer += chunk
+        offset = 0
+        while remaining and len(buffer) - offset >= record:
+            values = [int.from_bytes(buffer[i:i + FIELD_BYTES], 'big') for i in range(offset, offset + record, FIELD_BYTES)]
+            offset += record
+            remaining -= 1
+            yield values[0], values[1:]
+        buffer = buffer[offset:]
+        if not remaining and buffer:
+            raise ValueError("Invalid format: unexpected bytes after the last holder record.")
+    if remaining:
+        raise ValueError("Invalid format: the batch share file is truncated.")
@@ -26,6 +26,28 @@ def setup_and_teardown():
     for path, mode in original_permissions.items():
         os.chmod(path, mode)
 
+@pytest.fixture(scope="session", autouse=True)
+def engine_cache(tmp_path_factory):
+    """
+    Keeps the cached fastest cipher engine of the tests out of the user cache directory.
+    """
+    path = tmp_path_factory.mktemp("engine_cache") / "cipher_engine.json"
+    os.environ["SHAMIR_ENGINE_CACHE"] = str(path)
+    yield path
+    os.environ.pop("SHAMIR_ENGINE_CACHE", None)
+
+@pytest.fixture(params=["python", "gmpy2"])
+def field_arithmetic(request):
+    """
+    Runs a test once with every field backend of shamir_scheme, gmpy2 is skipped when it is not installed.
+    """
+    if request.param == "gmpy2":
+        pytest.importorskip("gmpy2")
+    import shamir_scheme
+    previous = shamir_scheme._field_backend
+    yield shamir_scheme.set_field_backend(request.param)
+    shamir_scheme._field_backend = previous
+
 @pytest.fixture(scope="session")
 def text_samples() -> List[str]:
     text = []
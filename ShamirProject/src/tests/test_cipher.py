@@ -2,7 +2,19 @@ import pytest
 import os
 import sys
 sys.path.append(os.path.abspath("./src/main"))
-from cipher import encrypt, decrypt, get_key
+import cipher
+from cipher import (
+    AesCtrHmac,
+    encrypt,
+    decrypt,
+    encrypt_bytes,
+    decrypt_bytes,
+    encrypt_stream,
+    decrypt_stream,
+    fastest_engine,
+    get_key,
+    resolve_engine
+)
 
 PASSWORDS = [
     "P63t7$9lSCZ)",
@@ -66,3 +78,158 @@ def test_get_key(password):
         if password != alternative_password:
             alternative_key = get_key(alternative_password)
             assert key != alternative_key
+
+def split_chunks(data, chunk_size):
+    """
+    Splits data into chunks of at most chunk_size bytes.
+
+    Args:
+        data (bytes): The data to split.
+        chunk_size (int): The maximum size of every chunk.
+
+    Returns:
+        list of bytes: The chunks of data.
+    """
+    return [data[i:i + chunk_size] for i in range(0, len(data), chunk_size)]
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 16, 33, 4096])
+def test_stream_round_trip(chunk_size, text_samples):
+    """
+    Test that decrypt_stream recovers the data encrypted with encrypt_stream for any chunk size.
+
+    Args:
+        chunk_size (int): The size of the chunks fed to the streams.
+        text_samples (list): A list of text samples to be encrypted.
+    """
+    key = get_key(PASSWORDS[0])
+    for data in [text.encode('utf-8') for text in text_samples] + [b"", bytes(16), bytes(range(256)) * 5]:
+        encrypted_content = b"".join(encrypt_stream(split_chunks(data, chunk_size), key))
+        assert len(encrypted_content) % 16 == 0
+        decrypted_chunks = decrypt_stream(split_chunks(encrypted_content, chunk_size), key)
+        assert b"".join(decrypted_chunks) == data
+
+@pytest.mark.parametrize("password", PASSWORDS[:4])
+def test_stream_matches_in_memory_format(password, text_samples):
+    """
+    Test that the streaming and in memory functions read each other's output.
+
+    Args:
+        password (str): The password used for encryption.
+        text_samples (list): A list of text samples to be encrypted.
+    """
+    key = get_key(password)
+    for text in text_samples:
+        streamed_content = b"".join(encrypt_stream([text.encode('utf-8')], key))
+        assert decrypt(streamed_content, key) == text
+        encrypted_content = encrypt(text, password)
+        assert b"".join(decrypt_stream(split_chunks(encrypted_content, 10), key)) == text.encode('utf-8')
+
+@pytest.mark.parametrize("encrypted_content", [b"", bytes(10), bytes(20)])
+def test_decrypt_stream_truncated(encrypted_content):
+    """
+    Test that decrypt_stream raises ValueError for truncated content.
+
+    Args:
+        encrypted_content (bytes): The truncated encrypted content.
+    """
+    with pytest.raises(ValueError):
+        list(decrypt_stream([encrypted_content], get_key(PASSWORDS[0])))
+
+def test_decrypt_stream_wrong_key(text_samples):
+    """
+    Test that decrypt_stream raises ValueError when the key does not match.
+    """
+    encrypted_content = b"".join(encrypt_stream([text_samples[0].encode('utf-8')], get_key(PASSWORDS[0])))
+    with pytest.raises(ValueError):
+        list(decrypt_stream([encrypted_content], get_key(PASSWORDS[1])))
+
+@pytest.mark.parametrize("length", [0, 1, 15, 16, 17, 31, 32, 1000])
+def test_bytes_round_trip(length):
+    """
+    Test that decrypt_bytes recovers the data encrypted with encrypt_bytes and that
+    the output interoperates with the str based functions.
+
+    Args:
+        length (int): The length of the plaintext.
+    """
+    key = get_key(PASSWORDS[0])
+    data = (bytes(range(256)) * 4)[:length]
+    encrypted_content = encrypt_bytes(memoryview(data), key)
+    assert len(encrypted_content) == 16 + (length // 16 + 1) * 16
+    assert bytes(decrypt_bytes(encrypted_content, key)) == data
+    assert b"".join(decrypt_stream([bytes(encrypted_content)], key)) == data
+    text = data.decode('latin-1')
+    assert bytes(decrypt_bytes(encrypt(text, PASSWORDS[0]), key)) == text.encode('utf-8')
+
+@pytest.mark.parametrize("encrypted_content", [b"", bytes(16), bytes(40)])
+def test_decrypt_bytes_truncated(encrypted_content):
+    """
+    Test that decrypt_bytes raises ValueError for truncated content.
+
+    Args:
+        encrypted_content (bytes): The truncated encrypted content.
+    """
+    with pytest.raises(ValueError):
+        decrypt_bytes(encrypted_content, get_key(PASSWORDS[0]))
+
+def test_aes_ctr_hmac():
+    """
+    Test that AES-CTR-HMAC round trips and rejects modified ciphertexts, associated data and nonces.
+    """
+    from cryptography.exceptions import InvalidTag
+    engine = AesCtrHmac(bytes(range(64)))
+    nonce = bytes(12)
+    sealed = engine.encrypt(nonce, b"segment content", b"header")
+    assert len(sealed) == len(b"segment content") + 16
+    assert engine.decrypt(nonce, sealed, b"header") == b"segment content"
+    for modified in [(nonce, sealed[:-1] + bytes([sealed[-1] ^ 1]), b"header"),
+                     (nonce, bytes([sealed[0] ^ 1]) + sealed[1:], b"header"),
+                     (nonce, sealed, b"headers"),
+                     (b"\x01" * 12, sealed, b"header"),
+                     (nonce, sealed[:10], b"header")]:
+        with pytest.raises(InvalidTag):
+            engine.decrypt(*modified)
+    with pytest.raises(ValueError):
+        AesCtrHmac(bytes(32))
+
+def test_fastest_engine_is_cached(tmp_path, monkeypatch):
+    """
+    Test that the engine benchmark runs once per host and its result is read back from the cache.
+    """
+    import json
+    runs = []
+
+    def benchmark():
+        runs.append(1)
+        return {"aes-gcm": 1.0, "aes-ctr-hmac": 3.0, "chacha20-poly1305": 2.0}
+
+    monkeypatch.setattr(cipher, "benchmark_engines", benchmark)
+    cache_path = str(tmp_path / "cache" / "engine.json")
+    assert fastest_engine(cache_path) == "aes-ctr-hmac"
+    assert fastest_engine(cache_path) == "aes-ctr-hmac"
+    assert len(runs) == 1
+    with open(cache_path) as file:
+        cached = json.load(file)
+    cached["host"]["machine"] = "another machine"
+    with open(cache_path, "w") as file:
+        json.dump(cached, file)
+    assert fastest_engine(cache_path) == "aes-ctr-hmac"
+    assert len(runs) == 2
+    with open(cache_path, "w") as file:
+        file.write("not json")
+    assert fastest_engine(cache_path) == "aes-ctr-hmac"
+    assert len(runs) == 3
+    assert fastest_engine(str(tmp_path / "cache" / "engine.json" / "unwritable")) == "aes-ctr-hmac"
+
+def test_resolve_engine(monkeypatch):
+    """
+    Test that auto resolves to the fastest engine once per process and unknown engines are rejected.
+    """
+    monkeypatch.setattr(cipher, "_fastest_engine", None)
+    monkeypatch.setattr(cipher, "fastest_engine", lambda: "chacha20-poly1305")
+    assert resolve_engine("auto") == "chacha20-poly1305"
+    monkeypatch.setattr(cipher, "fastest_engine", lambda: "aes-gcm")
+    assert resolve_engine("auto") == "chacha20-poly1305"
+    assert resolve_engine("aes-gcm") == "aes-gcm"
+    with pytest.raises(ValueError):
+        resolve_engine("aes-cbc")
@@ -0,0 +1,367 @@
+import pytest
+import io
+import os
+import sys
+sys.path.append(os.path.abspath("./src/main"))
+from cipher import encrypt, get_key
+from container import (
+    ALGORITHMS,
+    COMPRESSION_SHIFT,
+    HEADER,
+    INDEX_TRAILER,
+    SEGMENT_LENGTH,
+    decrypt_container,
+    decrypt_range,
+    WRAPPED_KEY_SIZE,
+    encrypt_container,
+    is_container,
+    parallel_map,
+    read_index,
+    rewrap_key
+)
+
+KEY = get_key("container password")
+
+DATA = [
+    b"",
+    b"a",
+    bytes(range(256)) * 3,
+    os.urandom(5000)
+]
+
+def encrypt_to_bytes(data, segment_size, workers=1, chunk_size=None, indexed=True, compression="none", engine="aes-gcm",
+                     envelope=False):
+    """
+    Encrypts data into a container held in memory.
+
+    Args:
+        data (bytes): The plaintext.
+        segment_size (int): The size of the plaintext segments.
+        workers (int): The number of threads encrypting segments.
+        chunk_size (int): The size of the chunks fed to the encryption, defaults to segment_size.
+        indexed (bool): Whether the index footer is written.
+        compression (str): The compression of the segments.
+        engine (str): The cipher engine of the segments.
+        envelope (bool): Whether the segments are encrypted with a wrapped data key.
+
+    Returns:
+        bytes: The container.
+    """
+    chunk_size = chunk_size or segment_size
+    chunks = [data[i:i + chunk_size] for i in range(0, len(data), chunk_size)]
+    return b"".join(encrypt_container(chunks, KEY, workers, segment_size, indexed, compression, engine, envelope))
+
+def decrypt_from_bytes(content, key=KEY, workers=1):
+    """
+    Decrypts a container held in memory.
+
+    Args:
+        content (bytes): The container.
+        key (bytes): The key used to decrypt.
+        workers (int): The number of threads decrypting segments.
+
+    Returns:
+        bytes: The plaintext.
+    """
+    return b"".join(decrypt_container(io.BytesIO(content), key, workers))
+
+@pytest.mark.parametrize("data", DATA)
+@pytest.mark.parametrize("segment_size, chunk_size, workers", [
+    (16, 16, 1),
+    (100, 7, 4),
+    (1024, 4096, 2),
+    (1 << 20, 1 << 20, 3)
+])
+def test_container_round_trip(data, segment_size, chunk_size, workers):
+    """
+    Test that decrypt_container recovers the data for any segment size, chunk size and number of workers.
+
+    Args:
+        data (bytes): The plaintext.
+        segment_size (int): The size of the plaintext segments.
+        chunk_size (int): The size of the chunks fed to the encryption.
+        workers (int): The number of threads.
+    """
+    content = encrypt_to_bytes(data, segment_size, workers, chunk_size)
+    assert is_container(content)
+    assert len(data) < 16 or data not in content
+    assert decrypt_from_bytes(content, workers=workers) == data
+    assert decrypt_from_bytes(content, workers=1) == data
+
+def test_legacy_format_is_not_container():
+    """
+    Test that the original AES-CBC format is not detected as a container.
+    """
+    assert not is_container(encrypt("legacy text", "container password"))
+    assert not is_container(b"")
+
+def test_decrypt_container_wrong_key():
+    """
+    Test that decrypt_container raises ValueError when the key does not match.
+    """
+    content = encrypt_to_bytes(DATA[2], 100)
+    with pytest.raises(ValueError):
+        decrypt_from_bytes(content, get_key("another password"))
+
+@pytest.mark.parametrize("cut", [0, 10, HEADER.size, HEADER.size + 2, -1, -120])
+def test_decrypt_container_truncated(cut):
+    """
+    Test that decrypt_container raises ValueError for truncated containers,
+    including those cut exactly at a segment boundary.
+
+    Args:
+        cut (int): The number of bytes kept, negative values remove bytes from the end.
+    """
+    content = encrypt_to_bytes(DATA[2], 100, indexed=False)
+    with pytest.raises(ValueError):
+        decrypt_from_bytes(content[:cut])
+    segment = SEGMENT_LENGTH.size + 100 + 16
+    with pytest.raises(ValueError):
+        decrypt_from_bytes(content[:HEADER.size + 2 * segment])
+
+def test_decrypt_container_reordered_segments():
+    """
+    Test that decrypt_container raises ValueError when two segments are swapped.
+    """
+    content = encrypt_to_bytes(DATA[2], 100)
+    segment = SEGMENT_LENGTH.size + 100 + 16
+    first = content[HEADER.size:HEADER.size + segment]
+    second = content[HEADER.size + segment:HEADER.size + 2 * segment]
+    swapped = content[:HEADER.size] + second + first + content[HEADER.size + 2 * segment:]
+    with pytest.raises(ValueError):
+        decrypt_from_bytes(swapped)
+
+@pytest.mark.parametrize("workers", [1, 2, 5])
+def test_parallel_map_keeps_order(workers):
+    """
+    Test that parallel_map yields the results in the order of the items.
+
+    Args:
+        workers (int): The number of threads.
+    """
+    assert list(parallel_map(lambda x: x * x, iter(range(100)), workers)) == [x * x for x in range(100)]
+
+class CountingBytesIO(io.BytesIO):
+    """
+    In memory file that counts the bytes read from it.
+    """
+
+    def __init__(self, content):
+        super().__init__(content)
+        self.bytes_read = 0
+
+    def read(self, size=-1):
+        data = super().read(size)
+        self.bytes_read += len(data)
+        return data
+
+@pytest.mark.parametrize("indexed", [True, False])
+@pytest.mark.parametrize("start, length", [
+    (0, None),
+    (0, 1),
+    (99, 2),
+    (100, 100),
+    (250, 1000),
+    (767, 1),
+    (768, 5),
+    (-1, None),
+    (-150, 20),
+    (-5000, None),
+    (10, 0)
+])
+def test_decrypt_range(indexed, start, length):
+    """
+    Test that decrypt_range returns the same bytes as slicing the plaintext.
+
+    Args:
+        indexed (bool): Whether the container has an index footer.
+        start (int): The first byte of the range.
+        length (int): The number of bytes of the range.
+    """
+    data = DATA[2]
+    content = encrypt_to_bytes(data, 100, indexed=indexed)
+    expected = data[start:] if length is None else data[start:][:length]
+    for workers in [1, 3]:
+        assert b"".join(decrypt_range(io.BytesIO(content), KEY, start, length, workers)) == expected
+
+def test_decrypt_range_reads_only_covering_segments():
+    """
+    Test that the bytes read by decrypt_range depend on the range and not on the file size.
+    """
+    data = os.urandom(200 * 1024)
+    content = encrypt_to_bytes(data, 1024)
+    source = CountingBytesIO(content)
+    assert b"".join(decrypt_range(source, KEY, -3000)) == data[-3000:]
+    assert source.bytes_read < 6 * 1024 + len(content) // 100
+
+def test_read_index():
+    """
+    Test that read_index returns the same segments with and without the index footer.
+    """
+    indexed = encrypt_to_bytes(DATA[3], 1000)
+    scanned = encrypt_to_bytes(DATA[3], 1000, indexed=False)
+    index = read_index(io.BytesIO(indexed), KEY)
+    assert index == read_index(io.BytesIO(scanned), KEY)
+    assert index.plaintext_size == len(DATA[3])
+    assert len(index.entries) == 5
+
+@pytest.mark.parametrize("position", [-1, -INDEX_TRAILER.size, -INDEX_TRAILER.size - 1])
+def test_decrypt_range_tampered_index(position):
+    """
+    Test that decrypt_range raises ValueError when the index footer is modified.
+
+    Args:
+        position (int): The position of the modified byte, counted from the end.
+    """
+    content = bytearray(encrypt_to_bytes(DATA[2], 100))
+    content[position] ^= 1
+    with pytest.raises(ValueError):
+        list(decrypt_range(io.BytesIO(bytes(content)), KEY, 0))
+
+def test_decrypt_range_invalid_length():
+    """
+    Test that decrypt_range raises ValueError for a negative length.
+    """
+    with pytest.raises(ValueError):
+        list(decrypt_range(io.BytesIO(encrypt_to_bytes(DATA[2], 100)), KEY, 0, -1))
+
+TEXT = b"".join(b"line %d of a highly compressible document\n" % (i % 50) for i in range(3000))
+
+def compression_of(content):
+    """
+    Reads the compression recorded in the header of a container.
+
+    Args:
+        content (bytes): The container.
+
+    Returns:
+        int: The identifier of the compression.
+    """
+    return HEADER.unpack_from(content)[3] >> COMPRESSION_SHIFT
+
+@pytest.mark.parametrize("compression", ["zlib", "lzma", "bz2"])
+@pytest.mark.parametrize("workers", [1, 3])
+def test_compressed_round_trip(compression, workers):
+    """
+    Test that compressed containers are smaller and decrypt to the same data, even when
+    some segments do not compress.
+
+    Args:
+        compression (str): The compression of the segments.
+        workers (int): The number of threads.
+    """
+    data = TEXT + os.urandom(5000) + TEXT[:777]
+    content = encrypt_to_bytes(data, 4096, workers, 1000, compression=compression)
+    assert compression_of(content) != 0
+    assert len(content) < len(data) // 2
+    assert decrypt_from_bytes(content, workers=workers) == data
+
+def test_compression_skipped_for_random_data():
+    """
+    Test that documents whose first segment does not compress are written without compression.
+    """
+    data = os.urandom(3000) + TEXT
+    content = encrypt_to_bytes(data, 1024, compression="zlib")
+    assert compression_of(content) == 0
+    assert decrypt_from_bytes(content) == data
+    assert compression_of(encrypt_to_bytes(b"", 1024, compression="zlib")) == 0
+
+@pytest.mark.parametrize("indexed", [True, False])
+def test_decrypt_range_compressed(indexed):
+    """
+    Test that byte ranges of a compressed container are decrypted and read_index reports the plaintext size.
+
+    Args:
+        indexed (bool): Whether the container has an index footer.
+    """
+    content = encrypt_to_bytes(TEXT, 1000, compression="zlib", indexed=indexed)
+    assert read_index(io.BytesIO(content), KEY).plaintext_size == len(TEXT)
+    for start, length in [(0, None), (999, 2), (-1500, 700), (-1, None)]:
+        expected = TEXT[start:] if length is None else TEXT[start:][:length]
+        assert b"".join(decrypt_range(io.BytesIO(content), KEY, start, length)) == expected
+
+def test_unsupported_compression():
+    """
+    Test that unknown compressions are rejected when encrypting and when reading the header.
+    """
+    with pytest.raises(ValueError):
+        encrypt_to_bytes(TEXT, 1000, compression="zstd")
+    content = bytearray(encrypt_to_bytes(TEXT, 1000))
+    content[HEADER.size - 16 - 4 - 2] = 9
+    with pytest.raises(ValueError):
+        decrypt_from_bytes(bytes(content))
+
+@pytest.mark.parametrize("engine", ["aes-gcm", "aes-ctr-hmac", "chacha20-poly1305"])
+def test_engine_round_trip(engine):
+    """
+    Test that every cipher engine is recorded in the header, round trips, decrypts ranges and
+    rejects modified segments and wrong keys.
+
+    Args:
+        engine (str): The cipher engine of the segments.
+    """
+    data = DATA[3]
+    content = encrypt_to_bytes(data, 1000, 2, compression="zlib", engine=engine)
+    assert HEADER.unpack_from(content)[2] == ALGORITHMS[engine]
+    assert decrypt_from_bytes(content, workers=2) == data
+    assert b"".join(decrypt_range(io.BytesIO(content), KEY, 1500, 1000)) == data[1500:2500]
+    tampered = bytearray(content)
+    tampered[HEADER.size + SEGMENT_LENGTH.size + 5] ^= 1
+    with pytest.raises(ValueError):
+        decrypt_from_bytes(bytes(tampered))
+    with pytest.raises(ValueError):
+        decrypt_from_bytes(content, get_key("another password"))
+
+def test_auto_engine(engine_cache):
+    """
+    Test that the auto engine writes a container with one of the supported engines.
+    """
+    content = encrypt_to_bytes(DATA[2], 100, engine="auto")
+    assert HEADER.unpack_from(content)[2] in ALGORITHMS.values()
+    assert decrypt_from_bytes(content) == DATA[2]
+    with pytest.raises(ValueError):
+        encrypt_to_bytes(DATA[2], 100, engine="des")
+
+@pytest.mark.parametrize("indexed", [True, False])
+@pytest.mark.parametrize("compression", ["none", "zlib"])
+def test_envelope_round_trip(indexed, compression):
+    """
+    Test that envelope containers round trip, decrypt ranges and read their index.
+
+    Args:
+        indexed (bool): Whether the container has an index footer.
+        compression (str): The compression of the segments.
+    """
+    data = DATA[2]
+    content = encrypt_to_bytes(data, 100, 2, indexed=indexed, compression=compression, envelope=True)
+    assert decrypt_from_bytes(content, workers=2) == data
+    assert b"".join(decrypt_range(io.BytesIO(content), KEY, 250, 300)) == data[250:550]
+    assert read_index(io.BytesIO(content), KEY).plaintext_size == len(data)
+    with pytest.raises(ValueError):
+        decrypt_from_bytes(content, get_key("another password"))
+
+def test_rewrap_key():
+    """
+    Test that rewrapping changes only the wrapped key and that only the new key decrypts afterwards.
+    """
+    content = encrypt_to_bytes(DATA[3], 1000, envelope=True)
+    new_key = get_key("new container password")
+    target = io.BytesIO(content)
+    rewrap_key(target, KEY, new_key)
+    rotated = target.getvalue()
+    changed = [i for i, (a, b) in enumerate(zip(content, rotated)) if a != b]
+    assert len(rotated) == len(content)
+    assert HEADER.size <= changed[0] and changed[-1] < HEADER.size + WRAPPED_KEY_SIZE
+    assert decrypt_from_bytes(rotated, new_key) == DATA[3]
+    with pytest.raises(ValueError):
+        decrypt_from_bytes(rotated)
+    with pytest.raises(ValueError):
+        rewrap_key(io.BytesIO(rotated), KEY, new_key)
+
+def test_rewrap_key_without_envelope():
+    """
+    Test that rewrap_key raises ValueError for containers encrypted directly with the key.
+    """
+    target = io.BytesIO(encrypt_to_bytes(DATA[2], 100))
+    with pytest.raises(ValueError):
+        rewrap_key(target, KEY, get_key("new container password"))
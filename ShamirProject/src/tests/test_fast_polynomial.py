@@ -0,0 +1,225 @@
+import pytest
+import os
+import random
+import sys
+sys.path.append(os.path.abspath("./src/main"))
+import fast_polynomial
+import shamir_scheme
+from fast_polynomial import (
+    gao_decode,
+    interpolate,
+    lagrange_weights_at_zero,
+    multipoint_evaluate,
+    poly_divmod,
+    poly_mul,
+    product_tree
+)
+from shamir_scheme import (
+    PRIME,
+    WeightCache,
+    generate_shares,
+    get_evaluations,
+    reconstruct_from_evaluations,
+    _evaluate_polynomial,
+    _lagrange_weights_at_zero
+)
+
+pytestmark = pytest.mark.usefixtures("field_arithmetic")
+
+def random_polynomial(length):
+    """
+    Generates a random polynomial over the prime field.
+
+    Args:
+        length (int): The number of coefficients.
+
+    Returns:
+        list: The coefficients, lowest degree first.
+    """
+    return [random.randrange(PRIME) for _ in range(length)]
+
+@pytest.fixture(params=[(16, 32), (2, 1)])
+def small_thresholds(request, monkeypatch):
+    """
+    Runs a test with the default thresholds and with thresholds that force
+    Kronecker multiplication and remainder trees on tiny inputs.
+    """
+    schoolbook, leaf = request.param
+    monkeypatch.setattr(fast_polynomial, "SCHOOLBOOK_THRESHOLD", schoolbook)
+    monkeypatch.setattr(fast_polynomial, "LEAF_SIZE", leaf)
+
+@pytest.mark.parametrize("len_a, len_b", [(1, 1), (3, 20), (20, 20), (64, 17), (100, 250)])
+def test_poly_mul(len_a, len_b, small_thresholds):
+    """
+    Test that poly_mul matches the term by term product.
+
+    Args:
+        len_a (int): The number of coefficients of the first polynomial.
+        len_b (int): The number of coefficients of the second polynomial.
+    """
+    a, b = random_polynomial(len_a), random_polynomial(len_b)
+    expected = [0] * (len_a + len_b - 1)
+    for i, c in enumerate(a):
+        for j, d in enumerate(b):
+            expected[i + j] = (expected[i + j] + c * d) % PRIME
+    assert poly_mul(a, b) == expected
+
+@pytest.mark.parametrize("len_a, len_b", [(1, 1), (5, 9), (20, 3), (100, 40), (300, 299)])
+def test_poly_divmod(len_a, len_b, small_thresholds):
+    """
+    Test that the quotient and remainder of poly_divmod rebuild the dividend.
+
+    Args:
+        len_a (int): The number of coefficients of the dividend.
+        len_b (int): The number of coefficients of the divisor.
+    """
+    a, b = random_polynomial(len_a), random_polynomial(len_b - 1) + [random.randrange(1, PRIME)]
+    quotient, remainder = poly_divmod(a, b)
+    assert len(remainder) <= len_b - 1
+    rebuilt = poly_mul(b, quotient) if quotient else []
+    rebuilt += [0] * (len_a - len(rebuilt))
+    for i, c in enumerate(remainder):
+        rebuilt[i] = (rebuilt[i] + c) % PRIME
+    assert rebuilt[:len_a] == a
+    assert not any(rebuilt[len_a:])
+
+def test_product_tree_root():
+    """
+    Test that the root of the subproduct tree vanishes at every point.
+    """
+    x_values = random.sample(range(1, 10**10), 37)
+    root = product_tree(x_values)[-1][0]
+    assert len(root) == 38
+    for x in x_values:
+        assert _evaluate_polynomial(root, x) == 0
+
+@pytest.mark.parametrize("n, t", [(1, 1), (10, 3), (33, 33), (100, 64), (300, 5), (257, 200)])
+def test_multipoint_evaluate(n, t, small_thresholds):
+    """
+    Test that multipoint_evaluate matches Horner's scheme at every point.
+
+    Args:
+        n (int): The number of points.
+        t (int): The number of coefficients of the polynomial.
+    """
+    x_values = random.sample(range(1, 10**10), n)
+    coefficients = random_polynomial(t)
+    assert multipoint_evaluate(coefficients, x_values) == [_evaluate_polynomial(coefficients, x) for x in x_values]
+
+@pytest.mark.parametrize("n, t", [(40, 40), (200, 60)])
+def test_generate_shares_fast_engine(n, t, monkeypatch):
+    """
+    Test that shares generated with the subproduct tree engine reconstruct the secret.
+
+    Args:
+        n (int): The number of shares.
+        t (int): The minimum number of shares required.
+    """
+    monkeypatch.setattr(shamir_scheme, "FAST_EVALUATION_THRESHOLD", 2)
+    monkeypatch.setattr(shamir_scheme, "GMPY2_FAST_EVALUATION_THRESHOLD", 2)
+    evaluations = get_evaluations(generate_shares(12345, n, t))
+    assert len(evaluations) == n
+    assert reconstruct_from_evaluations(evaluations[:t]) == 12345
+    assert reconstruct_from_evaluations(evaluations[-t:]) == 12345
+
+@pytest.mark.parametrize("k", [1, 2, 7, 64, 301])
+def test_lagrange_weights_at_zero(k, small_thresholds):
+    """
+    Test that the product tree weights match the O(k²) Lagrange weights.
+
+    Args:
+        k (int): The number of evaluations.
+    """
+    x_values = random.sample(range(1, 10**10), k)
+    assert lagrange_weights_at_zero(x_values) == _lagrange_weights_at_zero(x_values)
+
+@pytest.mark.parametrize("x_values", [[3, 5, 3], [1, PRIME + 1], [0, 4, 9]])
+def test_lagrange_weights_at_zero_invalid(x_values):
+    """
+    Test that lagrange_weights_at_zero raises ValueError for repeated or zero x values.
+
+    Args:
+        x_values (list): The x coordinates.
+    """
+    with pytest.raises(ValueError):
+        lagrange_weights_at_zero(x_values)
+
+@pytest.mark.parametrize("n", [1, 2, 9, 70])
+def test_interpolate(n, small_thresholds):
+    """
+    Test that interpolate recovers a polynomial of degree n - 1 from n of its values.
+
+    Args:
+        n (int): The number of points.
+    """
+    coefficients = random_polynomial(n)
+    x_values = random.sample(range(0, 10**10), n)
+    assert interpolate(x_values, multipoint_evaluate(coefficients, x_values)) == coefficients
+    with pytest.raises(ValueError):
+        interpolate(x_values + x_values[:1], [0] * (n + 1))
+
+@pytest.mark.parametrize("n, k, errors", [(3, 3, 0), (5, 3, 1), (10, 4, 3), (11, 4, 3), (60, 20, 20), (101, 50, 25)])
+def test_gao_decode(n, k, errors, small_thresholds):
+    """
+    Test that gao_decode finds the polynomial and the wrong points when at most (n - k) // 2 are wrong.
+
+    Args:
+        n (int): The number of points.
+        k (int): The number of coefficients.
+        errors (int): The number of wrong points.
+    """
+    coefficients = random_polynomial(k)
+    x_values = random.sample(range(1, 10**10), n)
+    y_values = multipoint_evaluate(coefficients, x_values)
+    wrong = sorted(random.sample(range(n), errors))
+    for i in wrong:
+        y_values[i] = (y_values[i] + random.randrange(1, PRIME)) % PRIME
+    assert gao_decode(x_values, y_values, k) == (coefficients, wrong)
+
+@pytest.mark.parametrize("n, k", [(6, 3), (10, 4), (40, 10)])
+def test_gao_decode_too_many_errors(n, k):
+    """
+    Test that gao_decode raises ValueError instead of returning a wrong polynomial when too many points are wrong.
+
+    Args:
+        n (int): The number of points.
+        k (int): The number of coefficients.
+    """
+    coefficients = random_polynomial(k)
+    x_values = random.sample(range(1, 10**10), n)
+    y_values = multipoint_evaluate(coefficients, x_values)
+    for i in range((n - k) // 2 + 1):
+        y_values[i] = random.randrange(PRIME)
+    with pytest.raises(ValueError):
+        gao_decode(x_values, y_values, k)
+    with pytest.raises(ValueError):
+        gao_decode(x_values, y_values, n + 1)
+
+@pytest.mark.parametrize("engine", ["naive", "fast", "auto"])
+@pytest.mark.parametrize("n, t", [(5, 3), (80, 80), (120, 90)])
+def test_reconstruct_engines(engine, n, t):
+    """
+    Test that every reconstruction engine recovers the secret.
+
+    Args:
+        engine (str): The reconstruction engine.
+        n (int): The number of shares.
+        t (int): The minimum number of shares required.
+    """
+    secret = random.randrange(2**256)
+    evaluations = get_evaluations(generate_shares(secret, n, t))
+    assert reconstruct_from_evaluations(evaluations, engine, WeightCache(0)) == secret
+    assert reconstruct_from_evaluations(evaluations[:t], engine, WeightCache(0)) == secret
+
+def test_reconstruct_fast_engine_with_zero_x():
+    """
+    Test that the fast engine returns the value at x = 0 when it is one of the evaluations.
+    """
+    assert reconstruct_from_evaluations([(4, 10), (0, 77), (9, 3)], "fast", WeightCache(0)) == 77
+
+def test_reconstruct_invalid_engine():
+    """
+    Test that reconstruct_from_evaluations raises ValueError for an unknown engine.
+    """
+    with pytest.raises(ValueError):
+        reconstruct_from_evaluations([(1, 2), (2, 3)], "symbolic")
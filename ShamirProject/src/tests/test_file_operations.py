@@ -0,0 +1,99 @@
+import pytest
+import os
+import subprocess
+import sys
+sys.path.append(os.path.abspath("./src/main"))
+from cipher import encrypt_bytes, get_key
+from file_operations import decrypt_document, encrypt_document, load_key, validate_file_exists
+from io_manager import write_file_chunks
+from shamir_scheme import encode_evaluations, generate_evaluations
+
+KEY = get_key("file operations password")
+
+@pytest.fixture
+def eval_path(tmp_path):
+    """
+    Writes the evaluations of KEY to a share file that records the threshold.
+
+    Returns:
+        str: The path of the share file.
+    """
+    path = str(tmp_path / "shares.frg")
+    write_file_chunks(path, encode_evaluations(generate_evaluations(int.from_bytes(KEY, 'big'), 5, 3), "text", 3))
+    return path
+
+def test_load_key(eval_path):
+    """
+    Test that the key is reconstructed from a share file, robustly or not.
+    """
+    assert load_key(eval_path) == (int.from_bytes(KEY, 'big'), [])
+    assert load_key([eval_path], robust=True) == (int.from_bytes(KEY, 'big'), [])
+
+@pytest.mark.parametrize("envelope", [False, True])
+def test_document_round_trip(envelope, tmp_path):
+    """
+    Test that a document encrypted with encrypt_document is recovered by decrypt_document.
+
+    Args:
+        envelope (bool): Encrypt with a wrapped data key.
+    """
+    data = os.urandom(70000)
+    (tmp_path / "document.txt").write_bytes(data)
+    encrypted_path = encrypt_document(str(tmp_path / "document.txt"), KEY, 2, envelope=envelope)
+    assert encrypted_path == str(tmp_path / "document.aes")
+    assert open(decrypt_document(encrypted_path, KEY, 2), 'rb').read() == data
+
+def test_decrypt_original_format(tmp_path):
+    """
+    Test that documents in the original AES-CBC format are decrypted and a wrong key raises ValueError.
+    """
+    data = os.urandom(5000)
+    encrypted_path = str(tmp_path / "legacy.aes")
+    write_file_chunks(encrypted_path, [bytes(encrypt_bytes(data, KEY))])
+    assert open(decrypt_document(encrypted_path, KEY, 1), 'rb').read() == data
+    with pytest.raises(ValueError):
+        decrypt_document(encrypted_path, get_key("wrong password"), 1)
+
+def test_decrypt_original_format_is_atomic(tmp_path):
+    """
+    Test that a write failing partway through the decryption of the original format leaves the previous output untouched.
+    """
+    import resource
+    import signal
+    data = os.urandom(50000)
+    encrypted_path = str(tmp_path / "legacy.aes")
+    write_file_chunks(encrypted_path, [bytes(encrypt_bytes(data, KEY))])
+    output = tmp_path / "legacy_revealed.txt"
+    output.write_bytes(b"previous output")
+    limits = resource.getrlimit(resource.RLIMIT_FSIZE)
+    handler = signal.signal(signal.SIGXFSZ, signal.SIG_IGN)
+    resource.setrlimit(resource.RLIMIT_FSIZE, (10000, limits[1]))
+    try:
+        with pytest.raises(OSError):
+            decrypt_document(encrypted_path, KEY, 1)
+    finally:
+        resource.setrlimit(resource.RLIMIT_FSIZE, limits)
+        signal.signal(signal.SIGXFSZ, handler)
+    assert output.read_bytes() == b"previous output"
+    assert sorted(os.listdir(tmp_path)) == ["legacy.aes", "legacy_revealed.txt"]
+    assert open(decrypt_document(encrypted_path, KEY, 1), 'rb').read() == data
+
+def test_validate_file_exists():
+    """
+    Test that files without one of the expected extensions raise ValueError.
+    """
+    validate_file_exists("document.aes", [".aes"])
+    with pytest.raises(ValueError):
+        validate_file_exists("document.txt", [".aes"])
+
+def test_library_does_not_import_main():
+    """
+    Test that the key agent and the file operations do not depend on the command line script.
+    """
+    result = subprocess.run(
+        [sys.executable, "-c", "import sys; import key_agent, file_operations; print('main' in sys.modules)"],
+        capture_output=True,
+        text=True,
+        cwd=os.path.abspath("./src/main")
+    )
+    assert result.stdout.strip() == "False"
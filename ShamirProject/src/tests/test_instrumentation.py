@@ -0,0 +1,85 @@
+import pytest
+import os
+import sys
+import threading
+import time
+sys.path.append(os.path.abspath("./src/main"))
+import instrumentation
+from instrumentation import recording, span, timed_chunks
+
+def slow_chunks(count, delay):
+    """
+    Produces chunks slowly, like a file read.
+
+    Args:
+        count (int): The number of chunks.
+        delay (float): The seconds spent producing every chunk.
+
+    Yields:
+        bytes: Chunks of 10 bytes.
+    """
+    for _ in range(count):
+        time.sleep(delay)
+        yield bytes(10)
+
+def test_spans_record_own_time():
+    """
+    Test that a span does not count the time of the spans nested in it.
+    """
+    with recording() as recorder:
+        with span("outer"):
+            time.sleep(0.02)
+            with span("inner", 100):
+                time.sleep(0.05)
+    stages = recorder.report()["stages"]
+    assert 0.02 <= stages["outer"]["seconds"] < 0.05
+    assert stages["inner"]["seconds"] >= 0.05
+    assert stages["inner"]["bytes"] == 100
+    assert stages["inner"]["mb_per_s"] > 0
+    assert "mb_per_s" not in stages["outer"]
+
+def test_timed_chunks_separates_pipeline_stages():
+    """
+    Test that the stages of a pipeline of generators are measured separately.
+    """
+    with recording() as recorder:
+        chunks = timed_chunks("read", slow_chunks(3, 0.01))
+        for chunk in timed_chunks("transform", (bytes(chunk) for chunk in chunks)):
+            with span("write", len(chunk)):
+                time.sleep(0.01)
+    report = recorder.report()
+    stages = report["stages"]
+    assert [stages[name]["bytes"] for name in ("read", "transform", "write")] == [30, 30, 30]
+    assert stages["read"]["seconds"] >= 0.03
+    assert stages["transform"]["seconds"] < 0.01
+    assert report["wall_seconds"] >= 0.06
+    assert report["peak_rss_bytes"] is None or report["peak_rss_bytes"] > 0
+
+def test_spans_of_worker_threads():
+    """
+    Test that spans opened in other threads are added to the same stages.
+    """
+    def work():
+        with span("encrypt", 5):
+            time.sleep(0.01)
+
+    with recording() as recorder:
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    stage = recorder.report()["stages"]["encrypt"]
+    assert (stage["calls"], stage["bytes"]) == (4, 20)
+
+def test_spans_without_recorder():
+    """
+    Test that spans and timed chunks do nothing outside recording.
+    """
+    with span("read") as current:
+        current.size = 10
+    assert list(timed_chunks("read", [b"a", b"b"])) == [b"a", b"b"]
+    assert instrumentation._recorder is None
+    with recording():
+        pass
+    assert instrumentation._recorder is None
@@ -1,12 +1,21 @@
 import pytest
 import os
 import sys
+import threading
 sys.path.append(os.path.abspath("./src/main"))
 from io_manager import (
     read_bytes_file,
     write_bytes_file,
     read_text_file,
-    write_text_file
+    write_text_file,
+    expand_paths,
+    map_file,
+    pipelined,
+    read_file_chunks,
+    discard_staged,
+    replace_staged,
+    stage_files,
+    write_file_chunks
 )
 
 def test_read_bytes_file_not_found():
@@ -71,4 +80,192 @@ def test_write_text_file_permission_error():
     when the directory exists but is not writable.
     """
     with pytest.raises(PermissionError):
-        write_text_file("src/tests/resources/directory_without_permission/file.txt", "data")
\ No newline at end of file
+        write_text_file("src/tests/resources/directory_without_permission/file.txt", "data")
+
+def test_read_file_chunks_not_found():
+    """
+    Test that read_file_chunks raises FileNotFoundError
+    when the file does not exist.
+    """
+    with pytest.raises(FileNotFoundError):
+        list(read_file_chunks("src/tests/resources/non_existent_file.bin", 16))
+
+def test_write_file_chunks_directory_not_found():
+    """
+    Test that write_file_chunks raises FileNotFoundError
+    when the directory does not exist.
+    """
+    with pytest.raises(FileNotFoundError):
+        write_file_chunks("src/tests/resources/non_existent_directory/file.bin", [b"data"])
+
+@pytest.mark.parametrize("chunk_size", [1, 5, 64, 10000])
+def test_file_chunks_round_trip(chunk_size, tmp_path):
+    """
+    Test that read_file_chunks yields chunks of the requested size
+    and write_file_chunks writes them back unchanged.
+
+    Args:
+        chunk_size (int): The size of the chunks.
+    """
+    data = bytes(range(256)) * 7
+    path = tmp_path / "file.bin"
+    assert write_file_chunks(str(path), [data[:100], data[100:]]) == len(data)
+    chunks = list(read_file_chunks(str(path), chunk_size))
+    assert all(len(chunk) == chunk_size for chunk in chunks[:-1])
+    assert b"".join(chunks) == data
+
+def test_map_file_not_found():
+    """
+    Test that map_file raises FileNotFoundError
+    when the file does not exist.
+    """
+    with pytest.raises(FileNotFoundError):
+        with map_file("src/tests/resources/non_existent_file.bin"):
+            pass
+
+@pytest.mark.parametrize("data", [b"", b"a", bytes(range(256)) * 100])
+def test_map_file(data, tmp_path):
+    """
+    Test that map_file exposes the content of the file as a memoryview.
+
+    Args:
+        data (bytes): The content of the file.
+    """
+    path = tmp_path / "file.bin"
+    path.write_bytes(data)
+    with map_file(str(path)) as view:
+        assert isinstance(view, memoryview)
+        assert view == data
+
+def test_expand_paths(tmp_path):
+    """
+    Test that expand_paths expands directories and glob patterns
+    and keeps plain paths, without repetitions.
+    """
+    for name in ["b.txt", "a.txt", "c.aes", "ab.txt"]:
+        (tmp_path / name).write_text("data")
+    directory = str(tmp_path)
+    expected = [os.path.join(directory, name) for name in ["a.txt", "ab.txt", "b.txt"]]
+    assert expand_paths([directory], ".txt") == expected
+    assert expand_paths([os.path.join(directory, "a*")], ".txt") == expected[:2]
+    assert expand_paths([expected[2], directory], ".txt") == [expected[2]] + expected[:2]
+    assert expand_paths(["missing.txt"], ".txt") == ["missing.txt"]
+
+def test_expand_paths_no_match(tmp_path):
+    """
+    Test that expand_paths raises FileNotFoundError
+    when a directory or a pattern matches no file.
+    """
+    with pytest.raises(FileNotFoundError):
+        expand_paths([str(tmp_path)], ".txt")
+    with pytest.raises(FileNotFoundError):
+        expand_paths([os.path.join(str(tmp_path), "*.txt")], ".txt")
+
+def failing_chunks(count):
+    """
+    Produces some chunks and then fails, like a segment that does not authenticate.
+
+    Args:
+        count (int): The number of chunks produced before the error.
+
+    Yields:
+        bytes: Chunks of 10 bytes.
+    """
+    for i in range(count):
+        yield bytes([i]) * 10
+    raise ValueError("The segment cannot be authenticated.")
+
+def test_write_file_chunks_is_atomic(tmp_path):
+    """
+    Test that a failed write leaves the previous file and its mode untouched and no temporary file behind.
+    """
+    path = tmp_path / "file.bin"
+    path.write_bytes(b"previous content")
+    os.chmod(path, 0o600)
+    with pytest.raises(ValueError):
+        write_file_chunks(str(path), failing_chunks(3))
+    assert path.read_bytes() == b"previous content"
+    assert os.listdir(tmp_path) == ["file.bin"]
+    assert write_file_chunks(str(path), [b"new ", b"content"]) == 11
+    assert path.read_bytes() == b"new content"
+    assert os.stat(path).st_mode & 0o777 == 0o600
+
+def test_write_file_chunks_new_file(tmp_path, monkeypatch):
+    """
+    Test that a new file gets the permissions given by the umask and is synced before it is renamed.
+    """
+    events = []
+    fsync, replace = os.fsync, os.replace
+    monkeypatch.setattr(os, "fsync", lambda descriptor: events.append("fsync") or fsync(descriptor))
+    monkeypatch.setattr(os, "replace", lambda source, target: events.append("replace") or replace(source, target))
+    previous_umask = os.umask(0o027)
+    try:
+        path = tmp_path / "new.bin"
+        assert write_file_chunks(str(path), [b"content"]) == 7
+    finally:
+        os.umask(previous_umask)
+    assert path.read_bytes() == b"content"
+    assert os.stat(path).st_mode & 0o777 == 0o640
+    assert events[:2] == ["fsync", "replace"]
+
+def test_stage_files(tmp_path):
+    """
+    Test that staged files replace their targets together, and that a failure while staging or a discard replaces none.
+    """
+    paths = [tmp_path / f"share_{i}.frg" for i in range(3)]
+    for path in paths:
+        path.write_bytes(b"old")
+    with pytest.raises(ValueError):
+        stage_files([(str(paths[0]), [b"new"]), (str(paths[1]), failing_chunks(2)), (str(paths[2]), [b"new"])])
+    discard_staged(stage_files((str(path), [b"new"]) for path in paths))
+    assert [path.read_bytes() for path in paths] == [b"old"] * 3
+    assert len(os.listdir(tmp_path)) == 3
+    replace_staged(stage_files((str(path), [b"new ", bytes([i])]) for i, path in enumerate(paths)))
+    assert [path.read_bytes() for path in paths] == [b"new " + bytes([i]) for i in range(3)]
+    assert len(os.listdir(tmp_path)) == 3
+
+@pytest.mark.parametrize("cpus", [1, 4])
+def test_pipelined(cpus, monkeypatch):
+    """
+    Test that pipelined stages keep the order of the chunks and raise the errors of their producers.
+
+    Args:
+        cpus (int): The number of CPUs reported, a single one passes the chunks through.
+    """
+    monkeypatch.setattr(os, "cpu_count", lambda: cpus)
+    chunks = [os.urandom(i) for i in range(100)]
+    assert list(pipelined(pipelined(chunks), 1)) == chunks
+    with pytest.raises(ValueError):
+        list(pipelined(pipelined(failing_chunks(5))))
+
+def test_pipelined_stops_producer(monkeypatch):
+    """
+    Test that a consumer that stops early stops the producer thread and closes its generator.
+    """
+    monkeypatch.setattr(os, "cpu_count", lambda: 4)
+    closed = threading.Event()
+
+    def endless():
+        try:
+            while True:
+                yield b"chunk"
+        finally:
+            closed.set()
+
+    threads = threading.active_count()
+    stage = pipelined(endless())
+    assert next(stage) == b"chunk"
+    stage.close()
+    assert closed.is_set()
+    assert threading.active_count() == threads
+
+def test_pipelined_file_round_trip(tmp_path, monkeypatch):
+    """
+    Test that a file is copied unchanged through pipelined read and write stages.
+    """
+    monkeypatch.setattr(os, "cpu_count", lambda: 4)
+    data = os.urandom(300000)
+    source, target = tmp_path / "source.bin", tmp_path / "target.bin"
+    source.write_bytes(data)
+    assert write_file_chunks(str(target), pipelined(read_file_chunks(str(source), 4096))) == len(data)
+    assert target.read_bytes() == data
@@ -0,0 +1,196 @@
+import pytest
+import os
+import sys
+import threading
+import socket
+import time
+sys.path.append(os.path.abspath("./src/main"))
+import main
+from key_agent import KeyAgent, send_requests
+
+@pytest.fixture
+def agent_files(tmp_path, monkeypatch):
+    """
+    Encrypts a few documents and removes the clear ones.
+
+    Returns:
+        tuple: The evaluations file, the documents and the directory of the files.
+    """
+    monkeypatch.setattr(main.getpass, "getpass", lambda prompt: "agent password")
+    documents = {f"document_{i}": os.urandom(100 * i + 1) for i in range(6)}
+    for name, data in documents.items():
+        (tmp_path / f"{name}.txt").write_bytes(data)
+    eval_path = str(tmp_path / "shares.frg")
+    main.encrypt_files(eval_path, 5, 3, main.expand_paths([str(tmp_path)], ".txt"))
+    for name in documents:
+        os.remove(tmp_path / f"{name}.txt")
+    return eval_path, documents, tmp_path
+
+def start_agent(agent, socket_path):
+    """
+    Runs an agent in a background thread and waits until it listens.
+
+    Args:
+        agent (KeyAgent): The agent.
+        socket_path (str): The path of its Unix socket.
+
+    Returns:
+        threading.Thread: The thread running the agent.
+    """
+    listening = threading.Event()
+    thread = threading.Thread(target=agent.run, args=(socket_path, listening.set))
+    thread.start()
+    assert listening.wait(5)
+    return thread
+
+def stop_agent(thread, socket_path):
+    """
+    Sends a shutdown request and waits for the agent to exit.
+
+    Args:
+        thread (threading.Thread): The thread running the agent.
+        socket_path (str): The path of its Unix socket.
+    """
+    assert send_requests(socket_path, [{"command": "shutdown"}]) == [{"ok": True}]
+    thread.join(10)
+    assert not thread.is_alive()
+    assert not os.path.exists(socket_path)
+
+@pytest.mark.parametrize("workers", [1, 4])
+def test_agent_round_trip(agent_files, workers):
+    """
+    Test that the agent decrypts and encrypts many documents with a single reconstruction of the key.
+
+    Args:
+        workers (int): The threads of the agent.
+    """
+    eval_path, documents, directory = agent_files
+    socket_path = str(directory / "agent.sock")
+    agent = KeyAgent([eval_path], workers=workers)
+    thread = start_agent(agent, socket_path)
+    try:
+        assert os.stat(socket_path).st_mode & 0o077 == 0
+        requests = [{"command": "decrypt", "path": str(directory / f"{name}.aes")} for name in documents]
+        responses = send_requests(socket_path, requests * 3)
+        assert [response["output"] for response in responses] == [str(directory / f"{name}_revealed.txt") for name in documents] * 3
+        for name, data in documents.items():
+            assert (directory / f"{name}_revealed.txt").read_bytes() == data
+        (directory / "new.txt").write_bytes(b"new document")
+        assert send_requests(socket_path, [{"command": "encrypt", "path": str(directory / "new.txt")}])[0]["ok"]
+        os.remove(directory / "new.txt")
+        main.decrypt_files(eval_path, [str(directory / "new.aes")])
+        assert (directory / "new_revealed.txt").read_bytes() == b"new document"
+        assert agent.reconstructions == 1
+    finally:
+        stop_agent(thread, socket_path)
+
+def test_agent_key_expires(agent_files):
+    """
+    Test that the key is dropped after its time to live and reconstructed on the next request.
+    """
+    eval_path, documents, directory = agent_files
+    socket_path = str(directory / "agent.sock")
+    agent = KeyAgent([eval_path], ttl=0.2)
+    thread = start_agent(agent, socket_path)
+    try:
+        request = {"command": "decrypt", "path": str(directory / "document_1.aes")}
+        assert send_requests(socket_path, [request])[0]["ok"]
+        time.sleep(0.5)
+        assert agent._key is None
+        assert send_requests(socket_path, [request])[0]["ok"]
+        assert agent.reconstructions == 2
+    finally:
+        stop_agent(thread, socket_path)
+
+def test_agent_invalid_requests(agent_files):
+    """
+    Test that invalid requests are answered with an error without stopping the agent.
+    """
+    eval_path, _, directory = agent_files
+    socket_path = str(directory / "agent.sock")
+    thread = start_agent(KeyAgent([eval_path]), socket_path)
+    try:
+        responses = send_requests(socket_path, [
+            {"command": "ping"},
+            {"command": "format"},
+            {"command": "decrypt"},
+            {"command": "decrypt", "path": str(directory / "document_1.txt")},
+            {"command": "decrypt", "path": str(directory / "missing.aes")},
+            ["decrypt"]
+        ])
+        assert responses[0] == {"ok": True}
+        assert all(not response["ok"] and response["error"] for response in responses[1:])
+    finally:
+        stop_agent(thread, socket_path)
+
+def test_agent_survives_unexpected_errors(agent_files):
+    """
+    Test that a request failing with an unexpected OSError, or longer than the stream limit, is answered
+    and does not stall the connection or the agent.
+    """
+    eval_path, _, directory = agent_files
+    socket_path = str(directory / "agent.sock")
+    (directory / "folder.aes").mkdir()
+    thread = start_agent(KeyAgent([eval_path]), socket_path)
+    try:
+        requests = [{"command": "decrypt", "path": str(directory / "folder.aes")}] * 4 + [{"command": "ping"}]
+        responses = send_requests(socket_path, requests)
+        assert all(not response["ok"] and "File error" in response["error"] for response in responses[:-1])
+        assert responses[-1] == {"ok": True}
+        long_request = {"command": "decrypt", "path": "a" * 100000 + ".aes"}
+        response, = send_requests(socket_path, [long_request])
+        assert not response["ok"] and "longer than the stream limit" in response["error"]
+        assert send_requests(socket_path, [{"command": "ping"}]) == [{"ok": True}]
+    finally:
+        stop_agent(thread, socket_path)
+
+def test_send_requests_without_agent(tmp_path):
+    """
+    Test that sending requests without a running agent raises an error.
+    """
+    with pytest.raises(FileNotFoundError):
+        send_requests(str(tmp_path / "agent.sock"), [{"command": "ping"}])
+
+def test_agent_refuses_regular_file(agent_files):
+    """
+    Test that an agent does not start on, nor remove, a path that is not a socket.
+    """
+    eval_path, _, directory = agent_files
+    notes = directory / "notes.txt"
+    notes.write_bytes(b"not a socket")
+    with pytest.raises(FileExistsError):
+        KeyAgent([eval_path]).run(str(notes))
+    assert notes.read_bytes() == b"not a socket"
+
+def test_agent_refuses_live_socket(agent_files):
+    """
+    Test that a second agent does not take over the socket of a running one, nor remove it.
+    """
+    eval_path, _, directory = agent_files
+    socket_path = str(directory / "agent.sock")
+    thread = start_agent(KeyAgent([eval_path]), socket_path)
+    try:
+        with pytest.raises(OSError):
+            KeyAgent([eval_path]).run(socket_path)
+        assert send_requests(socket_path, [{"command": "ping"}]) == [{"ok": True}]
+    finally:
+        stop_agent(thread, socket_path)
+
+def test_agent_replaces_stale_socket(agent_files):
+    """
+    Test that a socket nobody listens on is replaced, and that a path replaced while the agent runs is kept on exit.
+    """
+    eval_path, _, directory = agent_files
+    socket_path, moved_path = str(directory / "agent.sock"), str(directory / "moved.sock")
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as stale:
+        stale.bind(socket_path)
+    thread = start_agent(KeyAgent([eval_path]), socket_path)
+    try:
+        assert send_requests(socket_path, [{"command": "ping"}]) == [{"ok": True}]
+        os.rename(socket_path, moved_path)
+        (directory / "agent.sock").write_bytes(b"someone else's file")
+    finally:
+        assert send_requests(moved_path, [{"command": "shutdown"}]) == [{"ok": True}]
+        thread.join(10)
+    assert not thread.is_alive()
+    assert (directory / "agent.sock").read_bytes() == b"someone else's file"
@@ -0,0 +1,376 @@
+import pytest
+import os
+import subprocess
+import sys
+sys.path.append(os.path.abspath("./src/main"))
+import main
+
+MAIN_PATH = os.path.abspath("./src/main/main.py")
+
+STARTUP_IMPORT_BUDGET_US = 150_000
+
+HEAVY_MODULES = ["sympy", "cryptography", "shamir_scheme", "cipher"]
+
+def get_import_times(arguments):
+    """
+    Runs main.py with `python -X importtime` and collects the import report.
+
+    Args:
+        arguments (list of str): The command line arguments given to main.py.
+
+    Returns:
+        list: A (module, cumulative time in microseconds, is top level) tuple for every imported module.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", MAIN_PATH] + arguments,
+        capture_output=True,
+        text=True,
+        stdin=subprocess.DEVNULL
+    )
+    import_times = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        import_times.append((name.strip(), int(cumulative), not name.startswith("  ")))
+    return import_times
+
+@pytest.mark.parametrize("arguments", [
+    ["-h"],
+    ["c", "-h"],
+    ["d", "-h"],
+    ["c", "shares.txt", "5", "3", "input.txt"],
+    ["c", "shares.frg", "1", "3", "input.txt"],
+    ["d", "shares.frg", "document.txt"]
+])
+def test_startup_does_not_import_heavy_modules(arguments):
+    """
+    Test that help and argument validation failures never load sympy, cryptography
+    or the modules that depend on them.
+
+    Args:
+        arguments (list of str): The command line arguments given to main.py.
+    """
+    import_times = get_import_times(arguments)
+    assert import_times
+    for module, _, _ in import_times:
+        assert module.split(".")[0] not in HEAVY_MODULES
+
+def test_startup_import_budget():
+    """
+    Test that the total import time of the command line startup stays within the budget.
+    """
+    import_times = get_import_times(["-h"])
+    total = sum(cumulative for _, cumulative, top_level in import_times if top_level)
+    assert total < STARTUP_IMPORT_BUDGET_US
+
+@pytest.mark.parametrize("processes", [1, 3])
+def test_batch_round_trip(processes, tmp_path, monkeypatch, capsys):
+    """
+    Test that several files are encrypted with one set of shares and decrypted with one reconstruction.
+
+    Args:
+        processes (int): The number of processes used for the files.
+    """
+    monkeypatch.setattr(main.getpass, "getpass", lambda prompt: "batch password")
+    documents = {f"document_{i}.txt": os.urandom(i * 700) for i in range(5)}
+    for name, data in documents.items():
+        (tmp_path / name).write_bytes(data)
+    eval_path = str(tmp_path / "shares.frg")
+    main.encrypt_files(eval_path, 5, 3, main.expand_paths([str(tmp_path)], ".txt"), 2, processes)
+    encrypted_paths = main.expand_paths([str(tmp_path / "*.aes")], ".aes")
+    assert len(encrypted_paths) == len(documents)
+    main.decrypt_files(eval_path, encrypted_paths, 2, processes)
+    for name, data in documents.items():
+        assert (tmp_path / name.replace(".txt", "_revealed.txt")).read_bytes() == data
+    output = capsys.readouterr().out
+    assert "Timings:" in output
+    assert "0 failed" in output
+
+@pytest.mark.parametrize("share_format", ["text", "binary"])
+def test_share_format_round_trip(share_format, tmp_path, monkeypatch):
+    """
+    Test that files are decrypted from evaluations saved in either share format.
+
+    Args:
+        share_format (str): The format of the evaluations file.
+    """
+    monkeypatch.setattr(main.getpass, "getpass", lambda prompt: "format password")
+    document = tmp_path / "document.txt"
+    document.write_bytes(b"shared document")
+    eval_path = str(tmp_path / "shares.frg")
+    main.encrypt_files(eval_path, 5, 3, [str(document)], 1, 1, share_format)
+    assert (open(eval_path, "rb").read(4) == b"SHMF") == (share_format == "binary")
+    main.decrypt_files(eval_path, [str(tmp_path / "document.aes")])
+    assert (tmp_path / "document_revealed.txt").read_bytes() == b"shared document"
+
+def test_decrypt_from_holder_files(tmp_path, monkeypatch):
+    """
+    Test that per-holder evaluation files are written and that a directory with t of them decrypts.
+    """
+    monkeypatch.setattr(main.getpass, "getpass", lambda prompt: "holder password")
+    document = tmp_path / "document.txt"
+    document.write_bytes(b"holder document")
+    shares_dir = tmp_path / "shares"
+    shares_dir.mkdir()
+    eval_path = str(shares_dir / "shares.frg")
+    main.encrypt_files(eval_path, 5, 3, [str(document)], share_format="binary", per_holder=True)
+    share_paths = main.holder_paths(eval_path, 5)
+    for share_path in share_paths[:2]:
+        os.remove(share_path)
+    main.decrypt_files(main.expand_paths([str(shares_dir)], ".frg"), [str(tmp_path / "document.aes")])
+    assert (tmp_path / "document_revealed.txt").read_bytes() == b"holder document"
+
+def test_timings_and_profile(tmp_path, monkeypatch, capsys):
+    """
+    Test that an instrumented run prints the JSON breakdown of its stages and writes a profile.
+    """
+    import json
+    monkeypatch.setattr(main.getpass, "getpass", lambda prompt: "timings password")
+    document = tmp_path / "document.txt"
+    document.write_bytes(os.urandom(3 * 1024 * 1024))
+    eval_path = str(tmp_path / "shares.frg")
+    profile_path = str(tmp_path / "encrypt.prof")
+    with main.instrumented(True, profile_path):
+        main.encrypt_files(eval_path, 5, 3, [str(document)])
+    output = capsys.readouterr().out
+    report = json.loads(output[output.index("{"):])
+    assert {"key derivation", "share generation", "share formatting", "read", "encrypt", "write"} <= set(report["stages"])
+    assert report["stages"]["read"]["bytes"] == 3 * 1024 * 1024
+    assert report["wall_seconds"] > 0
+    assert os.path.getsize(profile_path) > 0
+    with main.instrumented(True):
+        main.decrypt_files(eval_path, [str(tmp_path / "document.aes")])
+    output = capsys.readouterr().out
+    report = json.loads(output[output.index("{"):])
+    assert {"share parsing", "reconstruction", "read", "decrypt", "write"} <= set(report["stages"])
+    assert report["stages"]["write"]["bytes"] == 3 * 1024 * 1024
+
+@pytest.mark.parametrize("processes", [1, 2])
+def test_compressed_batch_round_trip(processes, tmp_path, monkeypatch):
+    """
+    Test that compressed documents are smaller on disk and decrypt to the original content.
+
+    Args:
+        processes (int): The processes used for the batch.
+    """
+    monkeypatch.setattr(main.getpass, "getpass", lambda prompt: "compression password")
+    documents = {"text": b"a compressible line of text\n" * 20000, "random": os.urandom(100000)}
+    for name, data in documents.items():
+        (tmp_path / f"{name}.txt").write_bytes(data)
+    eval_path = str(tmp_path / "shares.frg")
+    main.encrypt_files(eval_path, 5, 3, [str(tmp_path / f"{name}.txt") for name in documents], 1, processes,
+                       compression="lzma")
+    assert os.path.getsize(tmp_path / "text.aes") < len(documents["text"]) // 10
+    for name in documents:
+        os.remove(tmp_path / f"{name}.txt")
+    main.decrypt_files(eval_path, [str(tmp_path / f"{name}.aes") for name in documents], 1, processes)
+    for name, data in documents.items():
+        assert (tmp_path / f"{name}_revealed.txt").read_bytes() == data
+
+def test_robust_decryption(tmp_path, monkeypatch, capsys):
+    """
+    Test that a corrupted evaluation makes decryption fail, and that robust decryption reports it and succeeds.
+    """
+    monkeypatch.setattr(main.getpass, "getpass", lambda prompt: "robust password")
+    document = tmp_path / "document.txt"
+    document.write_bytes(b"robust document")
+    eval_path = tmp_path / "shares.frg"
+    main.encrypt_files(str(eval_path), 6, 3, [str(document)])
+    lines = eval_path.read_text().splitlines()
+    x, y = lines[2].split(", ")
+    lines[2] = f"{x}, {int(y) + 1}"
+    eval_path.write_text("\n".join(lines))
+    os.remove(document)
+    capsys.readouterr()
+    main.decrypt_files(str(eval_path), [str(tmp_path / "document.aes")])
+    assert "failed authentication" in capsys.readouterr().out
+    main.decrypt_files(str(eval_path), [str(tmp_path / "document.aes")], robust=True)
+    assert f"Corrupted evaluations ignored: x = {x}" in capsys.readouterr().out
+    assert (tmp_path / "document_revealed.txt").read_bytes() == b"robust document"
+
+@pytest.mark.parametrize("share_format", ["text", "binary"])
+def test_extend_and_refresh_shares(share_format, tmp_path, monkeypatch, capsys):
+    """
+    Test that new and refreshed evaluations decrypt the document, which is never rewritten.
+
+    Args:
+        share_format (str): The format of the evaluations files.
+    """
+    monkeypatch.setattr(main.getpass, "getpass", lambda prompt: "extend password")
+    document = tmp_path / "document.txt"
+    document.write_bytes(b"extended document")
+    eval_path = str(tmp_path / "shares.frg")
+    main.encrypt_files(eval_path, 4, 3, [str(document)], share_format=share_format)
+    os.remove(document)
+    encrypted = (tmp_path / "document.aes").read_bytes()
+    main.extend_shares([eval_path], 2)
+    new_path = str(tmp_path / "new.frg")
+    main.extend_shares([eval_path], 3, new_path)
+    main.refresh_shares([new_path])
+    main.decrypt_files(new_path, [str(tmp_path / "document.aes")])
+    assert (tmp_path / "document_revealed.txt").read_bytes() == b"extended document"
+    main.refresh_shares([eval_path])
+    from shamir_scheme import decode_evaluations
+    assert len(list(decode_evaluations([open(eval_path, "rb").read()]))) == 6
+    main.decrypt_files(eval_path, [str(tmp_path / "document.aes")])
+    assert (tmp_path / "document.aes").read_bytes() == encrypted
+    output = capsys.readouterr().out
+    assert "2 new evaluations saved in" in output and "6 evaluations refreshed in 1 files" in output
+    main.extend_shares([eval_path, new_path], 1)
+    assert "Extension error" in capsys.readouterr().out
+
+def test_refresh_holder_files(tmp_path, monkeypatch):
+    """
+    Test that refreshing per-holder files rewrites every file and that any t of them still decrypt.
+    """
+    monkeypatch.setattr(main.getpass, "getpass", lambda prompt: "refresh password")
+    document = tmp_path / "document.txt"
+    document.write_bytes(b"holder document")
+    eval_path = str(tmp_path / "shares.frg")
+    main.encrypt_files(eval_path, 5, 3, [str(document)], share_format="binary", per_holder=True)
+    share_paths = main.holder_paths(eval_path, 5)
+    before = [open(path, "rb").read() for path in share_paths]
+    main.refresh_shares(share_paths)
+    assert all(open(path, "rb").read() != data for path, data in zip(share_paths, before))
+    main.decrypt_files(share_paths[2:], [str(tmp_path / "document.aes")])
+    assert (tmp_path / "document_revealed.txt").read_bytes() == b"holder document"
+
+def test_refresh_keeps_old_shares_on_failure(tmp_path, monkeypatch, capsys):
+    """
+    Test that a refresh failing on the third holder file replaces no file, and that a refresh
+    with fewer than t evaluations is refused, so any t of the files still decrypt.
+    """
+    import io_manager
+    monkeypatch.setattr(main.getpass, "getpass", lambda prompt: "refresh password")
+    document = tmp_path / "document.txt"
+    document.write_bytes(b"holder document")
+    eval_path = str(tmp_path / "shares.frg")
+    main.encrypt_files(eval_path, 4, 3, [str(document)], per_holder=True)
+    share_paths = main.holder_paths(eval_path, 4)
+    before = [open(path, "rb").read() for path in share_paths]
+    write_temporary, calls = io_manager._write_temporary, []
+
+    def failing_write(file_path, chunks):
+        calls.append(file_path)
+        if len(calls) == 3:
+            raise PermissionError(f"Permission denied: {file_path}")
+        return write_temporary(file_path, chunks)
+
+    monkeypatch.setattr(io_manager, "_write_temporary", failing_write)
+    capsys.readouterr()
+    main.refresh_shares(share_paths)
+    assert "File error" in capsys.readouterr().out
+    assert [open(path, "rb").read() for path in share_paths] == before
+    assert sorted(os.listdir(tmp_path)) == sorted(["document.txt", "document.aes"] + [os.path.basename(path) for path in share_paths])
+    monkeypatch.setattr(io_manager, "_write_temporary", write_temporary)
+    main.refresh_shares(share_paths[:1])
+    assert "Only 1 evaluations, 3 are needed" in capsys.readouterr().out
+    assert [open(path, "rb").read() for path in share_paths] == before
+    os.remove(document)
+    main.decrypt_files(share_paths[1:], [str(tmp_path / "document.aes")])
+    assert (tmp_path / "document_revealed.txt").read_bytes() == b"holder document"
+
+def test_extend_refuses_to_overwrite_share_files(tmp_path, monkeypatch, capsys):
+    """
+    Test that new evaluations are not written over one of the files they are issued from.
+    """
+    monkeypatch.setattr(main.getpass, "getpass", lambda prompt: "extend password")
+    document = tmp_path / "document.txt"
+    document.write_bytes(b"holder document")
+    eval_path = str(tmp_path / "shares.frg")
+    main.encrypt_files(eval_path, 4, 3, [str(document)], per_holder=True)
+    share_paths = main.holder_paths(eval_path, 4)
+    before = [open(path, "rb").read() for path in share_paths]
+    capsys.readouterr()
+    main.extend_shares(share_paths, 1, share_paths[1])
+    main.extend_shares(share_paths[:1], 1, os.path.join(str(tmp_path), ".", os.path.basename(share_paths[0])))
+    output = capsys.readouterr().out
+    assert output.count("must not overwrite") == 2
+    assert [open(path, "rb").read() for path in share_paths] == before
+
+def test_rotate_envelope_files(tmp_path, monkeypatch, capsys):
+    """
+    Test that rotation replaces the password and the evaluations of envelope files without rewriting their data.
+    """
+    monkeypatch.setattr(main.getpass, "getpass", lambda prompt: "old password")
+    documents = {f"document_{i}.txt": os.urandom(i * 3000) for i in range(3)}
+    for name, data in documents.items():
+        (tmp_path / name).write_bytes(data)
+    eval_path = str(tmp_path / "shares.frg")
+    main.encrypt_files(eval_path, 5, 3, main.expand_paths([str(tmp_path)], ".txt"), envelope=True)
+    (tmp_path / "direct.txt").write_bytes(b"direct document")
+    main.encrypt_files(str(tmp_path / "direct.frg"), 5, 3, [str(tmp_path / "direct.txt")])
+    encrypted_paths = main.expand_paths([str(tmp_path / "document_*.aes")], ".aes")
+    before = [os.path.getsize(path) for path in encrypted_paths]
+    new_path = str(tmp_path / "new.frg")
+    monkeypatch.setattr(main.getpass, "getpass", lambda prompt: "new password")
+    main.rotate_files([eval_path], new_path, 4, 2, encrypted_paths + [str(tmp_path / "direct.aes")])
+    output = capsys.readouterr().out
+    assert f"Error in {tmp_path / 'direct.aes'}" in output and "4 files, 1 failed" in output
+    assert [os.path.getsize(path) for path in encrypted_paths] == before
+    for name in documents:
+        os.remove(tmp_path / name)
+    main.decrypt_files(new_path, encrypted_paths)
+    for name, data in documents.items():
+        assert (tmp_path / name.replace(".txt", "_revealed.txt")).read_bytes() == data
+    main.decrypt_files(eval_path, [encrypted_paths[0]])
+    assert f"Error in {encrypted_paths[0]}" in capsys.readouterr().out
+    main.rotate_files([eval_path], eval_path, 4, 2, encrypted_paths)
+    assert "must not overwrite" in capsys.readouterr().out
+
+@pytest.mark.parametrize("failure", ["write", "replace"])
+def test_rotate_keeps_files_when_shares_are_not_saved(failure, tmp_path, monkeypatch, capsys):
+    """
+    Test that when the new evaluations cannot be written or put in place, every file still decrypts with the old ones.
+
+    Args:
+        failure (str): "write" fails writing the new evaluations, "replace" fails renaming them after the rotation.
+    """
+    monkeypatch.setattr(main.getpass, "getpass", lambda prompt: "old password")
+    documents = {f"document_{i}.txt": os.urandom(i * 2000 + 1) for i in range(3)}
+    for name, data in documents.items():
+        (tmp_path / name).write_bytes(data)
+    eval_path = str(tmp_path / "shares.frg")
+    main.encrypt_files(eval_path, 5, 3, main.expand_paths([str(tmp_path)], ".txt"), envelope=True)
+    for name in documents:
+        os.remove(tmp_path / name)
+    encrypted_paths = main.expand_paths([str(tmp_path / "*.aes")], ".aes")
+    new_path = str(tmp_path / "missing_dir" / "new.frg")
+    if failure == "replace":
+        new_path = str(tmp_path / "new.frg")
+        replace = os.replace
+
+        def failing_replace(source, target):
+            if str(target).endswith(".frg"):
+                raise PermissionError(f"Permission denied: {target}")
+            return replace(source, target)
+
+        monkeypatch.setattr(os, "replace", failing_replace)
+    monkeypatch.setattr(main.getpass, "getpass", lambda prompt: "new password")
+    capsys.readouterr()
+    main.rotate_files([eval_path], new_path, 4, 3, encrypted_paths)
+    assert "Unexpected error during rotation" in capsys.readouterr().out
+    assert not os.path.exists(new_path)
+    assert len([name for name in os.listdir(tmp_path) if name.endswith(".tmp")]) == 0
+    main.decrypt_files(eval_path, encrypted_paths)
+    for name, data in documents.items():
+        assert (tmp_path / name.replace(".txt", "_revealed.txt")).read_bytes() == data
+
+def test_decrypt_mapped_file_with_wrong_key(tmp_path, monkeypatch, capsys):
+    """
+    Test that a small file in the original AES-CBC format, read through a memory map, reports a
+    wrong key as a decryption error of that file instead of failing to close the map.
+    """
+    from cipher import encrypt_bytes
+    monkeypatch.setattr(main.getpass, "getpass", lambda prompt: "other password")
+    document = tmp_path / "document.txt"
+    document.write_bytes(b"unrelated document")
+    eval_path = str(tmp_path / "shares.frg")
+    main.encrypt_files(eval_path, 5, 3, [str(document)])
+    legacy = tmp_path / "legacy.aes"
+    legacy.write_bytes(bytes(encrypt_bytes(os.urandom(5000), os.urandom(32))))
+    capsys.readouterr()
+    main.decrypt_files(eval_path, [str(legacy)])
+    assert "Error in" in capsys.readouterr().out
+    assert not (tmp_path / "legacy_revealed.txt").exists()
@@ -2,14 +2,50 @@ import pytest
 import os
 import sys
 import math
+import random
 sys.path.append(os.path.abspath("./src/main"))
 from shamir_scheme import (
+    PRIME,
+    BATCH_HEADER,
+    BATCH_MAGIC,
+    BINARY_HEADER,
+    PACK_HEADER,
+    SCHEME_PACKED,
+    WEIGHT_CACHE,
+    WeightCache,
+    SHARE_MAGIC,
+    FIELD_BACKEND_ENV,
+    field_backend,
+    new_field_backend,
+    collect_evaluations,
+    decode_evaluations,
+    encode_evaluations,
+    encode_share_batch,
+    generate_evaluations,
+    generate_packed_shares,
+    load_share_batch,
+    open_evaluations,
+    open_share_batch,
+    packed_points,
+    reconstruct_packed_secrets,
+    reconstruct_secrets_batch,
     reconstruct_secret, 
+    reconstruct_from_evaluations,
+    reconstruct_robust,
+    extend_evaluations,
+    fresh_x_values,
+    refresh_evaluations,
     generate_shares,
+    generate_shares_batch,
     get_evaluations,
-    get_evaluations_format
+    get_evaluations_format,
+    _batch_inverse,
+    _lagrange_weights_at_zero,
+    _reconstruct_secret_symbolic
 )
 
+pytestmark = pytest.mark.usefixtures("field_arithmetic")
+
 POLYNOMIAL_POINST_WITH_KEYS = [
     (1, 1, 35),
     (10, 1, 35),
@@ -134,6 +170,121 @@ def test_reconstruct_secret(total_evaluations, minimum_evaluations, key):
         secret = reconstruct_secret(subarray_format)
         assert secret == key
 
+@pytest.mark.parametrize("total_evaluations, minimum_evaluations, key", [
+    (5, 3, 35),
+    (12, 7, 2**255 + 17),
+    (20, 20, PRIME - 1),
+    (6, 2, 0)
+])
+def test_reconstruct_secret_matches_symbolic(total_evaluations, minimum_evaluations, key):
+    """
+    Test that the prime field engine and the sympy reconstruction agree on the same shares.
+
+    Args:
+        total_evaluations (int): Total number of evaluations.
+        minimum_evaluations (int): Minimum number of evaluations required to reconstruct the secret.
+        key (int): The secret key.
+    """
+    evaluations = get_evaluations(generate_shares(key, total_evaluations, minimum_evaluations))
+    for i in range(minimum_evaluations, total_evaluations + 1):
+        assert reconstruct_from_evaluations(evaluations[:i]) == key
+        assert _reconstruct_secret_symbolic(evaluations[:i]) == key
+
+@pytest.mark.parametrize("evaluations", [
+    [(1, 2), (4, 5), (-3, -3), (0, 7)],
+    [(3, 2**300), (8, -1), (PRIME + 5, 11)]
+])
+def test_reconstruct_arbitrary_points_matches_symbolic(evaluations):
+    """
+    Test that both engines agree on points that are not reduced into the field.
+
+    Args:
+        evaluations (list): The list of (x, P(x)) tuples.
+    """
+    assert reconstruct_from_evaluations(evaluations) == _reconstruct_secret_symbolic(evaluations)
+
+@pytest.mark.parametrize("evaluations", [
+    [],
+    [(1, 2), (1, 3)],
+    [(2, 5), (PRIME + 2, 5)]
+])
+def test_reconstruct_invalid_evaluations(evaluations):
+    """
+    Test that reconstruct_from_evaluations raises ValueError without points or with repeated x values.
+
+    Args:
+        evaluations (list): The list of (x, P(x)) tuples.
+    """
+    with pytest.raises(ValueError):
+        reconstruct_from_evaluations(evaluations)
+
+@pytest.mark.parametrize("key", [-1, PRIME, PRIME + 1])
+def test_generate_shares_secret_out_of_field(key):
+    """
+    Test that generate_shares raises ValueError when the secret is not a field element.
+
+    Args:
+        key (int): The secret key.
+    """
+    with pytest.raises(ValueError):
+        generate_shares(key, 5, 3)
+
+@pytest.mark.parametrize("secret_count, n, t", [
+    (1, 3, 2),
+    (20, 5, 3),
+    (7, 10, 10),
+    (50, 4, 1)
+])
+def test_generate_shares_batch(secret_count, n, t):
+    """
+    Test that every column of the batch share matrix reconstructs its secret from any t holders.
+
+    Args:
+        secret_count (int): The number of secrets.
+        n (int): The number of holders.
+        t (int): The minimum number of shares required to reconstruct each secret.
+    """
+    secret_values = [PRIME - 1 - i * 2**200 if i % 2 else i * 31 for i in range(secret_count)]
+    x_values = list(range(3, 3 + 7 * n, 7))
+    shares = generate_shares_batch(secret_values, x_values, t)
+    assert len(shares) == n
+    assert all(len(row) == secret_count for row in shares)
+    for j, secret in enumerate(secret_values):
+        column = [(x, row[j]) for x, row in zip(x_values, shares)]
+        assert reconstruct_from_evaluations(column[:t]) == secret
+        assert reconstruct_from_evaluations(column[-t:]) == secret
+        if t > 1:
+            assert reconstruct_from_evaluations(column[:t - 1]) != secret
+
+@pytest.mark.parametrize("secret_values, x_values, t", [
+    ([1, 2], [1, 2, 3], 0),
+    ([1, 2], [1, 2, 3], 4),
+    ([1, 2], [1, 2, 2], 2),
+    ([1, 2], [1, PRIME + 1], 2),
+    ([1, 2], [PRIME, 2], 2),
+    ([1, PRIME], [1, 2, 3], 2),
+    ([-1], [1, 2, 3], 2)
+])
+def test_generate_shares_batch_invalid(secret_values, x_values, t):
+    """
+    Test that generate_shares_batch raises ValueError for invalid thresholds, x values or secrets.
+
+    Args:
+        secret_values (list): The secrets.
+        x_values (list): The x coordinates of the holders.
+        t (int): The minimum number of shares required.
+    """
+    with pytest.raises(ValueError):
+        generate_shares_batch(secret_values, x_values, t)
+
+def test_batch_inverse():
+    """
+    Test that _batch_inverse returns the modular inverse of every value.
+    """
+    values = [1, 2, 3, PRIME - 1, 2**200 + 7, 123456789]
+    for value, inverse in zip(values, _batch_inverse(values)):
+        assert value * inverse % PRIME == 1
+
 @pytest.mark.parametrize("evaluations_format, evaluations", [
     ("x, P(x)\n1, 2\n4, 5\n-3, -3\n0, 0", [(1, 2), (4, 5), (-3, -3), (0, 0)]),
     ("x, P(x)\n1, 2\n3, 4\n5, 6\n7, 8\n9, 10", [(1, 2), (3, 4), (5, 6), (7, 8), (9, 10)]),
@@ -183,3 +334,611 @@ def test_get_evaluations(evaluations_format, evaluations):
         evaluations (list): The expected list of (x, P(x)) tuples.
     """
     assert get_evaluations(evaluations_format) == evaluations
+
+def test_reconstruct_secret_from_share_file_text():
+    """
+    Test that the public text parser reads share files written with a metadata line and checks that line.
+    """
+    evaluations = generate_evaluations(1234, 5, 3)
+    text = b"".join(encode_evaluations(evaluations, "text", 3)).decode('utf-8')
+    assert text.startswith("# scheme=shamir")
+    assert get_evaluations(text) == evaluations
+    assert get_evaluations(text + "\n") == evaluations
+    assert reconstruct_secret(text) == 1234
+    with pytest.raises(ValueError):
+        get_evaluations(text.replace("field=2^256+297", "field=2^127-1"))
+
+def split_chunks(data, size):
+    """
+    Splits bytes into chunks of a fixed size, like a file read in chunks.
+
+    Args:
+        data (bytes): The content.
+        size (int): The size of every chunk but the last one.
+
+    Returns:
+        list of bytes: The chunks.
+    """
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+@pytest.mark.parametrize("share_format", ["text", "binary"])
+@pytest.mark.parametrize("chunk_size", [1, 7, 65, 1 << 20])
+def test_encode_decode_evaluations(share_format, chunk_size):
+    """
+    Test that evaluations survive the text and binary formats whatever the chunking of the file.
+
+    Args:
+        share_format (str): The format of the share file.
+        chunk_size (int): The size of the chunks in which the file is read.
+    """
+    evaluations = generate_evaluations(PRIME - 1, 40, 5)
+    data = b"".join(encode_evaluations(evaluations, share_format))
+    assert data.startswith(SHARE_MAGIC) == (share_format == "binary")
+    decoded = list(decode_evaluations(split_chunks(data, chunk_size)))
+    assert decoded == evaluations
+    assert reconstruct_from_evaluations(decoded) == PRIME - 1
+
+def test_encode_text_matches_format():
+    """
+    Test that the streamed text format is the same as get_evaluations_format and that a final line break is accepted.
+    """
+    evaluations = [(1, 2), (4, 5), (-3, -3), (0, 0)]
+    data = b"".join(encode_evaluations(evaluations, "text"))
+    assert data.decode() == get_evaluations_format(evaluations)
+    assert list(decode_evaluations([data + b"\n"])) == evaluations
+
+def test_binary_format_is_compact():
+    """
+    Test that a binary share file holds two fixed width field elements per evaluation.
+    """
+    evaluations = generate_evaluations(12345, 100, 3)
+    data = b"".join(encode_evaluations(evaluations, "binary"))
+    width = (PRIME.bit_length() + 7) // 8
+    assert len(data) == BINARY_HEADER.size + 100 * 2 * width
+    assert len(data) < len(get_evaluations_format(evaluations))
+
+@pytest.mark.parametrize("data", [
+    b"",
+    b"x, P(x",
+    b"x,  P(x)\n1, 2",
+    b"x, P(x)\n1, 2\n\n",
+    b"SHMF",
+    b"SHMF\x02\x01",
+    b"# scheme=shamir field=2^256+297\nx, P(x)",
+    b"# scheme=feldman field=2^256+297 t=2\nx, P(x)",
+    b"# scheme=shamir field=2^127-1 t=2\nx, P(x)",
+    b"# scheme=shamir field=2^256+297 t=2\n1, 2",
+    BINARY_HEADER.pack(SHARE_MAGIC, 9, 1, 1, 33, 2),
+    BINARY_HEADER.pack(SHARE_MAGIC, 2, 7, 1, 33, 2),
+    BINARY_HEADER.pack(SHARE_MAGIC, 2, 1, 7, 33, 2),
+    BINARY_HEADER.pack(SHARE_MAGIC, 2, 1, 1, 32, 2),
+    BINARY_HEADER.pack(SHARE_MAGIC, 2, 1, 1, 33, 2) + bytes(65),
+    b"SHMF\x01\x00\x20",
+    b"SHMF\x01\x00\x21" + bytes(65)
+])
+def test_decode_evaluations_invalid(data):
+    """
+    Test that malformed, truncated or unsupported share files raise ValueError.
+
+    Args:
+        data (bytes): The content of the share file.
+    """
+    with pytest.raises(ValueError):
+        list(decode_evaluations([data]))
+
+def test_encode_evaluations_invalid_format():
+    """
+    Test that an unknown share format raises ValueError.
+    """
+    with pytest.raises(ValueError):
+        encode_evaluations([(1, 2)], "xml")
+
+@pytest.mark.parametrize("share_format", ["text", "binary"])
+def test_share_header_records_threshold(share_format):
+    """
+    Test that the threshold, scheme and field survive both share formats.
+
+    Args:
+        share_format (str): The format of the share file.
+    """
+    evaluations = generate_evaluations(99, 6, 4)
+    header, decoded = open_evaluations(encode_evaluations(evaluations, share_format, 4))
+    assert (header.share_format, header.threshold) == (share_format, 4)
+    assert list(decoded) == evaluations
+    header, _ = open_evaluations(encode_evaluations(evaluations, share_format))
+    assert header.threshold is None
+
+def test_version_1_binary_share_file():
+    """
+    Test that binary share files of version 1, without threshold, are still read.
+    """
+    record = (5).to_bytes(33, 'big') + (7).to_bytes(33, 'big')
+    header, decoded = open_evaluations([b"SHMF\x01\x00\x21" + record])
+    assert header.threshold is None
+    assert list(decoded) == [(5, 7)]
+
+class CountingChunks:
+    """
+    The chunks of a share file that count how many of them are consumed.
+    """
+    def __init__(self, data):
+        self.chunks = iter(split_chunks(data, 66))
+        self.consumed = 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        chunk = next(self.chunks)
+        self.consumed += 1
+        return chunk
+
+@pytest.mark.parametrize("share_format", ["text", "binary"])
+def test_collect_evaluations_stops_at_threshold(share_format):
+    """
+    Test that loading stops after t distinct evaluations, skipping repeated ones and untouched files.
+
+    Args:
+        share_format (str): The format of the share files.
+    """
+    evaluations = generate_evaluations(2024, 200, 3)
+    repeated = evaluations[:1] * 3 + evaluations[1:]
+    sources = [CountingChunks(b"".join(encode_evaluations(repeated, share_format, 3))) for _ in range(3)]
+    header, collected = collect_evaluations(iter(sources))
+    assert header.threshold == 3
+    assert collected == evaluations[:3]
+    assert reconstruct_from_evaluations(collected) == 2024
+    assert sources[0].consumed < 20
+    assert sources[1].consumed == sources[2].consumed == 0
+
+def test_collect_evaluations_from_holder_files():
+    """
+    Test that one evaluation per file is merged until the threshold, and that files without threshold are all read.
+    """
+    evaluations = generate_evaluations(77, 5, 3)
+    holder_files = [b"".join(encode_evaluations([evaluation], "binary", 3)) for evaluation in evaluations]
+    _, collected = collect_evaluations([[data] for data in holder_files])
+    assert collected == evaluations[:3]
+    plain = [b"".join(encode_evaluations([evaluation], "text")) for evaluation in evaluations]
+    header, collected = collect_evaluations([[data] for data in plain])
+    assert header.threshold is None
+    assert collected == evaluations
+
+def test_collect_evaluations_all():
+    """
+    Test that every distinct evaluation is read when stopping at the threshold is disabled.
+    """
+    evaluations = generate_evaluations(31, 7, 3)
+    data = b"".join(encode_evaluations(evaluations + evaluations[:2], "text", 3))
+    header, collected = collect_evaluations([[data]], stop_at_threshold=False)
+    assert header.threshold == 3
+    assert collected == evaluations
+
+@pytest.mark.parametrize("n, t, corrupted", [(5, 3, 0), (5, 3, 1), (9, 3, 3), (30, 10, 10)])
+def test_reconstruct_robust(n, t, corrupted):
+    """
+    Test that robust reconstruction reports the corrupted evaluations and recovers the secret without them.
+
+    Args:
+        n (int): The number of shares.
+        t (int): The minimum number of shares required.
+        corrupted (int): The number of corrupted shares.
+    """
+    secret = random.randrange(2**256)
+    evaluations = generate_evaluations(secret, n, t)
+    positions = sorted(random.sample(range(n), corrupted))
+    for i in positions:
+        x, y = evaluations[i]
+        evaluations[i] = (x, y + 1)
+    recovered, found = reconstruct_robust(evaluations, t)
+    assert recovered == secret
+    assert found == [evaluations[i] for i in positions]
+
+def test_reconstruct_robust_invalid():
+    """
+    Test that robust reconstruction raises ValueError with too few evaluations or too many corrupted ones.
+    """
+    evaluations = generate_evaluations(5, 6, 3)
+    with pytest.raises(ValueError):
+        reconstruct_robust(evaluations[:2], 3)
+    corrupted = [(x, y + 1) for x, y in evaluations[:2]] + evaluations[2:]
+    with pytest.raises(ValueError):
+        reconstruct_robust(corrupted, 3)
+
+@pytest.mark.parametrize("sources", [
+    [],
+    [[b"# scheme=shamir field=2^256+297 t=3\nx, P(x)\n1, 2\n3, 4"]],
+    [[b"x, P(x)\n1, 2"], [b"x, P(x)\n1, 3"]],
+    [[b"# scheme=shamir field=2^256+297 t=3\nx, P(x)\n1, 2"], [b"# scheme=shamir field=2^256+297 t=2\nx, P(x)\n3, 4"]]
+])
+def test_collect_evaluations_invalid(sources):
+    """
+    Test that missing files, too few evaluations, conflicting values and thresholds raise ValueError.
+
+    Args:
+        sources (list): The chunks of every share file.
+    """
+    with pytest.raises(ValueError):
+        collect_evaluations(sources)
+
+def test_weight_cache_hits_any_order():
+    """
+    Test that the weights of a set of x values are computed once and found again in any order.
+    """
+    cache = WeightCache(4)
+    x_values = random.sample(range(1, 10**10), 6)
+    assert cache.weights(x_values) == _lagrange_weights_at_zero(x_values)
+    shuffled = random.sample(x_values, len(x_values))
+    assert cache.weights(shuffled) == _lagrange_weights_at_zero(shuffled)
+    assert cache.weights([x + PRIME for x in x_values]) == _lagrange_weights_at_zero(x_values)
+    assert (cache.hits, cache.misses, len(cache)) == (2, 1, 1)
+
+def test_weight_cache_reconstructs_many_secrets():
+    """
+    Test that secrets shared with the same holders are reconstructed with one computation of the weights.
+    """
+    cache = WeightCache()
+    x_values = random.sample(range(1, 10**10), 5)
+    secret_values = [random.randrange(PRIME) for _ in range(20)]
+    shares = generate_shares_batch(secret_values, x_values, 3)
+    for j, secret in enumerate(secret_values):
+        evaluations = [(x, row[j]) for x, row in zip(x_values, shares)][1:4]
+        assert reconstruct_from_evaluations(evaluations, cache=cache) == secret
+    assert (cache.hits, cache.misses) == (19, 1)
+
+def test_weight_cache_evicts_least_recently_used():
+    """
+    Test that the cache keeps at most max_size sets and drops the least recently used one.
+    """
+    cache = WeightCache(2)
+    cache.weights([1, 2])
+    cache.weights([3, 4])
+    cache.weights([2, 1])
+    cache.weights([5, 6])
+    assert len(cache) == 2
+    cache.weights([1, 2])
+    cache.weights([3, 4])
+    assert (cache.hits, cache.misses) == (2, 4)
+    cache.resize(1)
+    assert len(cache) == 1
+    cache.resize(0)
+    cache.weights([1, 2])
+    assert len(cache) == 0
+    cache.clear()
+    assert (cache.hits, cache.misses) == (0, 0)
+
+def test_weight_cache_invalid():
+    """
+    Test that negative sizes, unknown engines and repeated x values raise ValueError and are not cached.
+    """
+    with pytest.raises(ValueError):
+        WeightCache(-1)
+    cache = WeightCache()
+    cache.weights([1, 2])
+    with pytest.raises(ValueError):
+        cache.weights([1, 2], "symbolic")
+    with pytest.raises(ValueError):
+        cache.weights([1, 1 + PRIME])
+    assert len(cache) == 1
+
+def test_default_weight_cache():
+    """
+    Test that reconstruct_from_evaluations uses WEIGHT_CACHE by default.
+    """
+    x_values = random.sample(range(1, 10**10), 3)
+    hits = WEIGHT_CACHE.hits
+    reconstruct_from_evaluations([(x, 1) for x in x_values])
+    reconstruct_from_evaluations([(x, 2) for x in reversed(x_values)])
+    assert WEIGHT_CACHE.hits == hits + 1
+
+@pytest.mark.parametrize("secret_count, n, t", [(1, 3, 2), (50, 5, 3), (200, 7, 7)])
+def test_reconstruct_secrets_batch(secret_count, n, t):
+    """
+    Test that a vault of secrets is recovered from any t holders with one computation of the weights.
+
+    Args:
+        secret_count (int): The number of secrets.
+        n (int): The number of holders.
+        t (int): The minimum number of shares required.
+    """
+    x_values = random.sample(range(1, 10**10), n)
+    secret_values = [random.randrange(PRIME) for _ in range(secret_count)]
+    shares = generate_shares_batch(secret_values, x_values, t)
+    cache = WeightCache()
+    assert reconstruct_secrets_batch(x_values[:t], shares[:t], cache=cache) == secret_values
+    assert reconstruct_secrets_batch(x_values[-t:], shares[-t:], cache=cache) == secret_values
+    assert cache.misses == (1 if n == t else 2)
+
+@pytest.mark.parametrize("x_values, shares", [
+    ([], []),
+    ([1, 2], [[3, 4]]),
+    ([1, 2], [[3, 4], [5]]),
+    ([1, 1], [[3], [4]])
+])
+def test_reconstruct_secrets_batch_invalid(x_values, shares):
+    """
+    Test that missing holders, ragged matrices and repeated x values raise ValueError.
+
+    Args:
+        x_values (list): The x coordinate of every holder.
+        shares (list): The holder-major matrix of shares.
+    """
+    with pytest.raises(ValueError):
+        reconstruct_secrets_batch(x_values, shares)
+
+@pytest.mark.parametrize("threshold", [None, 3])
+@pytest.mark.parametrize("chunk_size", [1, 100, 1 << 20])
+def test_share_batch_file(threshold, chunk_size):
+    """
+    Test that a batch share file round trips and that only t holder records are loaded when t is recorded.
+
+    Args:
+        threshold (int): The threshold recorded in the header, or None.
+        chunk_size (int): The size of the chunks in which the file is read.
+    """
+    x_values = random.sample(range(1, 10**10), 5)
+    secret_values = [random.randrange(PRIME) for _ in range(40)]
+    shares = generate_shares_batch(secret_values, x_values, 3)
+    data = b"".join(encode_share_batch(x_values, shares, threshold))
+    header, records = open_share_batch(split_chunks(data, chunk_size))
+    assert (header.threshold, header.holders, header.secrets) == (threshold, 5, 40)
+    assert list(records) == list(zip(x_values, shares))
+    loaded_header, loaded_x, loaded_shares = load_share_batch(split_chunks(data, chunk_size))
+    assert loaded_header == header
+    assert len(loaded_x) == (threshold or 5)
+    assert reconstruct_secrets_batch(loaded_x, loaded_shares) == secret_values
+
+@pytest.mark.parametrize("data", [
+    b"",
+    b"SHMB",
+    BATCH_HEADER.pack(BATCH_MAGIC, 9, 1, 1, 33, 2, 1, 1),
+    BATCH_HEADER.pack(BATCH_MAGIC, 1, 7, 1, 33, 2, 1, 1),
+    BATCH_HEADER.pack(BATCH_MAGIC, 1, 1, 7, 33, 2, 1, 1),
+    BATCH_HEADER.pack(BATCH_MAGIC, 1, 1, 1, 33, 2, 1, 1),
+    BATCH_HEADER.pack(BATCH_MAGIC, 1, 1, 1, 33, 0, 2, 1) + bytes(66 + 65),
+    BATCH_HEADER.pack(BATCH_MAGIC, 1, 1, 1, 33, 0, 1, 1) + bytes(66 + 1)
+])
+def test_share_batch_file_invalid(data):
+    """
+    Test that malformed, truncated or unsupported batch share files raise ValueError.
+
+    Args:
+        data (bytes): The content of the batch share file.
+    """
+    with pytest.raises(ValueError):
+        load_share_batch([data])
+
+@pytest.mark.parametrize("secret_count, n, t, pack_size", [
+    (1, 3, 2, 1),
+    (40, 5, 3, 2),
+    (37, 8, 6, 4),
+    (10, 4, 1, 1),
+    (0, 3, 3, 2)
+])
+def test_packed_shares(secret_count, n, t, pack_size):
+    """
+    Test that packed shares hold one value per pack and reconstruct every secret from any t holders only.
+
+    Args:
+        secret_count (int): The number of secrets.
+        n (int): The number of holders.
+        t (int): The minimum number of shares required.
+        pack_size (int): The number of secrets of every pack.
+    """
+    secret_values = [PRIME - 1 - i * 2**200 if i % 2 else i * 31 for i in range(secret_count)]
+    x_values = random.sample(range(1, 10**10), n)
+    shares = generate_packed_shares(secret_values, x_values, t, pack_size)
+    assert len(shares) == n
+    assert all(len(row) == math.ceil(secret_count / pack_size) for row in shares)
+    assert reconstruct_packed_secrets(x_values[:t], shares[:t], t, pack_size, secret_count) == secret_values
+    assert reconstruct_packed_secrets(x_values[-t:], shares[-t:], t, pack_size, secret_count) == secret_values
+    assert reconstruct_packed_secrets(x_values, shares, t, pack_size, secret_count) == secret_values
+    with pytest.raises(ValueError):
+        reconstruct_packed_secrets(x_values[:t - 1], shares[:t - 1], t, pack_size, secret_count)
+    padded = reconstruct_packed_secrets(x_values[:t], shares[:t], t, pack_size)
+    assert padded == secret_values + [0] * (len(padded) - secret_count)
+
+def test_packed_shares_are_random():
+    """
+    Test that sharing the same secrets twice gives different shares, the polynomials are not only the secrets.
+    """
+    x_values = [1, 2, 3, 4]
+    assert generate_packed_shares([5, 6], x_values, 3, 2) != generate_packed_shares([5, 6], x_values, 3, 2)
+
+@pytest.mark.parametrize("secret_values, x_values, t, pack_size", [
+    ([1, 2], [1, 2, 3], 0, 1),
+    ([1, 2], [1, 2, 3], 4, 1),
+    ([1, 2], [1, 2, 3], 3, 3),
+    ([1, 2], [1, 2, 3], 3, 0),
+    ([1, 2], [1, 2, 2], 2, 1),
+    ([1, 2], [1, 2, PRIME - 2], 3, 2),
+    ([1, PRIME], [1, 2, 3], 3, 2)
+])
+def test_generate_packed_shares_invalid(secret_values, x_values, t, pack_size):
+    """
+    Test that generate_packed_shares raises ValueError for invalid thresholds, pack sizes, x values or secrets.
+
+    Args:
+        secret_values (list): The secrets.
+        x_values (list): The x coordinates of the holders.
+        t (int): The minimum number of shares required.
+        pack_size (int): The number of secrets of every pack.
+    """
+    with pytest.raises(ValueError):
+        generate_packed_shares(secret_values, x_values, t, pack_size)
+
+def test_reconstruct_packed_secrets_invalid():
+    """
+    Test that fewer than t holders, ragged matrices, repeated or reserved x values and invalid pack sizes raise ValueError.
+    """
+    for x_values, shares in [([], []), ([1, 2], [[3], [4]]), ([1, 2, 3], [[3], [4, 5], [6]]),
+                             ([1, 1, 2], [[3], [4], [5]]), ([1, 2, packed_points(2)[1]], [[3], [4], [5]])]:
+        with pytest.raises(ValueError):
+            reconstruct_packed_secrets(x_values, shares, 3, 2)
+    for t, pack_size in [(0, 1), (3, 3), (3, 0)]:
+        with pytest.raises(ValueError):
+            reconstruct_packed_secrets([1, 2, 3], [[3], [4], [5]], t, pack_size)
+
+@pytest.mark.parametrize("chunk_size", [1, 100, 1 << 20])
+def test_packed_share_batch_file(chunk_size):
+    """
+    Test that a packed batch share file records its pack size and reconstructs from its first t records.
+
+    Args:
+        chunk_size (int): The size of the chunks in which the file is read.
+    """
+    x_values = random.sample(range(1, 10**10), 6)
+    secret_values = [random.randrange(PRIME) for _ in range(41)]
+    shares = generate_packed_shares(secret_values, x_values, 5, 3)
+    data = b"".join(encode_share_batch(x_values, shares, 5, 3, len(secret_values)))
+    header, records = open_share_batch(split_chunks(data, chunk_size))
+    assert (header.scheme, header.threshold, header.holders, header.secrets, header.pack_size) == (SCHEME_PACKED, 5, 6, 41, 3)
+    assert list(records) == list(zip(x_values, shares))
+    loaded_header, loaded_x, loaded_shares = load_share_batch(split_chunks(data, chunk_size))
+    assert loaded_header == header
+    assert reconstruct_packed_secrets(loaded_x, loaded_shares, loaded_header.threshold, loaded_header.pack_size,
+                                      loaded_header.secrets) == secret_values
+    with pytest.raises(ValueError):
+        list(encode_share_batch(x_values, shares, 5, 3, 39))
+
+@pytest.mark.parametrize("data", [
+    BATCH_HEADER.pack(BATCH_MAGIC, 1, SCHEME_PACKED, 1, 33, 0, 0, 0),
+    BATCH_HEADER.pack(BATCH_MAGIC, 1, SCHEME_PACKED, 1, 33, 0, 0, 0) + PACK_HEADER.pack(0),
+    BATCH_HEADER.pack(BATCH_MAGIC, 1, SCHEME_PACKED, 1, 33, 0, 1, 3) + PACK_HEADER.pack(2) + bytes(33 * 2)
+])
+def test_packed_share_batch_file_invalid(data):
+    """
+    Test that packed batch share files without a valid pack size or with truncated records raise ValueError.
+
+    Args:
+        data (bytes): The content of the batch share file.
+    """
+    with pytest.raises(ValueError):
+        load_share_batch([data])
+
+@pytest.mark.parametrize("n, t, count", [(3, 2, 1), (5, 3, 4), (40, 25, 30)])
+def test_extend_evaluations(n, t, count):
+    """
+    Test that new shares issued from t existing ones reconstruct the secret alone and mixed with the old ones.
+
+    Args:
+        n (int): The number of existing shares.
+        t (int): The minimum number of shares required.
+        count (int): The number of new shares.
+    """
+    secret = random.randrange(PRIME)
+    evaluations = generate_evaluations(secret, n, t)
+    x_values = fresh_x_values(evaluations, count)
+    assert not {x for x, _ in evaluations} & set(x_values)
+    new_evaluations = extend_evaluations(evaluations, t, x_values)
+    assert [x for x, _ in new_evaluations] == x_values
+    combined = new_evaluations + evaluations
+    random.shuffle(combined)
+    assert reconstruct_from_evaluations(combined[:t]) == secret
+    if count >= t:
+        assert reconstruct_from_evaluations(new_evaluations[:t]) == secret
+
+@pytest.mark.parametrize("x_values", [[0], [5, 5], [PRIME], [7]])
+def test_extend_evaluations_invalid_x(x_values):
+    """
+    Test that zero, repeated and already used x values are rejected, since they would reveal or duplicate shares.
+
+    Args:
+        x_values (list): The x values of the new shares.
+    """
+    evaluations = [(7, 1), (8, 2), (9, 3)]
+    with pytest.raises(ValueError):
+        extend_evaluations(evaluations, 3, x_values)
+    with pytest.raises(ValueError):
+        extend_evaluations(evaluations, 4, [10])
+
+def test_extend_evaluations_corrupted():
+    """
+    Test that no new shares are issued from evaluations of which one is corrupted, even among the first t.
+    """
+    evaluations = generate_evaluations(random.randrange(PRIME), 5, 3)
+    corrupted = [(evaluations[0][0], evaluations[0][1] + 1)] + evaluations[1:]
+    with pytest.raises(ValueError, match=f"x = {evaluations[0][0]}"):
+        extend_evaluations(corrupted, 3, fresh_x_values(corrupted, 2))
+
+def test_fresh_x_values_invalid():
+    """
+    Test that fresh_x_values raises ValueError when there are not enough unused x values.
+    """
+    with pytest.raises(ValueError):
+        fresh_x_values([(1, 1), (2, 2)], 2, 4)
+    with pytest.raises(ValueError):
+        fresh_x_values([(1, 1)], 0)
+    assert sorted(fresh_x_values([(1, 1), (2, 2)], 1, 4)) == [3]
+
+def test_refresh_evaluations():
+    """
+    Test that refreshed shares keep the secret, change every value, and do not combine with the old ones.
+    """
+    secret = random.randrange(PRIME)
+    evaluations = generate_evaluations(secret, 6, 3)
+    refreshed = refresh_evaluations(evaluations, 3)
+    assert [x for x, _ in refreshed] == [x for x, _ in evaluations]
+    assert all(y != old for (_, y), (_, old) in zip(refreshed, evaluations))
+    assert reconstruct_from_evaluations(refreshed[:3]) == secret
+    assert reconstruct_from_evaluations(refreshed[3:]) == secret
+    assert reconstruct_from_evaluations(refreshed[:2] + evaluations[2:3]) != secret
+
+def test_refresh_evaluations_invalid():
+    """
+    Test that fewer than t evaluations, or evaluations of different polynomials, are not refreshed.
+    """
+    evaluations = generate_evaluations(random.randrange(PRIME), 6, 3)
+    with pytest.raises(ValueError):
+        refresh_evaluations(evaluations[:2], 3)
+    corrupted = evaluations[:4] + [(evaluations[4][0], evaluations[4][1] + 1)] + evaluations[5:]
+    with pytest.raises(ValueError, match=f"x = {evaluations[4][0]}"):
+        refresh_evaluations(corrupted, 3)
+    with pytest.raises(ValueError):
+        refresh_evaluations(evaluations[:3] + generate_evaluations(5, 3, 3), 3)
+
+def test_field_backends_agree(monkeypatch):
+    """
+    Test that the gmpy2 backend gives the same Python ints as the Python one for every field operation.
+    """
+    pytest.importorskip("gmpy2")
+    import fast_polynomial
+    import shamir_scheme
+    x_values = random.sample(range(1, 10**10), 40)
+    coefficients = [random.randrange(PRIME) for _ in range(40)]
+    secret_values = [random.randrange(PRIME) for _ in range(30)]
+    results = {}
+    for name in ["python", "gmpy2"]:
+        backend = shamir_scheme.set_field_backend(name)
+        randomness = random.Random(7)
+        monkeypatch.setattr(os, "urandom", lambda size: randomness.getrandbits(8 * size).to_bytes(size, 'big'))
+        results[name] = (
+            generate_shares_batch(secret_values, x_values, 5),
+            generate_packed_shares(secret_values, x_values, 9, 4),
+            _lagrange_weights_at_zero(x_values),
+            _batch_inverse(x_values),
+            shamir_scheme._evaluate_polynomial_many(coefficients, x_values),
+            fast_polynomial.poly_mul(coefficients, coefficients[::-1]),
+            fast_polynomial.interpolate(x_values, coefficients)
+        )
+        monkeypatch.undo()
+        with pytest.raises(ValueError):
+            backend.inverse(backend.element(PRIME))
+    assert results["python"] == results["gmpy2"]
+    assert all(type(value) is int for value in results["gmpy2"][0][0] + results["gmpy2"][2] + results["gmpy2"][4])
+
+def test_field_backend_selection(monkeypatch):
+    """
+    Test that the backend is chosen from the environment on first use and that unknown or missing backends raise ValueError.
+    """
+    import shamir_scheme
+    monkeypatch.setattr(shamir_scheme, "_field_backend", None)
+    monkeypatch.setenv(FIELD_BACKEND_ENV, "python")
+    assert field_backend().name == "python"
+    assert field_backend() is field_backend()
+    with pytest.raises(ValueError):
+        new_field_backend("numpy")
+    monkeypatch.setitem(sys.modules, "gmpy2", None)
+    with pytest.raises(ValueError):
+        new_field_backend("gmpy2")
+    assert new_field_backend("auto").name == "python"